@@ -20,6 +20,8 @@ class Settings(BaseSettings):
 
     # -------------------  Telegram  ------------------- #
     bot_token: str = Field(..., alias='BOT_TOKEN')
+    # локальный Bot API (`telegram-bot-api --local`): без него файлы больше 20 МБ не скачать
+    TELEGRAM_API_URL: str | None = Field(None, alias='TELEGRAM_API_URL')
 
     # -------------------  Google Drive  ------------------- #
     gdrive_root_folder: str = Field(..., alias='GOOGLE_DRIVE_ROOT_FOLDER')
@@ -42,6 +44,11 @@ class Settings(BaseSettings):
     ai_analysis_enabled: bool = Field(False, alias='AI_ANALYSIS_ENABLED')
     REDIS_DSN: str = Field(..., alias='REDIS_DSN')
     HEAVY_PDF_MB: float = Field(..., alias='HEAVY_PDF_MB')
+    HEAVY_PDF_PAGES: int = Field(150, alias='HEAVY_PDF_PAGES')
+    VALIDATE_IN_WORKER: bool = Field(False, alias='VALIDATE_IN_WORKER')
+    # OSD (поворот и письменность) в предпроходе OCR: включать после замера
+    # benchmarks/bench_ocr_prepass.py на своих сканах — на обычных страницах это лишний вызов tesseract
+    OCR_PREPASS_OSD: bool = Field(False, alias='OCR_PREPASS_OSD')
     cache_ttl: int = Field(45, alias='CACHE_TTL')
 
     # -------------------  Pydantic v2 meta  ------------------- #
@@ -1,13 +1,14 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Document, ReplyKeyboardMarkup, KeyboardButton
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from app.utils.telegram_utils import escape_markdown
+from app.utils.telegram_utils import can_download, escape_markdown
 import structlog
 log = structlog.get_logger(__name__)
 
 from app.utils.file_validation import validate_file, FileValidationError
+from app.services.doc_classifier import get_classifier
 
 # from ..services.pdf_ocr import PDFOCRService
 # from ..services.ai_validator import AITextValidator
@@ -45,7 +46,8 @@ def get_reply_menu():
     return keyboard
 
 # --- Универсальный обработчик без команд ---
-@router.message()
+# только вне сценариев и не для команд: шаги FSM и /команды обрабатывают свои хендлеры
+@router.message(StateFilter(None), ~F.text.startswith("/"))
 async def universal_handler(message: Message, state: FSMContext):
     # Если это документ
     if message.document:
@@ -66,7 +68,7 @@ async def universal_handler(message: Message, state: FSMContext):
             await message.answer("Что делаем с PDF?", reply_markup=keyboard)
             return
         # Банковский документ
-        if 'выписка' in filename or 'statement' in filename:
+        if get_classifier().classify(filename).bank:
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton("🏦 Анализ платежей", callback_data="bank_ocr")],
                 [InlineKeyboardButton("📊 Создать отчет", callback_data="bank_report")]
@@ -335,13 +337,23 @@ async def handle_non_document(message: Message):
     ) 
 
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile
 from aiogram.fsm.context import FSMContext
 from app.services.autocomplete_service import AutocompleteService
 from app.config import settings
 from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime
-from app.services.bank_ocr_service import BankDocumentOCR
+from app.services.bank_ocr_service import BankDocumentOCR, format_payments_report
+from app.services.heavy_docs import is_heavy_pdf, pdf_page_count, process_heavy_statement
+from app.services.statement_import import load_statement
+from app.services.payment_table import PaymentTable, format_detailed_report, write_xlsx
+from app.services.payment_ledger import PaymentLedger
+from app.services.application_matcher import format_match_report, load_applications, match_payments
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import aclosing
 from decimal import Decimal
 from app.services.cbr_notifier import CBRNotificationService
 from app.config import settings
@@ -451,13 +463,193 @@ async def select_doctype(callback: CallbackQuery, state: FSMContext):
     )
     await state.set_state(QuickDocStates.waiting_date) 
 
+# Отмена разбора выписки: (chat_id, message_id) статусного сообщения → событие;
+# message_id уникален только в пределах чата
+_bank_cancel_events: dict[tuple[int, int], asyncio.Event] = {}
+# последняя разобранная выписка пользователя — для подробного отчёта и Excel
+_bank_tables: dict[int, PaymentTable] = {}
+BANK_STATUS_INTERVAL = 2.0     # сек между правками статуса (лимиты Telegram на edit)
+
+
+async def _edit_bank_status(status_msg: Message, page_no: int, page_count: int, found: int,
+                            totals: dict[str, Decimal], reply_markup: InlineKeyboardMarkup):
+    text = (
+        "🏦 **Анализирую банковский документ...**\n\n"
+        f"📄 Страница {page_no} из {page_count}\n"
+        f"🔍 Найдено платежей: {found}\n"
+    )
+    for currency, total in sorted(totals.items()):
+        text += f"   {currency}: {total:,.2f}\n"
+    try:
+        await status_msg.edit_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+    except Exception as e:
+        log.debug("bank_status_edit_failed", error=str(e))
+
+
+@router.callback_query(F.data.startswith("cancel_bank_"))
+async def cancel_bank_analysis(callback: CallbackQuery):
+    chat_id, message_id = map(int, callback.data.rsplit("_", 2)[1:])
+    event = None
+    if callback.message and callback.message.chat.id == chat_id:
+        event = _bank_cancel_events.get((chat_id, message_id))
+    if event:
+        event.set()
+        await callback.answer("Останавливаю, покажу то, что уже нашёл")
+    else:
+        await callback.answer("Анализ уже завершён")
+
+
+async def _ocr_statement_payments(processing_msg: Message, file_path: str) -> tuple[list, str]:
+    """Платежи через OCR с промежуточными итогами; вторым — пометка об отмене."""
+    cancel = asyncio.Event()
+    cancel_key = (processing_msg.chat.id, processing_msg.message_id)
+    _bank_cancel_events[cancel_key] = cancel
+    cancel_kb = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⏹ Остановить", callback_data="cancel_bank_{}_{}".format(*cancel_key))]
+    ])
+    bank_ocr = BankDocumentOCR()
+    payments = []
+    totals: dict[str, Decimal] = {}
+    page_no, page_count = 0, pdf_page_count(file_path)
+    await _edit_bank_status(processing_msg, page_no, page_count, 0, totals, cancel_kb)
+    last_update = time.monotonic()
+    try:
+        async with aclosing(bank_ocr.iter_page_payments(file_path)) as batches:
+            async for batch in batches:
+                payments.extend(batch.payments)
+                for payment in batch.payments:
+                    totals[payment.currency] = totals.get(payment.currency, Decimal('0')) + payment.amount
+                page_no = batch.page.number if batch.page else batch.page_count
+                page_count = batch.page_count
+                if cancel.is_set():
+                    break
+                if time.monotonic() - last_update >= BANK_STATUS_INTERVAL:
+                    last_update = time.monotonic()
+                    await _edit_bank_status(processing_msg, page_no, page_count, len(payments), totals, cancel_kb)
+    finally:
+        _bank_cancel_events.pop(cancel_key, None)
+    if cancel.is_set():
+        return payments, f"⏹ **Остановлено на странице {page_no} из {page_count}** — результат неполный\n\n"
+    return payments, ""
+
+
+async def _enqueue_heavy_statement(message: Message):
+    document = message.document
+    status_msg = await message.answer(
+        "🏋️ **Большой документ — поставил в очередь.**\n\n"
+        "Пришлю результат сюда, как только обработаю. Ботом можно пользоваться дальше.",
+        parse_mode="Markdown"
+    )
+    process_heavy_statement.delay(document.file_id, document.file_name, message.chat.id, status_msg.message_id)
+    log.info("heavy_statement_enqueued", file_name=document.file_name, size=document.file_size, chat_id=message.chat.id)
+
+
+def _format_ledger_totals(totals: dict[str, tuple[Decimal, int]]) -> str:
+    text = "📚 **Итого по всем выпискам:**\n"
+    for currency, (total, count) in totals.items():
+        text += f"   {currency}: {total:,.2f} ({count} шт.)\n"
+    return text
+
+
+async def _register_statement(user_id: int, payments: list) -> str:
+    """Отмечает платежи в сводном учёте; возвращает строку для отчёта."""
+    ledger = PaymentLedger(settings.REDIS_DSN)
+    try:
+        await ledger.connect()
+        try:
+            is_new = await ledger.register(user_id, payments)
+            totals = await ledger.get_totals(user_id)
+        finally:
+            await ledger.close()
+    except Exception as e:
+        # без Redis выписка всё равно разбирается — просто без сводного учёта
+        log.warning("payment_ledger_unavailable", user_id=user_id, error=str(e))
+        return ""
+    repeated = len(payments) - sum(is_new)
+    note = f"\n🔁 Уже были в прошлых выписках: {repeated}\n" if repeated else "\n"
+    return note + _format_ledger_totals(totals)
+
+
+@router.message(Command("итоги"))
+async def show_ledger_totals(message: Message):
+    ledger = PaymentLedger(settings.REDIS_DSN)
+    try:
+        await ledger.connect()
+        try:
+            if "сброс" in (message.text or ""):
+                await ledger.reset(message.from_user.id)
+                await message.answer("🧹 Сводный учёт выписок очищен")
+                return
+            totals = await ledger.get_totals(message.from_user.id)
+        finally:
+            await ledger.close()
+    except Exception as e:
+        log.warning("payment_ledger_unavailable", user_id=message.from_user.id, error=str(e))
+        await message.answer("⚠️ Сводный учёт сейчас недоступен, попробуйте позже")
+        return
+    if not totals:
+        await message.answer("📚 Пока не загружено ни одной выписки")
+        return
+    await message.answer(_format_ledger_totals(totals), parse_mode="Markdown")
+
+
+class ApplicationStates(StatesGroup):
+    waiting_registry = State()
+
+
+@router.callback_query(F.data == "match_applications")
+async def match_applications(callback: CallbackQuery, state: FSMContext):
+    if callback.from_user.id not in _bank_tables:
+        await callback.answer("Сначала пришли выписку", show_alert=True)
+        return
+    await callback.message.answer(
+        "📋 **Пришли реестр заявок** (xlsx или csv)\n\n"
+        "Нужны колонки: *Сумма*, *Валюта*, *Клиент*, *Дата*, *Номер*.",
+        parse_mode="Markdown"
+    )
+    await state.set_state(ApplicationStates.waiting_registry)
+    await callback.answer()
+
+
+@router.message(ApplicationStates.waiting_registry, F.document)
+async def process_application_registry(message: Message, state: FSMContext):
+    await state.clear()
+    table = _bank_tables.get(message.from_user.id)
+    if table is None:
+        await message.answer("Выписка уже не в памяти — пришли её заново.")
+        return
+    suffix = os.path.splitext(message.document.file_name or "")[1] or ".csv"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        file = await message.bot.get_file(message.document.file_id)
+        await message.bot.download_file(file.file_path, path)
+        applications = await asyncio.to_thread(load_applications, path)
+        result = await asyncio.to_thread(match_payments, table, applications)
+    except Exception as e:
+        log.error("application_matching_failed", user=message.from_user.id, error=str(e))
+        await message.answer(f"❌ **Не получилось сопоставить:**\n\n`{str(e)}`", parse_mode="Markdown")
+        return
+    finally:
+        os.remove(path)
+    await message.answer(format_match_report(result), parse_mode="Markdown")
+
+
 @router.message(F.document)
 async def analyze_bank_document(message: Message):
     document = message.document
-    if not (document.mime_type == 'application/pdf' or \
-            'выписка' in (document.file_name or '').lower() or \
-            'statement' in (document.file_name or '').lower()):
+    if not (document.mime_type == 'application/pdf' or get_classifier().classify(document.file_name or '').bank):
         return  # Не банковский документ
+    if not can_download(document.file_size):
+        await message.answer(
+            "❌ **Файл больше 20 МБ** — Telegram не отдаёт боту такие файлы.\n\n"
+            "Загрузите выписку на Drive или сожмите PDF.",
+            parse_mode="Markdown"
+        )
+        return
+    if document.mime_type == 'application/pdf' and is_heavy_pdf(document.file_size):
+        await _enqueue_heavy_statement(message)
+        return
     processing_msg = await message.answer(
         "🏦 **Анализирую банковский документ...**\n\n"
         "🔍 Ищу платежи и переводы..."
@@ -466,44 +658,32 @@ async def analyze_bank_document(message: Message):
         file = await message.bot.get_file(document.file_id)
         file_path = f"/tmp/{document.file_name}"
         await message.bot.download_file(file.file_path, file_path)
-        bank_ocr = BankDocumentOCR()
-        payments = await bank_ocr.process_bank_document(file_path)
         import os
-        os.remove(file_path)
+        if document.mime_type == 'application/pdf' and is_heavy_pdf(document.file_size, pdf_page_count(file_path)):
+            os.remove(file_path)
+            await processing_msg.delete()
+            await _enqueue_heavy_statement(message)
+            return
+        try:
+            # 1С/CSV-выгрузку разбираем напрямую, OCR — только если формат не распознан
+            payments = None
+            if document.mime_type != 'application/pdf':
+                payments = await asyncio.to_thread(load_statement, file_path)
+            stopped_note = ""
+            if payments is None:
+                payments, stopped_note = await _ocr_statement_payments(processing_msg, file_path)
+        finally:
+            os.remove(file_path)
         if not payments:
             await processing_msg.edit_text(
                 "🤷‍♂️ **Платежи не найдены**\n\n"
                 "Возможно, это не банковская выписка или документ плохо читается."
             )
             return
-        report = f"🏦 **Найдено платежей: {len(payments)}**\n\n"
-        total_rub = Decimal('0')
-        total_usd = Decimal('0')
-        total_eur = Decimal('0')
-        for i, payment in enumerate(payments[:10], 1):
-            report += f"**{i}.** {payment.amount} {payment.currency}\n"
-            report += f"   👤 {payment.counterparty}\n"
-            report += f"   📅 {payment.date.strftime('%d.%m.%Y')}\n"
-            if payment.account_from:
-                report += f"   💳 {payment.account_from}\n"
-            report += "\n"
-            if payment.currency == 'RUB':
-                total_rub += payment.amount
-            elif payment.currency == 'USD':
-                total_usd += payment.amount
-            elif payment.currency == 'EUR':
-                total_eur += payment.amount
-        if len(payments) > 10:
-            report += f"... и еще {len(payments) - 10} платежей\n\n"
-        report += "💰 **Итого:**\n"
-        if total_rub > 0:
-            report += f"   RUB: {total_rub:,.2f}\n"
-        if total_usd > 0:
-            report += f"   USD: {total_usd:,.2f}\n"
-        if total_eur > 0:
-            report += f"   EUR: {total_eur:,.2f}\n"
+        _bank_tables[message.from_user.id] = PaymentTable.from_payments(payments)
+        report = stopped_note + format_payments_report(payments)
+        report += await _register_statement(message.from_user.id, payments)
         await processing_msg.edit_text(report, parse_mode="Markdown")
-        from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="📊 Подробный отчет", callback_data="detailed_bank_report")],
             [InlineKeyboardButton(text="💾 Сохранить в Excel", callback_data="save_bank_excel")],
@@ -520,6 +700,35 @@ async def analyze_bank_document(message: Message):
             f"Попробуй другой файл или обратись к администратору."
         ) 
 
+
+@router.callback_query(F.data == "detailed_bank_report")
+async def detailed_bank_report(callback: CallbackQuery):
+    table = _bank_tables.get(callback.from_user.id)
+    if table is None:
+        await callback.answer("Сначала пришли выписку", show_alert=True)
+        return
+    await callback.message.answer(format_detailed_report(table), parse_mode="Markdown")
+    await callback.answer()
+
+
+@router.callback_query(F.data == "save_bank_excel")
+async def save_bank_excel(callback: CallbackQuery):
+    table = _bank_tables.get(callback.from_user.id)
+    if table is None:
+        await callback.answer("Сначала пришли выписку", show_alert=True)
+        return
+    await callback.answer("Готовлю файл...")
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write_xlsx, table, path)
+        filename = f"платежи_{datetime.now().strftime('%d.%m.%Y')}.xlsx"
+        await callback.message.answer_document(
+            FSInputFile(path, filename=filename), caption=f"💾 Платежей: {len(table)}"
+        )
+    finally:
+        os.remove(path)
+
 # --- Глобальный экземпляр notifier (инициализируется при старте) ---
 cbr_notifier: CBRNotificationService | None = None
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import re
 from aiogram import Router, F
 from aiogram.types import (
     Message,
@@ -12,6 +13,7 @@ from aiogram.types import (
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from pathlib import Path
 from typing import Dict, List, Optional
+from aiogram.filters import StateFilter
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 import tempfile
@@ -36,6 +38,7 @@ class FilenameWizard(StatesGroup):
 
 # Удаляю локальную переменную CACHE_TTL, теперь используется settings.cache_ttl
 VALID_BATCH_LIMIT = 15
+QUOTED_NAME_RE = re.compile(r'["«“]([^"«»“”\n]{2,80})["»”]')  # ООО «Ромашка»
 user_batches = defaultdict(list)  # user_id -> [FileInfo]
 user_batch_tasks = {}  # user_id -> asyncio.Task
 
@@ -47,12 +50,14 @@ class FileInfo:
     status: str  # 'ok' | 'need_wizard'
 
 
-from app.utils.filename_parser import parse_filename, FilenameInfo
+from app.utils.filename_parser import parse_filename, normalize_date, FilenameInfo
 from app.services import gdrive_handler
 from app.config import settings
 from app.services.drive import upload_file
 from app.services.ocr import run_ocr
 from app.services.analyzer import extract_parameters
+from app.services.doc_classifier import get_fresh_classifier
+from app.services.company_index import get_fresh_company_index
 from app.utils.buffers import add_file, get_batch, flush_batch, get_size, set_ttl
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from app.services.drive import ensure_folders
@@ -122,7 +127,7 @@ async def create_folder_callback(cb: CallbackQuery, state: FSMContext):
     await state.set_state("waiting_for_new_folder_name")
     await cb.answer()
 
-@router.message()
+@router.message(StateFilter("waiting_for_new_folder_name"))
 async def handle_new_folder_name(msg: Message, state: FSMContext):
     data = await state.get_data()
     if state and data.get("create_folder_parent_id") and state.state == "waiting_for_new_folder_name":
@@ -580,17 +585,27 @@ async def try_guess_filename(file_path: str, orig_name: str) -> FilenameInfo | N
         text = await run_ocr(file_path)
     except Exception:
         text = ""
-    params = extract_parameters(text)
-    # Пробуем собрать поля
-    principal = params.get("org", [None])[0]
-    doctype = next((dt for dt in ["договор", "акт", "поручение"] if dt in (text or "").lower()), None)
-    number = params.get("number", [None])[0]
+    # нужны только первые номер и дата — дальше текст не сканируем
+    params = extract_parameters(text, ("number", "date"), limit=1)
+    # Тип документа и стороны — один проход автоматом по тексту
+    found = (await get_fresh_classifier(settings.REDIS_DSN)).classify(text or "")
+    companies = list(found.companies)
+    if len(companies) < 2:
+        # имена, искажённые OCR, автомат не видит — ищем их в индексе триграмм
+        index = await get_fresh_company_index(settings.REDIS_DSN)
+        for quoted in QUOTED_NAME_RE.findall(text or ""):
+            name = index.resolve(quoted)
+            if name and name not in companies:
+                companies.append(name)
+    principal = companies[0] if companies else None
+    agent = companies[1] if len(companies) > 1 else None
+    number = re.sub(r"\D", "", params.get("number", [""])[0])
     date = params.get("date", [None])[0]
-    ext = ""
-    if orig_name:
-        ext = orig_name.split(".")[-1].lower()
-    if principal and doctype and number and date and ext:
-        return FilenameInfo(principal=principal, agent=None, doctype=doctype, number=number, date=date, ext=ext)
+    if principal and found.doctype and number and date:
+        return FilenameInfo(
+            principal=principal, agent=agent, doctype=found.doctype, number=number,
+            date=normalize_date(date), gdrive_folder=f"{principal}/{found.doctype}/{date[-4:]}"
+        )
     return None
 
 async def send_batch_summary(msg: Message, batch: list[FileInfo]):
@@ -1,11 +1,15 @@
-import asyncio, tempfile
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
-from app.services.reporter import validate_doc, build_report
-from app.utils.telegram_utils import escape_markdown
+from app.config import settings
+from app.services.drive import find_folder
+from app.services.folder_validation import job_id, validate_folder
+from app.services.tasks import run_validation_job, validate_document
 from app.utils.file_validation import validate_file, FileValidationError
 
 router = Router()
+# команды — отдельным роутером: диспетчер ставит его раньше общих обработчиков сообщений
+commands_router = Router(name="validate_commands")
 
 @router.message(F.text.startswith("🤖"))
 async def ask_doc(msg: Message):
@@ -20,17 +24,22 @@ async def run_validation(msg: Message):
         await msg.answer(f"❌ Файл не принят: {e}")
         return
 
-    with tempfile.NamedTemporaryFile(suffix=doc.file_name[-5:], delete=False) as tmp:
-        await msg.bot.download(doc, destination=tmp.name)
-
-    missings, patched_path = await asyncio.get_running_loop().run_in_executor(
-        None, validate_doc, tmp.name
-    )
-
-    if not missings:
-        await msg.answer("Ура! ❣️ Ошибок не найдено.")
-    else:
-        md_report = build_report(missings)
-        await msg.answer(escape_markdown(md_report), parse_mode="Markdown")
+    status = await msg.answer("🔎 Сверяю строки...")
+    if settings.VALIDATE_IN_WORKER:
+        # воркеры очереди validate сами скачают файл и ответят в чат
+        validate_document.delay(doc.file_id, doc.file_name, msg.chat.id, status.message_id)
+        return
+    await run_validation_job(msg.bot, doc.file_id, doc.file_name, msg.chat.id, status.message_id)
 
-    await msg.answer_document(open(patched_path, "rb"), caption="Подсветила различия 💡") 
\ No newline at end of file
+@commands_router.message(Command("validate_folder"))
+async def run_folder_validation(msg: Message, command: CommandObject):
+    # /validate_folder Ромашка/Договоры — путь от корневой папки; без пути — весь корень
+    parts = [p.strip() for p in (command.args or "").split("/") if p.strip()]
+    folder_path = "/".join(parts) or "/"
+    folder_id = await find_folder(parts)
+    if folder_id is None:
+        await msg.answer(f"❌ Папка не найдена: {folder_path}")
+        return
+    status = await msg.answer(f"📂 {folder_path}: собираю список документов...")
+    # папку сверяют только воркеры: повторный запуск продолжит с места остановки
+    validate_folder.delay(job_id(msg.chat.id, folder_id), folder_id, folder_path, msg.chat.id, status.message_id)
@@ -1,12 +1,12 @@
 
 import asyncio, logging
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from aiogram.types import BotCommand
 from app.config import get_settings
-from app.routers import main_router
-from app.handlers.menu import router as menu_router
+from app.utils.telegram_utils import make_session
+from app.routers import build_dispatcher
 from app.services.celery_app import celery_app
 import aiohttp
 from datetime import datetime, time
@@ -106,18 +106,18 @@ def build_bot() -> Bot:
     settings = get_settings()
     return Bot(
         token=settings.bot_token,
+        session=make_session(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
 async def main():
     bot = build_bot()
-    dp = Dispatcher()
-    dp.include_router(menu_router)
-    dp.include_router(main_router)
+    dp = build_dispatcher()
     await bot.set_my_commands([
         BotCommand(command="start", description="Начать 🤗"),
         BotCommand(command="menu", description="Показать меню 🥰"),
-        BotCommand(command="check_rates", description="Курсы валют ЦБ РФ")
+        BotCommand(command="check_rates", description="Курсы валют ЦБ РФ"),
+        BotCommand(command="validate_folder", description="Сверить папку Drive 📂")
     ])
     await bot.delete_webhook(drop_pending_updates=True)
 
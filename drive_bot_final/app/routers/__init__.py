@@ -2,21 +2,30 @@ from app.handlers.start import router as start_router
 from app.handlers.client_calc import router as calc_router
 from app.handlers.upload import router as upload_router
 from app.handlers.menu import router as menu_router
-from app.handlers.validate import router as validate_router
+from app.handlers.validate import router as validate_router, commands_router as validate_commands_router
 from app.handlers.drive import router as drive_router
 from app.handlers.checkdocs import router as checkdocs_router
 from app.handlers.browse import router as browse_router
 
-from aiogram import Router
+from aiogram import Dispatcher, Router
 
 main_router = Router()
 main_router.include_routers(
     start_router,
     calc_router,
     upload_router,
-    menu_router,
     validate_router,
     drive_router,
     checkdocs_router,
     browse_router,
-) 
\ No newline at end of file
+) 
+
+def build_dispatcher() -> Dispatcher:
+    # команды — раньше всех: у upload и menu есть обработчики на любое сообщение;
+    # menu — следом: его шаги FSM (реестр заявок) не должны уходить
+    # в общие обработчики документов upload
+    dp = Dispatcher()
+    dp.include_router(validate_commands_router)
+    dp.include_router(menu_router)
+    dp.include_router(main_router)
+    return dp
@@ -1,6 +1,8 @@
 
 import re, logging, textwrap
 from collections import defaultdict
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
 import structlog
 
 log = structlog.get_logger(__name__)
@@ -14,23 +16,97 @@ R_PATTERNS = {
     "currency_amount": r"\d{1,3}(?:[ \u00A0]\d{3})*(?:[.,]\d{2})?\s?(?:EUR|USD|RUB|₽|€|\$)",
 }
 
-def extract_parameters(text: str) -> dict[str, list[str]]:
+CHUNK_OVERLAP = 256    # хвост куска, который пересканируется со следующим: длиннее реквизитов не бывает
+KEY_FLAGS = re.IGNORECASE
+
+# Первый символ совпадения каждого ключа: на позиции пробуются только
+# ключи её класса, кириллица и пробелы отсекаются сразу
+KEY_START = {
+    "iban": "[A-Z]", "swift": "[A-Z]", "number": "№",
+    "account": r"\d", "date": r"\d", "currency_amount": r"\d",
+}
+
+# Один проход вместо findall по каждому шаблону. Каждый ключ — захват в
+# опережающей проверке, так что на одной позиции срабатывают сразу
+# несколько ключей и совпадения разных ключей могут перекрываться, как
+# при отдельных findall. Условие в конце пропускает позиции, где не
+# совпал ни один ключ, — без Python-объекта на каждый символ текста.
+@lru_cache(16)
+def _compile(keys: tuple[str, ...]):
+    by_start: dict[str, list[str]] = defaultdict(list)
+    for n, key in enumerate(keys):
+        by_start[KEY_START[key]].append(f"(?=(?P<k{n}>{R_PATTERNS[key]}))?")
+    tail = "(?!)"
+    for n in reversed(range(len(keys))):
+        tail = f"(?(k{n})|{tail})"
+    branches = "|".join(f"(?={start})(?:{''.join(parts)})" for start, parts in by_start.items())
+    pattern = re.compile(f"(?:{branches}){tail}", KEY_FLAGS)
+    groups = []
+    for n, key in enumerate(keys):
+        whole = pattern.groupindex[f"k{n}"]
+        # findall отдаёт всё совпадение или единственную группу шаблона (swift)
+        groups.append((key, whole, whole + 1 if re.compile(R_PATTERNS[key]).groups == 1 else whole))
+    return pattern, groups
+
+def iter_parameters(chunks: Iterable[str], keys: Optional[Iterable[str]] = None) -> Iterator[tuple[str, str]]:
+    """(ключ, значение) по порядку текста; текст можно подавать кусками."""
+    pattern, groups = _compile(tuple(keys or R_PATTERNS))
+    last_end = {key: 0 for key, _, _ in groups}
+    buf, base, scan_from = "", 0, 0     # base — позиция buf[0] в общем тексте
+
+    def scan(final: bool):
+        nonlocal buf, base, scan_from
+        # совпадения у конца куска могут продолжаться в следующем — их ищем позже
+        stop = len(buf) if final else len(buf) - CHUNK_OVERLAP
+        if stop <= scan_from:
+            return
+        for m in pattern.finditer(buf, scan_from):
+            if m.start() >= stop:
+                break
+            pos = base + m.start()
+            for key, whole, value in groups:
+                if m.start(whole) >= 0 and pos >= last_end[key]:
+                    last_end[key] = base + m.end(whole)
+                    yield key, m.group(value) or ""
+        # один символ до непросканированного хвоста оставляем как контекст для \b
+        buf, base, scan_from = buf[stop - 1:], base + stop - 1, 1
+
+    for chunk in chunks:
+        buf += chunk
+        yield from scan(final=False)
+    yield from scan(final=True)
+
+def extract_parameters(text: str | Iterable[str], keys: Optional[Iterable[str]] = None,
+                       limit: Optional[int] = None) -> dict[str, list[str]]:
+    """Реквизиты по ключам R_PATTERNS; `limit` — хватит стольких значений каждого ключа."""
     try:
+        keys = tuple(keys or R_PATTERNS)
         res = defaultdict(list)
-        for key, pattern in R_PATTERNS.items():
-            for m in re.findall(pattern, text, flags=re.IGNORECASE):
-                res[key].append(m.strip())
+        filled = 0
+        parts = iter_parameters([text] if isinstance(text, str) else text, keys)
+        for key, value in parts:
+            if limit and len(res[key]) >= limit:
+                continue
+            res[key].append(value.strip())
+            if limit and len(res[key]) == limit:
+                filled += 1
+                if filled == len(keys):
+                    parts.close()
+                    break
+        res = {k: res[k] for k in keys if res.get(k)}
         log.info("parameters_extracted", keys=list(res.keys()), count=sum(len(v) for v in res.values()))
-        return dict(res)
+        return res
     except Exception as e:
         log.error("extract_parameters_failed", error=str(e))
         return {}
 
 def compare_ru_en(ru_text: str, en_text: str) -> list[str]:
     issues = []
-    ru_params = extract_parameters(ru_text)
-    en_params = extract_parameters(en_text)
-    for key in {"iban","swift","account","number","date"}:
+    keys = ("iban", "swift", "account", "number", "date")
+    # сравниваются только первые значения — дальше текст не сканируем
+    ru_params = extract_parameters(ru_text, keys, limit=1)
+    en_params = extract_parameters(en_text, keys, limit=1)
+    for key in keys:
         ru_val = ru_params.get(key, ["не найден"])[0]
         en_val = en_params.get(key, ["не найден"])[0]
         if ru_val != en_val:
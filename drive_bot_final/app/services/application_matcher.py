@@ -0,0 +1,240 @@
+"""Сопоставление платежей выписки с заявками клиентов.
+
+Заявки индексируются по (сумма в копейках, валюта, день): для платежа
+кандидаты — заявки с той же суммой и валютой в окне ±`window_days`,
+то есть 2·window+1 поисков в словаре вместо обхода всех заявок. Нечёткое
+сравнение имени контрагента (rapidfuzz) идёт только внутри этих корзин,
+поэтому 10k × 10k сводится к десяткам тысяч сравнений строк, а не к 10⁸.
+
+Назначение жадное и взаимно-однозначное: пары идут от лучшей оценки к
+худшей, заявка достаётся одному платежу. Если у платежа есть почти
+такая же свободная заявка (оценки ближе `AMBIGUITY_MARGIN`, тот же
+разрыв в днях) — автоматически не решаем, платёж уходит в «спорные».
+Платёж без даты (`date_parsed=False`) окна не имеет: его кандидаты —
+все заявки с той же суммой и валютой, разрыв считается нулевым.
+"""
+import csv
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+
+import openpyxl
+import structlog
+from rapidfuzz import fuzz
+from rapidfuzz.utils import default_process
+
+from app.services.bank_ocr_service import BankPayment
+from app.services.payment_table import EPOCH_ORDINAL, MINOR_UNITS, NO_DAY, NO_DAY_LABEL, PaymentTable
+from app.services.statement_import import parse_amount, parse_date
+
+log = structlog.get_logger(__name__)
+
+WINDOW_DAYS = 3
+MIN_SCORE = 80.0                # token_set_ratio, 0..100
+AMBIGUITY_MARGIN = 5.0
+NO_DATE = None                  # заявки без даты попадают в корзину любого дня, платежи без даты — во все корзины
+
+_LEGAL_FORMS = re.compile(r"\b(?:ооо|оао|зао|пао|ао|ип|нко|llc|ltd|inc|gmbh)\b")
+
+# Колонки реестра заявок → поле Application
+APPLICATION_COLUMNS = {
+    "amount": ["сумма", "сумма заявки", "amount"],
+    "currency": ["валюта", "currency"],
+    "client": ["клиент", "контрагент", "плательщик", "client", "counterparty"],
+    "date": ["дата", "дата заявки", "дата оплаты", "date"],
+    "number": ["номер", "№", "№ заявки", "номер заявки", "number"],
+}
+
+
+@dataclass
+class Application:
+    amount: Decimal
+    currency: str
+    client: str
+    date: Optional[datetime] = None
+    number: str = ""
+
+
+@dataclass
+class Match:
+    payment: BankPayment
+    application: Application
+    score: float
+    days: int                   # |дата платежа − дата заявки|, 0 для заявки без даты
+
+
+@dataclass
+class Ambiguous:
+    payment: BankPayment
+    candidates: list[tuple[Application, float]]
+
+
+@dataclass
+class MatchResult:
+    matched: list[Match] = field(default_factory=list)
+    ambiguous: list[Ambiguous] = field(default_factory=list)
+    unmatched_payments: list[BankPayment] = field(default_factory=list)
+    unmatched_applications: list[Application] = field(default_factory=list)
+
+
+def normalize_name(name: str) -> str:
+    """Имя без ОПФ, кавычек и регистра: «ООО "Ромашка"» → «ромашка»."""
+    return " ".join(_LEGAL_FORMS.sub(" ", default_process(name)).split())
+
+
+class ApplicationIndex:
+    def __init__(self, applications: list[Application]):
+        self.applications = applications
+        self.names = [normalize_name(a.client) for a in applications]
+        self._buckets: dict[tuple, list[int]] = {}
+        self._by_amount: dict[tuple, list[int]] = {}
+        for i, a in enumerate(applications):
+            day = a.date.toordinal() - EPOCH_ORDINAL if a.date else NO_DATE
+            amount = (int((a.amount * MINOR_UNITS).to_integral_value()), a.currency.upper())
+            self._buckets.setdefault((*amount, day), []).append(i)
+            self._by_amount.setdefault(amount, []).append(i)
+
+    def candidates(self, amount_minor: int, currency: str, day: Optional[int],
+                   window: int) -> Iterator[tuple[int, int]]:
+        """(номер заявки, разрыв в днях) для суммы и валюты в окне дат."""
+        if day is NO_DATE:
+            for i in self._by_amount.get((amount_minor, currency), ()):
+                yield i, 0
+            return
+        for i in self._buckets.get((amount_minor, currency, NO_DATE), ()):
+            yield i, 0
+        for delta in range(-window, window + 1):
+            for i in self._buckets.get((amount_minor, currency, day + delta), ()):
+                yield i, abs(delta)
+
+
+def match_payments(table: PaymentTable, applications: list[Application],
+                   window_days: int = WINDOW_DAYS, min_score: float = MIN_SCORE) -> MatchResult:
+    index = ApplicationIndex(applications)
+    payer_names = [normalize_name(n) for n in table.counterparties]
+    days = [NO_DATE if d == NO_DAY else d for d in table.dates.astype("int64").tolist()]
+    amounts = table.amount_minor.tolist()
+    currencies = table.currency_codes.tolist()
+    counterparties = table.counterparty_codes.tolist()
+
+    # кандидаты каждого платежа: (оценка, разрыв в днях, номер заявки)
+    scored: list[list[tuple[float, int, int]]] = []
+    pairs: list[tuple[float, int, int, int]] = []
+    for p in range(len(table)):
+        name = payer_names[counterparties[p]]
+        cands = []
+        for a, gap in index.candidates(amounts[p], table.currencies[currencies[p]], days[p], window_days):
+            score = fuzz.token_set_ratio(name, index.names[a], processor=None)
+            if score >= min_score:
+                cands.append((score, gap, a))
+                pairs.append((score, gap, p, a))
+        cands.sort(key=lambda c: (-c[0], c[1]))
+        scored.append(cands)
+
+    matched: dict[int, Match] = {}
+    ambiguous: dict[int, Ambiguous] = {}
+    used_apps: set[int] = set()
+    pairs.sort(key=lambda c: (-c[0], c[1]))
+    for score, gap, p, a in pairs:
+        if p in matched or p in ambiguous or a in used_apps:
+            continue
+        rivals = [c for c in scored[p]
+                  if c[2] != a and c[2] not in used_apps and c[0] > score - AMBIGUITY_MARGIN and c[1] == gap]
+        if rivals:
+            ambiguous[p] = Ambiguous(
+                table.row(p), [(applications[a], score)] + [(applications[c[2]], c[0]) for c in rivals]
+            )
+            continue
+        used_apps.add(a)
+        matched[p] = Match(table.row(p), applications[a], score, gap)
+    # результат — в порядке строк выписки, а не в порядке оценок
+    result = MatchResult(
+        matched=[matched[p] for p in sorted(matched)],
+        ambiguous=[ambiguous[p] for p in sorted(ambiguous)],
+    )
+    result.unmatched_payments = [table.row(p) for p in range(len(table)) if p not in matched and p not in ambiguous]
+    # заявки из спорных остаются свободными — их тоже надо разобрать руками
+    result.unmatched_applications = [a for i, a in enumerate(applications) if i not in used_apps]
+    log.info("applications_matched", payments=len(table), applications=len(applications),
+             matched=len(result.matched), ambiguous=len(result.ambiguous))
+    return result
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _iter_registry_rows(path: str) -> Iterator[list]:
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from (list(row) for row in wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("cp1251")
+    lines = text.splitlines()
+    first = lines[0] if lines else ""
+    yield from csv.reader(lines, delimiter=";" if first.count(";") >= first.count(",") else ",")
+
+
+def load_applications(path: str) -> list[Application]:
+    """Реестр заявок из xlsx или csv; строки без суммы пропускаются."""
+    rows = _iter_registry_rows(path)
+    header = [_cell(c).lower() for c in next(rows, [])]
+    index = {}
+    for name, aliases in APPLICATION_COLUMNS.items():
+        for i, column in enumerate(header):
+            if column in aliases:
+                index[name] = i
+                break
+    if "amount" not in index:
+        raise ValueError("В реестре нет колонки «Сумма»")
+
+    def get(row: list, name: str):
+        i = index.get(name)
+        return row[i] if i is not None and i < len(row) else None
+
+    applications = []
+    for row in rows:
+        amount = get(row, "amount")
+        amount = Decimal(str(amount)) if isinstance(amount, (int, float)) else parse_amount(_cell(amount))
+        if amount is None:
+            continue
+        date = get(row, "date")
+        applications.append(Application(
+            amount=abs(amount).quantize(Decimal("0.01")),
+            currency=(_cell(get(row, "currency")) or "RUB").upper().replace("RUR", "RUB"),
+            client=_cell(get(row, "client")),
+            date=date if isinstance(date, datetime) else parse_date(_cell(date)),
+            number=_cell(get(row, "number")),
+        ))
+    return applications
+
+
+def format_match_report(result: MatchResult, limit: int = 10) -> str:
+    report = (
+        "📋 **Сопоставление с заявками**\n\n"
+        f"✅ Сопоставлено: {len(result.matched)}\n"
+        f"❓ Спорных: {len(result.ambiguous)}\n"
+        f"💸 Платежей без заявки: {len(result.unmatched_payments)}\n"
+        f"📄 Заявок без оплаты: {len(result.unmatched_applications)}\n"
+    )
+    if result.ambiguous:
+        report += "\n❓ **Спорные:**\n"
+        for item in result.ambiguous[:limit]:
+            numbers = ", ".join(a.number or a.client for a, _ in item.candidates)
+            report += f"   {item.payment.amount} {item.payment.currency} {item.payment.counterparty} → {numbers}\n"
+    if result.unmatched_payments:
+        report += "\n💸 **Без заявки:**\n"
+        for p in result.unmatched_payments[:limit]:
+            day = p.date.strftime('%d.%m.%Y') if p.date_parsed else NO_DAY_LABEL
+            report += f"   {p.amount} {p.currency} {p.counterparty} ({day})\n"
+    return report
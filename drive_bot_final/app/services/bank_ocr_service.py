@@ -1,13 +1,11 @@
 import asyncio
 import re
-from typing import Dict, List, Optional
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
 from dataclasses import dataclass
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
-import fitz  # PyMuPDF для PDF
-import pytesseract
-from PIL import Image
-import io
+from app.services.page_engine import PageKind, PageResult, iter_pages, open_document
 
 @dataclass
 class BankPayment:
@@ -19,151 +17,285 @@ class BankPayment:
     account_from: str
     account_to: str
     reference: Optional[str] = None
+    date_parsed: bool = True        # False — даты в документе нет, в `date` подставлено «сейчас»
+
+
+@dataclass
+class PagePayments:
+    """Платежи, дочитанные после очередной страницы (page=None — хвост документа)."""
+    page: Optional[PageResult]
+    page_count: int
+    payments: List[BankPayment]
+
+# Атомарная группа: у числа одно место, где может стоять [,.], поэтому
+# перебор разбиений длинных цифровых строк (счетов) ничего не даёт
+_NUM = r'(?>\d+(?:\s?\d{3})*)[,\.]\d{2}'
+_DATE = r'\d{1,2}[\.\/]\d{1,2}[\.\/]\d{2,4}'
+_CODES = r'RUB|USD|EUR|CNY'
+
+# Все поля блока за один проход: каждая ветка — lookahead, поэтому
+# совпадения разных полей могут перекрываться (сумма внутри «Сумма: ...»,
+# дата внутри «Дата: ...»), а по lastgroup понятно, какая ветка сработала.
+# Порядок веток внутри поля — прежний приоритет шаблонов. Сумму с валютой
+# ищем только с начала цифровой строки: самое левое совпадение всё равно
+# начинается там, а проверка с каждой цифры счёта и стоила больше всего.
+_DIGIT_BRANCHES = [
+    rf'(?<!\d)(?=(?P<amount_cur>(?P<ac_num>{_NUM})\s*(?P<ac_cur>(?i:руб|рублей|USD|EUR|CNY))))',
+    r'(?<!\d)(?=(?P<account>\d{20})(?!\d))',
+    rf'(?=(?P<date>{_DATE}))',
+]
+_LABEL_BRANCHES = [
+    rf'(?=(?P<amount_label>(?i:Сумма:?\s*)(?P<al_num>{_NUM})))',
+    rf'(?=(?P<amount_due>(?i:К\s*доплате:?\s*)(?P<ad_num>{_NUM})))',
+    rf'(?=(?P<currency_label>(?i:Валюта:?\s*)(?P<cl_cur>(?i:{_CODES}))))',
+    rf'(?=(?P<date_label>Дата:?\s*(?P<dl_date>{_DATE})))',
+    r'(?=(?P<counterparty>(?i:(?:ООО|ИП|ЗАО|ОАО|АО)\s+"?)(?P<cp_name>[^"\n\r]{3,50})"?))',
+    r'(?=(?P<payer>(?i:Плательщик:?\s*)(?P<payer_name>[^\n\r]{10,80})))',
+    r'(?=(?P<payee>(?i:Получатель:?\s*)(?P<payee_name>[^\n\r]{10,80})))',
+]
+# Общая проверка первого символа перед группой веток: на позициях, где
+# не может начаться ни одно поле, движок не перебирает все ветки подряд
+_SCANNER = re.compile(
+    rf'(?=\d)(?:{"|".join(_DIGIT_BRANCHES)})'
+    rf'|(?=(?i:[СКВДОИЗАП]))(?:{"|".join(_LABEL_BRANCHES)})'
+)
+# Ветки, способные совпасть в той же позиции, что и более ранняя
+_ACCOUNT_AT = re.compile(r'\d{20}(?!\d)')
+_DATE_STRICT_AT = re.compile(r'\d{2}\.\d{2}\.\d{4}')
+_DATE_FORMATS = ['%d.%m.%Y', '%d/%m/%Y', '%d.%m.%y']
+
+# Разделители блоков одним шаблоном. Их совпадения не перекрываются, поэтому
+# один проход finditer режет так же, как прежние пять re.split подряд
+_BLOCK_SEPARATORS = re.compile(
+    r'(?m:^\s*\d+\.\s*)|Операция\s*№|Документ\s*№|={20,}|-{20,}'
+)
+MIN_BLOCK_CHARS = 50
+
+
+class PaymentBlockSplitter:
+    """Режет текст выписки на блоки платежей по мере поступления страниц.
+
+    Хвост после последнего разделителя (вместе с самим разделителем —
+    он может продолжиться на следующей странице) переносится в следующий
+    `feed`; строки режутся только по найденным смещениям. Итератор,
+    который вернул `feed`, нужно дочитать до конца перед следующим вызовом.
+    """
+    def __init__(self):
+        self._tail = ""
+
+    def _blocks(self, text: str, final: bool) -> Iterator[str]:
+        prev_end, last_start = 0, None
+        for m in _BLOCK_SEPARATORS.finditer(text):
+            block = text[prev_end:m.start()].strip()
+            if len(block) > MIN_BLOCK_CHARS:
+                yield block
+            prev_end, last_start = m.end(), m.start()
+        if final:
+            block = text[prev_end:].strip()
+            if len(block) > MIN_BLOCK_CHARS:
+                yield block
+            self._tail = ""
+        elif last_start is not None:
+            self._tail = text[last_start:]
+        else:
+            self._tail = text
+
+    def feed(self, text: str) -> Iterator[str]:
+        return self._blocks(self._tail + text, final=False)
+
+    def close(self) -> Iterator[str]:
+        return self._blocks(self._tail, final=True)
+
+
+def iter_payment_blocks(text: str) -> Iterator[str]:
+    splitter = PaymentBlockSplitter()
+    yield from splitter.feed(text)
+    yield from splitter.close()
+
 
 class BankDocumentOCR:
     def __init__(self):
         self.tesseract_config = r'--oem 3 --psm 6 -l rus+eng'
-        self.patterns = {
-            'amount': [
-                r'(\d+(?:\s?\d{3})*[,\.]\d{2})\s*(?:руб|рублей|USD|EUR|CNY)',
-                r'Сумма:?\s*(\d+(?:\s?\d{3})*[,\.]\d{2})',
-                r'К\s*доплате:?\s*(\d+(?:\s?\d{3})*[,\.]\d{2})'
-            ],
-            'currency': [
-                r'(\d+(?:\s?\d{3})*[,\.]\d{2})\s*(руб|рублей|USD|EUR|CNY)',
-                r'Валюта:?\s*(RUB|USD|EUR|CNY)'
-            ],
-            'account': [
-                r'Счет:?\s*(\d{20})',
-                r'Р/?с\s*(\d{20})',
-                r'(\d{20})'
-            ],
-            'date': [
-                r'(\d{1,2}[\.\/]\d{1,2}[\.\/]\d{2,4})',
-                r'Дата:?\s*(\d{1,2}[\.\/]\d{1,2}[\.\/]\d{2,4})',
-                r'(\d{2}\.\d{2}\.\d{4})'
-            ],
-            'counterparty': [
-                r'(?:ООО|ИП|ЗАО|ОАО|АО)\s+"?([^"\n\r]{3,50})"?',
-                r'Плательщик:?\s*([^\n\r]{10,80})',
-                r'Получатель:?\s*([^\n\r]{10,80})'
-            ]
-        }
     async def process_bank_document(self, file_path: str) -> List[BankPayment]:
         try:
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(None, self._process_document_sync, file_path)
         except Exception as e:
             raise Exception(f"Ошибка обработки банковского документа: {str(e)}")
-    def _process_document_sync(self, file_path: str) -> List[BankPayment]:
-        doc = fitz.open(file_path)
-        all_text = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text()
-            if len(text.strip()) < 100:
-                text = self._ocr_page(page)
-            all_text.append(text)
-        doc.close()
-        full_text = "\n\n".join(all_text)
-        payments = self._extract_payments(full_text)
-        return payments
-    def _ocr_page(self, page) -> str:
+    async def iter_page_payments(self, file_path: str) -> AsyncIterator[PagePayments]:
+        """Платежи постранично, по мере распознавания.
+
+        Страницы разбираются в потоке, готовые пачки передаются в цикл
+        событий через очередь. Если потребитель вышел из цикла раньше
+        (отмена), поток останавливается после текущей страницы.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for batch in self._iter_page_payments(file_path, stop):
+                    loop.call_soon_threadsafe(queue.put_nowait, batch)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        producer = loop.run_in_executor(None, produce)
         try:
-            mat = fitz.Matrix(2.0, 2.0)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("ppm")
-            img = Image.open(io.BytesIO(img_data))
-            text = pytesseract.image_to_string(img, config=self.tesseract_config)
-            return text
-        except Exception:
-            return ""
-    def _extract_payments(self, text: str) -> List[BankPayment]:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise Exception(f"Ошибка обработки банковского документа: {str(item)}")
+                yield item
+        finally:
+            stop.set()
+            await producer
+    def _iter_page_payments(self, file_path: str, stop: Optional[threading.Event] = None) -> Iterator[PagePayments]:
+        splitter = PaymentBlockSplitter()
+        sep = ""
+        with open_document(file_path) as doc:
+            pages = iter_pages(doc, tesseract_config=self.tesseract_config)
+            try:
+                for page in pages:
+                    blocks: List[str] = []
+                    if page.kind != PageKind.BLANK:
+                        blocks = list(splitter.feed(sep + page.text))
+                        sep = "\n\n"
+                    yield PagePayments(page, doc.page_count, self._payments_from_blocks(blocks))
+                    if stop is not None and stop.is_set():
+                        return
+            finally:
+                pages.close()
+            # последний блок выписки становится полным только в конце документа
+            yield PagePayments(None, doc.page_count, self._payments_from_blocks(splitter.close()))
+    def _process_document_sync(
+        self, file_path: str, on_page: Optional[Callable[[PageResult, int], None]] = None
+    ) -> List[BankPayment]:
+        payments = []
+        for batch in self._iter_page_payments(file_path):
+            payments.extend(batch.payments)
+            if on_page and batch.page:
+                on_page(batch.page, batch.page_count)
+        return payments
+    def _payments_from_blocks(self, blocks: Iterable[str]) -> List[BankPayment]:
         payments = []
-        blocks = self._split_into_payment_blocks(text)
         for block in blocks:
             payment = self._extract_single_payment(block)
             if payment:
                 payments.append(payment)
         return payments
+    def _extract_payments(self, text: str) -> List[BankPayment]:
+        return self._payments_from_blocks(iter_payment_blocks(text))
     def _split_into_payment_blocks(self, text: str) -> List[str]:
-        separators = [
-            r'^\s*\d+\.\s*',
-            r'Операция\s*№',
-            r'Документ\s*№',
-            r'={20,}',
-            r'-{20,}'
-        ]
-        blocks = [text]
-        for separator in separators:
-            new_blocks = []
-            for block in blocks:
-                parts = re.split(separator, block, flags=re.MULTILINE)
-                new_blocks.extend([part.strip() for part in parts if part.strip()])
-            blocks = new_blocks
-        return [block for block in blocks if len(block) > 50]
+        return list(iter_payment_blocks(text))
+    def _scan_block(self, text: str) -> tuple[Dict[str, re.Match], List[str]]:
+        """Первое совпадение каждой ветки сканера и все счета по порядку появления."""
+        first: Dict[str, re.Match] = {}
+        accounts: List[str] = []
+        for m in _SCANNER.finditer(text):
+            kind = m.lastgroup
+            if kind == 'account':
+                if m['account'] not in accounts:
+                    accounts.append(m['account'])
+                continue
+            if kind == 'amount_cur':
+                account = _ACCOUNT_AT.match(text, m.start())
+                if account and (m.start() == 0 or not text[m.start() - 1].isdigit()) \
+                        and account.group() not in accounts:
+                    accounts.append(account.group())
+            elif kind == 'date' and 'date_strict' not in first:
+                strict = _DATE_STRICT_AT.match(text, m.start())
+                if strict:
+                    first['date_strict'] = strict
+            if kind not in first:
+                first[kind] = m
+        return first, accounts
+
     def _extract_single_payment(self, text: str) -> Optional[BankPayment]:
         try:
-            amount = self._extract_amount(text)
+            first, accounts = self._scan_block(text)
+            amount = self._extract_amount(first)
             if not amount:
                 return None
-            currency = self._extract_currency(text)
-            date = self._extract_date(text)
-            counterparty = self._extract_counterparty(text)
-            accounts = self._extract_accounts(text)
-            account_from = accounts[0] if len(accounts) > 0 else ""
-            account_to = accounts[1] if len(accounts) > 1 else ""
-            purpose = text[:100].replace('\n', ' ').strip()
+            date = self._extract_date(first)
             return BankPayment(
                 amount=amount,
-                currency=currency,
-                counterparty=counterparty,
-                purpose=purpose,
-                date=date,
-                account_from=account_from,
-                account_to=account_to
+                currency=self._extract_currency(first),
+                counterparty=self._extract_counterparty(first),
+                purpose=text[:100].replace('\n', ' ').strip(),
+                date=date or datetime.now(),
+                account_from=accounts[0] if len(accounts) > 0 else "",
+                account_to=accounts[1] if len(accounts) > 1 else "",
+                date_parsed=date is not None,
             )
         except Exception:
             return None
-    def _extract_amount(self, text: str) -> Optional[Decimal]:
-        for pattern in self.patterns['amount']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount_str = match.group(1).replace(' ', '').replace(',', '.')
+    def _extract_amount(self, first: Dict) -> Optional[Decimal]:
+        for kind, group in (('amount_cur', 'ac_num'), ('amount_label', 'al_num'), ('amount_due', 'ad_num')):
+            if kind in first:
+                amount_str = first[kind][group].replace(' ', '').replace(',', '.')
                 try:
                     return Decimal(amount_str)
-                except:
+                except InvalidOperation:
                     continue
         return None
-    def _extract_currency(self, text: str) -> str:
-        for pattern in self.patterns['currency']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                currency = match.group(2).upper()
-                if currency in ['РУБЛЕЙ', 'РУБ']:
-                    return 'RUB'
-                return currency
+    def _extract_currency(self, first: Dict) -> str:
+        if 'amount_cur' in first:
+            currency = first['amount_cur']['ac_cur'].upper()
+            if currency in ['РУБЛЕЙ', 'РУБ']:
+                return 'RUB'
+            return currency
+        if 'currency_label' in first:
+            return first['currency_label']['cl_cur'].upper()
         return 'RUB'
-    def _extract_date(self, text: str) -> Optional[datetime]:
-        for pattern in self.patterns['date']:
-            match = re.search(pattern, text)
-            if match:
-                date_str = match.group(1)
-                for fmt in ['%d.%m.%Y', '%d/%m/%Y', '%d.%m.%y']:
+    def _extract_date(self, first: Dict) -> Optional[datetime]:
+        candidates = [
+            first['date']['date'] if 'date' in first else None,
+            first['date_label']['dl_date'] if 'date_label' in first else None,
+            first['date_strict'].group() if 'date_strict' in first else None,
+        ]
+        for date_str in candidates:
+            if date_str:
+                for fmt in _DATE_FORMATS:
                     try:
                         return datetime.strptime(date_str, fmt)
-                    except:
+                    except ValueError:
                         continue
-        return datetime.now()
-    def _extract_counterparty(self, text: str) -> str:
-        for pattern in self.patterns['counterparty']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        return None
+    def _extract_counterparty(self, first: Dict) -> str:
+        for kind, group in (('counterparty', 'cp_name'), ('payer', 'payer_name'), ('payee', 'payee_name')):
+            if kind in first:
+                return first[kind][group].strip()
         return "Не определен"
-    def _extract_accounts(self, text: str) -> List[str]:
-        accounts = []
-        for pattern in self.patterns['account']:
-            matches = re.findall(pattern, text)
-            accounts.extend(matches)
-        return list(set(accounts)) 
\ No newline at end of file
+
+def format_payments_report(payments: List[BankPayment], limit: int = 10) -> str:
+    """Markdown-отчёт для чата: первые `limit` платежей и итоги по валютам."""
+    report = f"🏦 **Найдено платежей: {len(payments)}**\n\n"
+    total_rub = Decimal('0')
+    total_usd = Decimal('0')
+    total_eur = Decimal('0')
+    for i, payment in enumerate(payments, 1):
+        if i <= limit:
+            report += f"**{i}.** {payment.amount} {payment.currency}\n"
+            report += f"   👤 {payment.counterparty}\n"
+            report += f"   📅 {payment.date.strftime('%d.%m.%Y')}\n"
+            if payment.account_from:
+                report += f"   💳 {payment.account_from}\n"
+            report += "\n"
+        if payment.currency == 'RUB':
+            total_rub += payment.amount
+        elif payment.currency == 'USD':
+            total_usd += payment.amount
+        elif payment.currency == 'EUR':
+            total_eur += payment.amount
+    if len(payments) > limit:
+        report += f"... и еще {len(payments) - limit} платежей\n\n"
+    report += "💰 **Итого:**\n"
+    if total_rub > 0:
+        report += f"   RUB: {total_rub:,.2f}\n"
+    if total_usd > 0:
+        report += f"   USD: {total_usd:,.2f}\n"
+    if total_eur > 0:
+        report += f"   EUR: {total_eur:,.2f}\n"
+    return report
@@ -4,5 +4,9 @@ from app.config import settings
 celery_app = Celery(
     "docbot",
     broker=settings.REDIS_DSN,
-    backend=settings.REDIS_DSN
-) 
\ No newline at end of file
+    backend=settings.REDIS_DSN,
+    include=["app.services.heavy_docs", "app.services.tasks", "app.services.folder_validation"],
+)
+# Тяжёлые PDF (OCR сотен страниц) — в отдельную очередь со своими воркерами,
+# чтобы не занимать воркеры быстрых задач; сверка документов — в очередь validate
+celery_app.conf.task_routes = {"heavy.*": {"queue": "heavy"}, "validate.*": {"queue": "validate"}}
@@ -0,0 +1,192 @@
+"""Распознанное OCR имя компании → известный контрагент.
+
+OCR путает латиницу с кириллицей (`ООО "ДeмиpeкC"`), теряет кавычки и
+формы собственности, поэтому точное совпадение с именами из Redis
+(`companies_frequency`, туда пишет `AutocompleteService.remember_company`)
+почти не срабатывает. Имена приводятся к «скелету»: похожие латинские
+буквы заменяются кириллическими, регистр, ё, пунктуация и ООО/АО/ИП
+отбрасываются. Скелет режется на триграммы, по ним — обратный индекс.
+
+Поиск — коэффициент Дайса по множествам триграмм. Триграммы запроса
+идут от редких к частым; кандидат, не встретившийся в первых k из q,
+делит с запросом не больше q − k триграмм, то есть его оценка не выше
+2(q − k)/(2q − k). Как только эта граница падает ниже `min_score` или
+худшего из уже найденных `limit` лучших, новых кандидатов не ищем:
+частые триграммы («строй», «инвест») почти никогда не перебираются,
+а результат тот же, что у полного перебора.
+
+Набор компаний обновляется из Redis инкрементально, не чаще раза
+в `REFRESH_INTERVAL` секунд.
+"""
+import heapq
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Iterable, Mapping, NamedTuple, Optional, Union
+
+import redis.asyncio as aioredis
+import structlog
+
+log = structlog.get_logger(__name__)
+
+COMPANIES_KEY = "companies_frequency"
+MIN_SCORE = 0.6                 # Дайс по триграммам, 0..1
+LIMIT = 5
+REFRESH_INTERVAL = 300
+
+# Латиница, которую OCR путает с кириллицей (до перевода в нижний регистр)
+HOMOGLYPHS = str.maketrans({
+    "A": "А", "B": "В", "C": "С", "E": "Е", "H": "Н", "K": "К", "M": "М",
+    "O": "О", "P": "Р", "T": "Т", "X": "Х", "Y": "У",
+    "a": "а", "c": "с", "e": "е", "k": "к", "o": "о", "p": "р", "x": "х", "y": "у",
+    "Ё": "Е", "ё": "е",
+})
+_LEGAL_FORMS = ["ооо", "оао", "зао", "пао", "ао", "ип", "нко", "llc", "ltd", "inc", "gmbh"]
+_NOISE = re.compile(r"[\W_]+")
+_LEGAL = re.compile(r"\b(?:%s)\b" % "|".join(f.translate(HOMOGLYPHS) for f in _LEGAL_FORMS))
+
+
+def skeleton(name: str) -> str:
+    """`ООО «ДeмиpeкC»` и `Демирекс` → `демирекс`."""
+    text = unicodedata.normalize("NFKC", name).translate(HOMOGLYPHS).lower()
+    text = _LEGAL.sub(" ", _NOISE.sub(" ", text))
+    return " ".join(text.split())
+
+
+def trigrams(key: str) -> frozenset[str]:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class Candidate(NamedTuple):
+    name: str
+    score: float
+
+
+class CompanyIndex:
+    def __init__(self):
+        self._postings: defaultdict[str, set[int]] = defaultdict(set)
+        self._grams: dict[int, frozenset[str]] = {}
+        self._names: dict[int, str] = {}
+        self._weights: dict[int, float] = {}
+        self._ids: dict[str, int] = {}        # скелет → id
+        self._next_id = 0
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _add(self, key: str, name: str, weight: float):
+        i = self._next_id
+        self._next_id += 1
+        self._ids[key] = i
+        self._names[i] = name
+        self._weights[i] = weight
+        self._grams[i] = grams = trigrams(key)
+        for gram in grams:
+            self._postings[gram].add(i)
+
+    def _remove(self, key: str):
+        i = self._ids.pop(key)
+        for gram in self._grams.pop(i):
+            posting = self._postings[gram]
+            posting.discard(i)
+            if not posting:
+                del self._postings[gram]
+        del self._names[i], self._weights[i]
+
+    def update_companies(self, names: Union[Mapping[str, float], Iterable[str]]) -> bool:
+        """Приводит индекс к `names` (имя → частота); True, если набор изменился."""
+        if not isinstance(names, Mapping):
+            names = dict.fromkeys(names, 0.0)
+        wanted: dict[str, tuple[str, float]] = {}
+        for name, weight in names.items():
+            key = skeleton(name)
+            # из одинаковых скелетов остаётся самое частое написание
+            if key and (key not in wanted or weight > wanted[key][1]):
+                wanted[key] = (name, weight)
+        removed = [k for k in self._ids if k not in wanted]
+        added = [k for k in wanted if k not in self._ids]
+        for key in removed:
+            self._remove(key)
+        for key in added:
+            self._add(key, *wanted[key])
+        for key, i in self._ids.items():
+            self._names[i], self._weights[i] = wanted[key]
+        if removed or added:
+            log.info("company_index_updated", added=len(added), removed=len(removed), total=len(self._ids))
+        return bool(removed or added)
+
+    def lookup(self, query: str, limit: int = LIMIT, min_score: float = MIN_SCORE) -> list[Candidate]:
+        """До `limit` известных компаний с оценкой ≥ `min_score`, лучшие первыми."""
+        key = skeleton(query)
+        if not key:
+            return []
+        exact = self._ids.get(key)
+        if exact is not None and limit == 1:
+            return [Candidate(self._names[exact], 1.0)]
+        grams = trigrams(key)
+        q = len(grams)
+        top: list[tuple[float, float, str]] = []        # куча лучших `limit`
+        seen: set[int] = set()
+        # редкие триграммы первыми: кандидаты по частым почти всегда отсечены раньше
+        for k, gram in enumerate(sorted(grams, key=lambda g: len(self._postings.get(g, ())))):
+            floor = top[0][0] if len(top) == limit else min_score
+            # кто не встретился в первых k триграммах, делит с запросом не больше q − k
+            if 2 * (q - k) < floor * (2 * q - k):
+                break
+            new = self._postings.get(gram, set()) - seen
+            seen |= new
+            for i in new:
+                other = self._grams[i]
+                if 2 * (q - k) < floor * (q + len(other)):
+                    continue        # длинное имя: q − k общих триграмм на порог не хватит
+                score = 2 * len(grams & other) / (q + len(other))
+                if score < floor:
+                    continue
+                item = (score, self._weights[i], self._names[i])
+                if len(top) < limit:
+                    heapq.heappush(top, item)
+                elif item > top[0]:
+                    heapq.heapreplace(top, item)
+                if len(top) == limit:
+                    floor = top[0][0]
+        return [Candidate(name, score) for score, _, name in sorted(top, reverse=True)]
+
+    def resolve(self, query: str, min_score: float = MIN_SCORE) -> Optional[str]:
+        best = self.lookup(query, limit=1, min_score=min_score)
+        return best[0].name if best else None
+
+    async def refresh_companies(self, redis) -> bool:
+        rows = await redis.zrange(COMPANIES_KEY, 0, -1, withscores=True)
+        return self.update_companies({
+            (n.decode("utf-8") if isinstance(n, bytes) else n): float(score) for n, score in rows
+        })
+
+
+_index: Optional[CompanyIndex] = None
+
+
+def get_company_index() -> CompanyIndex:
+    global _index
+    if _index is None:
+        _index = CompanyIndex()
+    return _index
+
+
+async def get_fresh_company_index(redis_url: str) -> CompanyIndex:
+    """Индекс с компаниями из Redis не старше `REFRESH_INTERVAL`."""
+    index = get_company_index()
+    if time.monotonic() - index.refreshed_at < REFRESH_INTERVAL:
+        return index
+    redis = aioredis.from_url(redis_url)
+    try:
+        await index.refresh_companies(redis)
+    except Exception as e:
+        # без Redis ищем по старому набору
+        log.warning("company_index_refresh_failed", error=str(e))
+    finally:
+        index.refreshed_at = time.monotonic()
+        await redis.aclose()
+    return index
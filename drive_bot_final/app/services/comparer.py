@@ -1,8 +1,57 @@
-from Levenshtein import ratio
+"""Нечёткая сверка токенов левой и правой колонки.
+
+Токен слева считается найденным справа, если у какой-то пары
+`Levenshtein.ratio > 0.8`. ratio = 1 − d/(|a|+|b|), где d — InDel-
+расстояние, поэтому условие точно переписывается в целых числах:
+5·d < |a|+|b|. Вместо попарного цикла:
+
+1. точные совпадения снимаются через множество;
+2. оставшиеся токены группируются по сигнатуре (длина, цифры, буквы,
+   прочее); сумма разностей сигнатур — нижняя граница d, так что
+   заведомо далёкие правые токены отсекаются numpy-маской без потерь;
+3. на группу — один вызов `rapidfuzz.process.cdist` по кандидатам
+   с `score_cutoff`, дальше проверка 5·d < |a|+|b| по матрице.
+
+Результат совпадает с прежним циклом, включая порядок.
+"""
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz.distance import Indel
+from rapidfuzz.process import cdist
+
+RATIO_DEN = 5       # ratio > .8  ⇔  RATIO_DEN·d < |a| + |b|
+
+
+def _signature(token: str) -> tuple[int, int, int, int]:
+    digits = sum(c.isdigit() for c in token)
+    letters = sum(c.isalpha() for c in token)
+    return len(token), digits, letters, len(token) - digits - letters
+
 
 def compare_tokens(left: set[str], right: set[str]) -> list[str]:
-    miss = []
-    for t in left:
-        if not any(ratio(t, r) > .8 for r in right):
-            miss.append(t)
-    return miss 
\ No newline at end of file
+    rest = [t for t in left if t not in right]
+    if not rest or not right:
+        return rest
+    right_tokens = list(right)
+    right_sig = np.array([_signature(r) for r in right_tokens], dtype=np.int64)
+    right_len = right_sig[:, 0]
+    groups: dict[tuple, list[str]] = defaultdict(list)
+    for t in rest:
+        groups[_signature(t)].append(t)
+    found: set[str] = set()
+    for sig, tokens in groups.items():
+        length = sig[0]
+        # нижняя граница расстояния: символы матчатся только внутри своего класса
+        bound = np.abs(right_sig[:, 1:] - np.array(sig[1:])).sum(axis=1)
+        cand = np.flatnonzero(RATIO_DEN * bound < length + right_len)
+        if not len(cand):
+            continue
+        limit = length + right_len[cand]
+        dist = cdist(
+            tokens, [right_tokens[i] for i in cand], scorer=Indel.distance,
+            score_cutoff=int(limit.max() // RATIO_DEN), dtype=np.int32,
+        )
+        hit = (RATIO_DEN * dist < limit).any(axis=1)
+        found.update(t for t, ok in zip(tokens, hit) if ok)
+    return [t for t in rest if t not in found]
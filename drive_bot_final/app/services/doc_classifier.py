@@ -0,0 +1,139 @@
+"""Тип документа, контрагенты и признак выписки — за один проход по тексту.
+
+Все ключевые строки — типы документов из `DOC_TYPES`, маркеры банковских
+выписок и известные компании из Redis (`companies_frequency`) — лежат в
+одном автомате Ахо — Корасик. Текст OCR проходится один раз, сколько бы
+компаний ни было в базе; типы и компании внутри слов («акт» в «контракт»)
+отбрасываются проверкой границ. Маркеры выписки ищутся подстрокой, как
+раньше: имена файлов вида `bankstatement.csv` склеены без разделителей.
+
+Компании меняются: `update_companies` добавляет и удаляет только
+изменившиеся слова и перестраивает ссылки автомата, лишь если набор
+действительно изменился. Из Redis набор перечитывается не чаще раза
+в `REFRESH_INTERVAL` секунд.
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import ahocorasick
+import redis.asyncio as aioredis
+import structlog
+
+from app.utils.filename_parser import DOC_TYPES
+
+log = structlog.get_logger(__name__)
+
+BANK_MARKERS = ("выписка", "statement", "kl_to_1c", "1CClientBankExchange")
+COMPANIES_KEY = "companies_frequency"
+MIN_COMPANY_LEN = 3
+REFRESH_INTERVAL = 300
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def normalize(text: str) -> str:
+    """Регистр, ё и разделители: «Агентский_Договор» → «агентский договор»."""
+    return _SEPARATORS.sub(" ", text.lower().replace("ё", "е"))
+
+
+@dataclass
+class Classification:
+    doctype: Optional[str] = None
+    companies: list[str] = field(default_factory=list)     # в порядке появления в тексте
+    bank: bool = False
+
+
+class DocClassifier:
+    def __init__(self, doctypes: Iterable[str] = DOC_TYPES, markers: Iterable[str] = BANK_MARKERS):
+        self._automaton = ahocorasick.Automaton()
+        self._companies: dict[str, str] = {}       # нормализованный ключ → имя как в Redis
+        for doctype in doctypes:
+            self._add(normalize(doctype), "doctype", doctype)
+        for marker in markers:
+            self._add(normalize(marker), "bank", marker)
+        self._automaton.make_automaton()
+        self.refreshed_at = 0.0
+
+    def _add(self, key: str, kind: str, value: str) -> bool:
+        if not key or key in self._automaton:
+            return False        # «агентский_договор» и «агентский-договор» — один ключ
+        self._automaton.add_word(key, (kind, value, len(key)))
+        return True
+
+    def update_companies(self, names: Iterable[str]) -> bool:
+        """Приводит набор компаний к `names`; True, если автомат перестроен."""
+        wanted = {}
+        for name in names:
+            key = normalize(name).strip()
+            if len(key) >= MIN_COMPANY_LEN:
+                wanted.setdefault(key, name)
+        removed = [k for k in self._companies if k not in wanted]
+        added = [k for k in wanted if k not in self._companies]
+        if not removed and not added:
+            return False
+        for key in removed:
+            self._automaton.remove_word(key)
+            del self._companies[key]
+        for key in added:
+            if self._add(key, "company", wanted[key]):
+                self._companies[key] = wanted[key]
+        self._automaton.make_automaton()
+        log.info("classifier_companies_updated", added=len(added), removed=len(removed), total=len(self._companies))
+        return True
+
+    def classify(self, text: str) -> Classification:
+        text = normalize(text)
+        result = Classification()
+        doctype_at = None
+        seen = set()
+        for end, (kind, value, length) in self._automaton.iter(text):
+            if kind == "bank":
+                # маркер выписки — подстрока: «bankstatement», «Выписка2024»
+                result.bank = True
+                continue
+            start = end - length + 1
+            if (start > 0 and text[start - 1].isalnum()) or (end + 1 < len(text) and text[end + 1].isalnum()):
+                continue
+            if kind == "doctype":
+                # первый по тексту; на одной позиции — длиннейший («агентский договор»)
+                if doctype_at is None or start < doctype_at[0] or (start == doctype_at[0] and length > doctype_at[1]):
+                    doctype_at = (start, length)
+                    result.doctype = value
+            elif value not in seen:
+                seen.add(value)
+                result.companies.append((start, value))
+        result.companies = [name for _, name in sorted(result.companies)]
+        return result
+
+    async def refresh_companies(self, redis) -> bool:
+        names = await redis.zrange(COMPANIES_KEY, 0, -1)
+        return self.update_companies(n.decode("utf-8") if isinstance(n, bytes) else n for n in names)
+
+
+_classifier: Optional[DocClassifier] = None
+
+
+def get_classifier() -> DocClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = DocClassifier()
+    return _classifier
+
+
+async def get_fresh_classifier(redis_url: str) -> DocClassifier:
+    """Классификатор с компаниями из Redis не старше `REFRESH_INTERVAL`."""
+    classifier = get_classifier()
+    if time.monotonic() - classifier.refreshed_at < REFRESH_INTERVAL:
+        return classifier
+    redis = aioredis.from_url(redis_url)
+    try:
+        await classifier.refresh_companies(redis)
+    except Exception as e:
+        # без Redis работаем со старым набором компаний
+        log.warning("classifier_refresh_failed", error=str(e))
+    finally:
+        classifier.refreshed_at = time.monotonic()
+        await redis.aclose()
+    return classifier
@@ -0,0 +1,98 @@
+"""Потоковое чтение DOCX без python-docx.
+
+`word/document.xml` разбирается через `iterparse` прямо из zip-архива:
+абзацы и строки таблиц отдаются по мере появления, разобранные узлы
+сразу очищаются. python-docx строит дерево всего документа — на
+300-страничных агентских договорах это секунды и сотни мегабайт.
+
+Строки таблиц повторяют `row.cells` из python-docx: ячейка с gridSpan
+повторяется на каждую колонку сетки, продолжение вертикального
+объединения (vMerge) берёт текст верхней ячейки, вложенные таблицы в
+текст ячейки не попадают.
+"""
+import io
+import zipfile
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+P, T, TAB, BR, CR = W + "p", W + "t", W + "tab", W + "br", W + "cr"
+TBL, TR, TC = W + "tbl", W + "tr", W + "tc"
+_TEXT_TAGS = {T: None, TAB: "\t", BR: "\n", CR: "\n", W + "noBreakHyphen": "-"}
+
+Block = str | list[str]     # абзац или строка таблицы
+
+
+def _cell_span(tc) -> tuple[int, bool]:
+    """(ширина в колонках сетки, продолжает ли вертикальное объединение)."""
+    pr = tc.find(W + "tcPr")
+    if pr is None:
+        return 1, False
+    span = pr.find(W + "gridSpan")
+    merge = pr.find(W + "vMerge")
+    width = int(span.get(W + "val", 1)) if span is not None else 1
+    continues = merge is not None and merge.get(W + "val", "continue") == "continue"
+    return width, continues
+
+
+def iter_blocks(source: str | bytes) -> Iterator[Block]:
+    """Абзацы вне таблиц (str) и строки таблиц верхнего уровня (list[str])."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as zf, zf.open("word/document.xml") as xml:
+        tbl_depth = 0
+        paragraphs: list[list[str]] = []    # стек: абзацы в надписях вложены в абзац
+        cell: list[str] = []
+        row: list[str] = []
+        above: list[str] = []               # строка выше — для vMerge
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == P:
+                    paragraphs.append([])
+                elif tag == TBL:
+                    tbl_depth += 1
+                elif tbl_depth == 1 and tag == TC:
+                    cell = []
+                continue
+            if tag in _TEXT_TAGS:
+                if paragraphs:
+                    paragraphs[-1].append((elem.text or "") if tag == T else _TEXT_TAGS[tag])
+            elif tag == P:
+                text = "".join(paragraphs.pop())
+                if paragraphs:
+                    continue        # абзац надписи внутри абзаца — как python-docx, пропускаем
+                if tbl_depth == 0:
+                    elem.clear()
+                    yield text
+                elif tbl_depth == 1:
+                    cell.append(text)
+            elif tbl_depth == 1 and tag == TC:
+                width, continues = _cell_span(elem)
+                col = len(row)
+                text = above[col] if continues and col < len(above) else "\n".join(cell)
+                row.extend([text] * width)
+            elif tbl_depth == 1 and tag == TR:
+                above, row = row, []
+                elem.clear()
+                yield above
+            elif tag == TBL:
+                tbl_depth -= 1
+                if tbl_depth == 0:
+                    above = []
+                    elem.clear()
+
+
+def iter_lines(source: str | bytes) -> Iterator[str]:
+    """Текст документа построчно; ячейки строки таблицы — через табуляцию."""
+    for block in iter_blocks(source):
+        line = block if isinstance(block, str) else "\t".join(c for c in block if c)
+        if line.strip():
+            yield line
+
+
+def iter_table_pairs(source: str | bytes) -> Iterator[tuple[str, str]]:
+    """Пары (левая, правая колонка) из строк таблиц — для сверки RU/EN."""
+    for block in iter_blocks(source):
+        if isinstance(block, list) and len(block) >= 2:
+            yield block[0], block[1]
@@ -1,5 +1,7 @@
 from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from app.config import settings
 from app.services.audit import log_operation
 from app.config import settings
@@ -7,6 +9,8 @@ import functools
 import asyncio
 import logging
 import random
+import threading
+import httplib2
 import structlog
 log = structlog.get_logger(__name__)
 log.info("drive_scopes", scopes=settings.drive_scopes)
@@ -44,6 +48,19 @@ def run_sync(func, *args, **kwargs):
     loop = asyncio.get_running_loop()
     return loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
 
+# --- транспорт на поток: httplib2 у общего `drive` не потокобезопасен ---
+_thread_local = threading.local()
+
+def _thread_http() -> AuthorizedHttp:
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = AuthorizedHttp(creds, http=httplib2.Http())
+    return http
+
+def _execute(request):
+    """`request.execute()` через транспорт текущего потока — вызывать внутри `run_sync`."""
+    return request.execute(http=_thread_http())
+
 __all__ = [
     "drive",
     "FOLDER_MIME",
@@ -51,12 +68,19 @@ __all__ = [
     "ensure_folders",
     "upload_to_gdrive",
     "parse_filename_to_path",
+    "find_folder",
+    "list_files_recursive",
+    "download_file",
     # ... другие экспортируемые функции ...
 ]
 
+def _q_literal(value: str) -> str:
+    """Строка для `q=` Drive API: обратный слэш и апостроф экранируются."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
 async def _find_child_folder(parent_id: str, title: str) -> str | None:
     q = (
-        f"'{parent_id}' in parents and name = '{title}' and mimeType = '{FOLDER_MIME}' "
+        f"'{parent_id}' in parents and name = '{_q_literal(title)}' and mimeType = '{FOLDER_MIME}' "
         "and trashed = false"
     )
     res = await gdrive_request_with_backoff(run_sync, drive.files().list(q=q, spaces="drive", fields="files(id)").execute)
@@ -80,6 +104,55 @@ async def ensure_folders(path_parts):
         parent = child
     return parent  # id of the last folder in chain
 
+async def find_folder(path_parts) -> str | None:
+    """Id существующей папки под корнем; в отличие от `ensure_folders` ничего не создаёт."""
+    parent = settings.gdrive_root_folder
+    for part in path_parts:
+        if not part:
+            continue
+        parent = await _find_child_folder(parent, part)
+        if parent is None:
+            return None
+    return parent
+
+async def list_files_recursive(folder_id: str) -> list[dict]:
+    """Все файлы папки и её подпапок (обход в ширину, постранично).
+
+    У каждого файла ключ `path` — путь подпапки относительно `folder_id`.
+    """
+    files, queue = [], [(folder_id, "")]
+    while queue:
+        parent, path = queue.pop(0)
+        q = f"'{parent}' in parents and trashed = false"
+        token = None
+        while True:
+            res = await gdrive_request_with_backoff(run_sync, _execute, drive.files().list(
+                q=q, spaces="drive", pageSize=1000, pageToken=token,
+                fields="nextPageToken, files(id,name,mimeType,size)",
+            ))
+            for f in res.get("files", []):
+                if f["mimeType"] == FOLDER_MIME:
+                    queue.append((f["id"], f"{path}{f['name']}/"))
+                else:
+                    files.append({**f, "path": path})
+            token = res.get("nextPageToken")
+            if not token:
+                break
+    return files
+
+def _download(file_id: str, destination: str):
+    # файлы папки качаются параллельно из потоков пула — каждый через свой транспорт
+    request = drive.files().get_media(fileId=file_id)
+    request.http = _thread_http()
+    with open(destination, "wb") as f:
+        downloader = MediaIoBaseDownload(f, request)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+
+async def download_file(file_id: str, destination: str):
+    await gdrive_request_with_backoff(run_sync, _download, file_id, destination)
+
 @log_operation
 async def list_folders():
     res = drive.files().list(q=f"'{settings.gdrive_root_folder}' in parents and mimeType = 'application/vnd.google-apps.folder'", fields="files(name, id, size)").execute()
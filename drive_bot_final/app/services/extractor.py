@@ -1,26 +1,100 @@
-import pdfplumber, docx
+import fitz  # PyMuPDF
+import hashlib
+import pdfplumber
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional
+from app.services.docx_stream import iter_table_pairs
+from app.services.process_pool import get_process_pool
 
-def extract_pairs(path: str) -> list[tuple[str, str]]:
+PAGES_PER_TASK = 8          # страниц PDF на задачу пула
+PARALLEL_MIN_PAGES = 16     # короче — в текущем процессе, пул дороже
+CACHE_SIZE = 32             # документов в кэше пар
+
+Box = tuple[float, float, float, float]   # x0, y0, x1, y1 строки таблицы на странице
+_cache: "OrderedDict[str, tuple[list[tuple[str, str]], Optional[list[int]], Optional[list[Box]]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _load(path: str) -> tuple[list[tuple[str, str]], Optional[list[int]], Optional[list[Box]]]:
+    key = file_hash(path)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
     if path.endswith(".pdf"):
-        return _extract_pdf(path)
-    return _extract_docx(path)
+        rows = _extract_pdf(path)
+        entry = [(l, r) for l, r, *_ in rows], [n for _, _, n, _ in rows], [box for *_, box in rows]
+    else:
+        entry = _extract_docx(path), None, None
+    with _cache_lock:
+        _cache[key] = entry
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+def extract_pairs(path: str) -> list[tuple[str, str]]:
+    """Пары (левая, правая колонка); повторная сверка того же файла — из кэша."""
+    return list(_load(path)[0])
+
+def pair_pages(path: str) -> Optional[list[int]]:
+    """Страница PDF (с нуля) для каждой пары `extract_pairs`; у DOCX страниц нет — None."""
+    pages = _load(path)[1]
+    return None if pages is None else list(pages)
+
+def pair_boxes(path: str) -> Optional[list[Box]]:
+    """Рамка строки таблицы на её странице для каждой пары; у DOCX — None."""
+    boxes = _load(path)[2]
+    return None if boxes is None else list(boxes)
 
 def _extract_docx(p: str):
-    doc = docx.Document(p)
-    pairs = []
-    for tbl in doc.tables:
-        for row in tbl.rows:
-            if len(row.cells) >= 2:
-                pairs.append((row.cells[0].text, row.cells[1].text))
-    return pairs
-
-def _extract_pdf(p: str):
-    pairs = []
-    with pdfplumber.open(p) as pdf:
-        for page in pdf.pages:
-            for tbl in (page.extract_tables() or []):
-                for row in tbl:
-                    if len(row) >= 2:
-                        pairs.append((row[0] or "", row[1] or ""))
-    return pairs 
\ No newline at end of file
+    return list(iter_table_pairs(p))
+
+def _rows_to_pairs(tables, page: int) -> list[tuple[str, str, int, Box]]:
+    # у обеих библиотек строки `extract()` идут в порядке `rows`, координаты — от верхнего левого угла
+    return [
+        (row[0] or "", row[1] or "", page, tuple(bbox))
+        for tbl in tables for row, bbox in zip(tbl.extract(), (r.bbox for r in tbl.rows)) if len(row) >= 2
+    ]
+
+def _extract_page_range(p: str, start: int, stop: int) -> list[tuple[str, str, int, Box]]:
+    """(левая, правая, страница, рамка строки) со страниц [start, stop): сначала PyMuPDF, pdfplumber — если тот ничего не нашёл."""
+    rows = []
+    plumber = None
+    try:
+        with fitz.open(p) as doc:
+            for n in range(start, stop):
+                page = doc[n]
+                # без линий нет и таблиц: обе библиотеки ищут таблицы по линиям
+                if not page.get_cdrawings():
+                    continue
+                tables = page.find_tables().tables
+                if not tables:
+                    if plumber is None:
+                        plumber = pdfplumber.open(p)
+                    tables = plumber.pages[n].find_tables()
+                rows.extend(_rows_to_pairs(tables, n))
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return rows
+
+def _extract_pdf(p: str) -> list[tuple[str, str, int, Box]]:
+    with fitz.open(p) as doc:
+        page_count = doc.page_count
+    if page_count < PARALLEL_MIN_PAGES:
+        return _extract_page_range(p, 0, page_count)
+    # страницы кусками по пулу процессов, склейка — в порядке страниц
+    pool = get_process_pool()
+    futures = [
+        pool.submit(_extract_page_range, p, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    return [row for future in futures for row in future.result()]
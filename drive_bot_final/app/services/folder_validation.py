@@ -0,0 +1,289 @@
+"""Сверка всех документов папки Drive (`/validate_folder`) с контрольными точками.
+
+Перед аудитом проверяют все двуязычные договоры папки принципала — сотни
+файлов. Задача `validate.folder` обходит папку рекурсивно, записывает
+список DOCX/PDF в Redis и ставит по задаче `validate.folder_file` на
+каждый ещё не проверенный файл. Эти задачи расходятся по воркерам
+очереди `validate` и идут параллельно: каждая скачивает свой файл, сверяет
+его через `tasks.validate_cached` (повторный аудит берётся из кэша) и
+дописывает результат в хэш `:done` задания.
+
+Контрольная точка — сам Redis: список файлов и готовые результаты
+живут там `JOB_TTL`. Упавший воркер не теряет файл (`acks_late`), а
+повторный `/validate_folder` по той же папке продолжает задание с места
+остановки: `job_id` зависит только от чата и папки. Поставленные в
+очередь файлы отмечаются в хэше `:queued` временем постановки (задача
+файла обновляет его, когда берётся за работу); повторный запуск или
+повторная доставка `validate.folder` ставит их снова, только если
+отметка старше `QUEUED_STALE` — задача, видимо, потерялась. Последний файл
+собирает общий отчёт; `HSETNX reported` гарантирует, что его отправят
+один раз, даже если файл допроверят две задачи сразу.
+
+Запуск воркера — как для `tasks`:
+    celery -A app.services.celery_app worker -Q validate --pool threads --concurrency 4
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import suppress
+from typing import Optional
+
+import openpyxl
+import redis.asyncio as aioredis
+import structlog
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from app.config import settings
+from app.services import worker_runtime
+from app.services.celery_app import celery_app
+from app.services.drive import download_file, list_files_recursive
+from app.services.tasks import edit_status, validate_cached
+from app.utils.file_validation import validate_file
+
+log = structlog.get_logger(__name__)
+
+JOB_TTL = 86400 * 7
+DOC_EXTS = (".docx", ".pdf")
+MAX_FILE_MISSES = 200       # строк отчёта на файл; счётчик — полный
+PROGRESS_EVERY = 10         # файлов между обновлениями статуса
+REPORT_TOP = 10             # файлов с расхождениями в сообщении
+QUEUED_STALE = 3600         # секунд: поставленный файл без результата считаем потерянным
+_PARTS = ("meta", "files", "done", "queued")
+
+
+def job_id(chat_id: int, folder_id: str) -> str:
+    return f"{chat_id}:{folder_id}"
+
+
+class FolderCheckpoint:
+    """Состояние задания в Redis: параметры, список файлов и готовые результаты."""
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self.redis = None
+    async def connect(self):
+        self.redis = aioredis.from_url(self.redis_url, decode_responses=True)
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+    def _key(self, job: str, part: str) -> str:
+        return f"folder_validation:{job}:{part}"
+    async def start(self, job: str, meta: dict, files: list[dict]):
+        keys = [self._key(job, p) for p in _PARTS]
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(*keys)
+        pipe.hset(keys[0], mapping={**meta, "total": len(files)})
+        pipe.hset(keys[1], mapping={
+            f["id"]: json.dumps({"name": f["name"], "path": f["path"], "size": int(f.get("size") or 0)},
+                                ensure_ascii=False)
+            for f in files
+        })
+        for key in keys[:2]:
+            pipe.expire(key, JOB_TTL)
+        await pipe.execute()
+    async def get_meta(self, job: str) -> dict[str, str]:
+        return await self.redis.hgetall(self._key(job, "meta"))
+    async def set_status_message(self, job: str, message_id: int):
+        await self.redis.hset(self._key(job, "meta"), "status_message_id", message_id)
+    async def get_files(self, job: str) -> dict[str, dict]:
+        raw = await self.redis.hgetall(self._key(job, "files"))
+        return {k: json.loads(v) for k, v in raw.items()}
+    async def get_file(self, job: str, file_id: str) -> Optional[dict]:
+        raw = await self.redis.hget(self._key(job, "files"), file_id)
+        return json.loads(raw) if raw else None
+    async def get_done(self, job: str) -> dict[str, dict]:
+        raw = await self.redis.hgetall(self._key(job, "done"))
+        return {k: json.loads(v) for k, v in raw.items()}
+    async def get_queued(self, job: str) -> dict[str, float]:
+        raw = await self.redis.hgetall(self._key(job, "queued"))
+        return {k: float(v) for k, v in raw.items()}
+    async def mark_queued(self, job: str, file_ids: list[str]):
+        """Отметка «поставлен или в работе» с текущим временем."""
+        if not file_ids:
+            return
+        key = self._key(job, "queued")
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping=dict.fromkeys(file_ids, time.time()))
+        pipe.expire(key, JOB_TTL)
+        await pipe.execute()
+    async def is_done(self, job: str, file_id: str) -> bool:
+        return bool(await self.redis.hexists(self._key(job, "done"), file_id))
+    async def mark_done(self, job: str, file_id: str, result: dict) -> int:
+        """Записывает результат файла; возвращает, сколько файлов готово."""
+        key = self._key(job, "done")
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, file_id, json.dumps(result, ensure_ascii=False))
+        pipe.expire(key, JOB_TTL)
+        pipe.hlen(key)
+        return (await pipe.execute())[-1]
+    async def count_done(self, job: str) -> int:
+        return await self.redis.hlen(self._key(job, "done"))
+    async def claim_report(self, job: str) -> bool:
+        return bool(await self.redis.hsetnx(self._key(job, "meta"), "reported", 1))
+    async def release_report(self, job: str):
+        await self.redis.hdel(self._key(job, "meta"), "reported")
+    async def drop(self, job: str):
+        await self.redis.delete(*(self._key(job, p) for p in _PARTS))
+
+
+@celery_app.task(name="validate.folder", acks_late=True)
+def validate_folder(job: str, folder_id: str, folder_path: str, chat_id: int, status_message_id: int):
+    worker_runtime.run(start_folder_job(
+        worker_runtime.get_bot(), job, folder_id, folder_path, chat_id, status_message_id
+    ))
+
+
+@celery_app.task(name="validate.folder_file", acks_late=True)
+def validate_folder_file(job: str, file_id: str):
+    worker_runtime.run(check_folder_file(worker_runtime.get_bot(), job, file_id))
+
+
+async def start_folder_job(bot: Bot, job: str, folder_id: str, folder_path: str,
+                           chat_id: int, status_message_id: int):
+    """Новое задание — обход папки; прерванное — только непроверенные файлы."""
+    checkpoint = FolderCheckpoint(settings.REDIS_DSN)
+    await checkpoint.connect()
+    try:
+        files = await checkpoint.get_files(job)
+        if files:
+            await checkpoint.set_status_message(job, status_message_id)
+        else:
+            listing = await list_files_recursive(folder_id)
+            docs = [f for f in listing if f["name"].lower().endswith(DOC_EXTS)]
+            if not docs:
+                await edit_status(bot, chat_id, status_message_id, f"📂 {folder_path}: нет DOCX и PDF")
+                return
+            await checkpoint.start(job, {
+                "folder_id": folder_id, "folder_path": folder_path,
+                "chat_id": chat_id, "status_message_id": status_message_id,
+            }, docs)
+            files = {f["id"]: f for f in docs}
+        done, queued = await checkpoint.get_done(job), await checkpoint.get_queued(job)
+        stale = time.time() - QUEUED_STALE
+        pending = [file_id for file_id in files if file_id not in done]
+        # уже поставленные и живые — не дублируем
+        dispatch = [file_id for file_id in pending if queued.get(file_id, 0) < stale]
+        log.info("folder_validation_started", job=job, files=len(files), done=len(done), dispatch=len(dispatch))
+        text = f"📂 {folder_path}: документов {len(files)}"
+        if done:
+            text += f", уже проверено {len(done)}"
+        await edit_status(bot, chat_id, status_message_id, text)
+        if not pending:
+            await _finish(bot, checkpoint, job)
+            return
+        await checkpoint.mark_queued(job, dispatch)
+        for file_id in dispatch:
+            validate_folder_file.delay(job, file_id)
+    except Exception as e:
+        log.error("folder_validation_failed", job=job, error=str(e))
+        await edit_status(bot, chat_id, status_message_id, f"❌ Не удалось начать сверку папки: {e}")
+    finally:
+        await checkpoint.close()
+
+
+async def _check_file(info: dict, file_id: str, chat_id: int) -> dict:
+    stem, ext = os.path.splitext(info["name"])
+    fd, path = tempfile.mkstemp(suffix=ext.lower())
+    os.close(fd)
+    patched = None
+    try:
+        validate_file(info["name"], info["size"])
+        await download_file(file_id, path)
+        misses, patched = await validate_cached(path, info["path"] + info["name"], chat_id, None)
+        return {"count": len(misses), "misses": misses[:MAX_FILE_MISSES], "error": None}
+    except Exception as e:
+        log.warning("folder_file_failed", file=info["name"], error=str(e))
+        return {"count": 0, "misses": [], "error": str(e)}
+    finally:
+        for p in (path, patched):
+            if p:
+                with suppress(FileNotFoundError):
+                    os.remove(p)
+
+
+async def check_folder_file(bot: Bot, job: str, file_id: str):
+    """Сверяет один файл задания; последний готовый файл отправляет отчёт."""
+    checkpoint = FolderCheckpoint(settings.REDIS_DSN)
+    await checkpoint.connect()
+    try:
+        meta = await checkpoint.get_meta(job)
+        if not meta:
+            log.info("folder_job_gone", job=job, file_id=file_id)
+            return
+        chat_id, total = int(meta["chat_id"]), int(meta["total"])
+        if await checkpoint.is_done(job, file_id):
+            # повторная доставка после падения: результат уже записан
+            done = await checkpoint.count_done(job)
+        else:
+            await checkpoint.mark_queued(job, [file_id])       # в работе: не считать потерянным
+            info = await checkpoint.get_file(job, file_id)
+            result = await _check_file(info, file_id, chat_id)
+            done = await checkpoint.mark_done(job, file_id, result)
+            log.info("folder_file_validated", job=job, file=info["name"], misses=result["count"])
+        if done >= total:
+            await _finish(bot, checkpoint, job)
+        elif done % PROGRESS_EVERY == 0:
+            await edit_status(bot, chat_id, int(meta["status_message_id"]),
+                               f"🔎 {meta['folder_path']}: проверено {done} из {total}")
+    finally:
+        await checkpoint.close()
+
+
+def write_folder_report(files: dict[str, dict], done: dict[str, dict], path: str):
+    """Сводка по файлам и все найденные расхождения в xlsx через write-only книгу."""
+    wb = openpyxl.Workbook(write_only=True)
+    summary = wb.create_sheet("Документы")
+    summary.append(["Папка", "Файл", "Расхождений", "Ошибка"])
+    rows = wb.create_sheet("Расхождения")
+    rows.append(["Папка", "Файл", "Строка", "Левая", "Правая"])
+    for file_id, info in sorted(files.items(), key=lambda kv: (kv[1]["path"], kv[1]["name"])):
+        result = done.get(file_id, {"count": 0, "misses": [], "error": "не проверен"})
+        summary.append([info["path"], info["name"], result["count"], result["error"] or ""])
+        for i, l, r in result["misses"]:
+            rows.append([info["path"], info["name"], i, l, r])
+    wb.save(path)
+
+
+def format_folder_summary(folder_path: str, files: dict[str, dict], done: dict[str, dict]) -> str:
+    failed = [files[k] for k, r in done.items() if r["error"]]
+    dirty = sorted(((r["count"], files[k]) for k, r in done.items() if r["count"]),
+                   key=lambda x: -x[0])
+    lines = [
+        f"📂 {folder_path}: проверено документов {len(done)}",
+        f"✅ Без расхождений: {len(done) - len(dirty) - len(failed)}",
+        f"⚠️ С расхождениями: {len(dirty)} (строк: {sum(c for c, _ in dirty)})",
+    ]
+    if failed:
+        lines.append(f"❌ Не удалось проверить: {len(failed)}")
+    for count, info in dirty[:REPORT_TOP]:
+        lines.append(f"  • {info['path']}{info['name']} — {count}")
+    return "\n".join(lines)
+
+
+async def _finish(bot: Bot, checkpoint: FolderCheckpoint, job: str):
+    if not await checkpoint.claim_report(job):
+        return
+    loop = asyncio.get_running_loop()
+    meta = await checkpoint.get_meta(job)
+    files, done = await checkpoint.get_files(job), await checkpoint.get_done(job)
+    chat_id = int(meta["chat_id"])
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await loop.run_in_executor(None, write_folder_report, files, done, path)
+        await edit_status(bot, chat_id, int(meta["status_message_id"]),
+                           f"✅ {meta['folder_path']}: проверено {len(done)} из {len(files)}")
+        await bot.send_message(chat_id, format_folder_summary(meta["folder_path"], files, done))
+        await bot.send_document(chat_id, FSInputFile(path, filename="Сверка папки.xlsx"))
+    except Exception as e:
+        # отчёт не ушёл — следующий `/validate_folder` попробует снова
+        log.error("folder_report_failed", job=job, error=str(e))
+        await checkpoint.release_report(job)
+        raise
+    finally:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+    await checkpoint.drop(job)
+    log.info("folder_validation_finished", job=job, files=len(files))
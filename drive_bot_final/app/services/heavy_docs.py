@@ -0,0 +1,91 @@
+"""Тяжёлые PDF — в отдельную очередь Celery.
+
+Документ тяжёлый, если он больше `HEAVY_PDF_MB` или в нём больше
+`HEAVY_PDF_PAGES` страниц. Бот такие выписки сам не разбирает: воркер
+очереди `heavy` скачивает файл по file_id, прогоняет через постраничный
+движок и по ходу обновляет статусное сообщение в чате.
+
+Облачный Bot API отдаёт файлы только до 20 МБ, поэтому выписки тяжелее
+разбираются лишь с локальным сервером Bot API (`TELEGRAM_API_URL`):
+бот и воркер читают файл из его общего каталога, см. docker-compose.
+
+Запуск воркера:
+    celery -A app.services.celery_app worker -Q heavy --concurrency 1
+"""
+import asyncio
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+import structlog
+from aiogram import Bot
+
+from app.config import settings
+from app.services import worker_runtime
+from app.services.bank_ocr_service import BankDocumentOCR, format_payments_report
+from app.services.celery_app import celery_app
+from app.services.page_engine import PageResult
+
+log = structlog.get_logger(__name__)
+
+PROGRESS_EVERY = 10     # страниц между обновлениями статуса
+
+
+def pdf_page_count(path: str) -> int:
+    """Число страниц без разбора содержимого (читается только xref)."""
+    try:
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception as e:
+        log.warning("pdf_page_count_failed", path=path, error=str(e))
+        return 0
+
+
+def is_heavy_pdf(size_bytes: int | None, pages: int | None = None) -> bool:
+    if size_bytes and size_bytes > settings.HEAVY_PDF_MB * 1024 * 1024:
+        return True
+    return bool(pages and pages > settings.HEAVY_PDF_PAGES)
+
+
+@celery_app.task(name="heavy.bank_statement", acks_late=True)
+def process_heavy_statement(file_id: str, filename: str, chat_id: int, status_message_id: int):
+    worker_runtime.run(run_heavy_statement(worker_runtime.get_bot(), file_id, filename, chat_id, status_message_id))
+
+
+async def _edit_status(bot: Bot, chat_id: int, message_id: int, text: str):
+    try:
+        await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, parse_mode="Markdown")
+    except Exception as e:
+        # «message is not modified», удалённое сообщение — не повод ронять задачу
+        log.debug("heavy_status_edit_failed", chat_id=chat_id, error=str(e))
+
+
+async def run_heavy_statement(bot: Bot, file_id: str, filename: str, chat_id: int, status_message_id: int):
+    loop = asyncio.get_running_loop()
+
+    def on_page(page: PageResult, total: int):
+        if page.number % PROGRESS_EVERY and page.number != total:
+            return
+        text = f"🏋️ **Большой документ: {filename}**\n\n🔄 Обработано страниц: {page.number} из {total}"
+        # ждём отправки, чтобы устаревший статус не перезаписал итоговый отчёт
+        asyncio.run_coroutine_threadsafe(_edit_status(bot, chat_id, status_message_id, text), loop).result()
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        await bot.download(file_id, destination=path)
+        payments = await asyncio.to_thread(BankDocumentOCR()._process_document_sync, path, on_page)
+        if payments:
+            report = format_payments_report(payments)
+        else:
+            report = (
+                "🤷‍♂️ **Платежи не найдены**\n\n"
+                "Возможно, это не банковская выписка или документ плохо читается."
+            )
+        await _edit_status(bot, chat_id, status_message_id, report)
+        log.info("heavy_statement_done", filename=filename, chat_id=chat_id, payments=len(payments))
+    except Exception as e:
+        log.error("heavy_statement_failed", filename=filename, chat_id=chat_id, error=str(e))
+        await _edit_status(bot, chat_id, status_message_id, f"❌ **Ошибка при анализе документа:**\n\n`{str(e)}`")
+    finally:
+        os.remove(path)
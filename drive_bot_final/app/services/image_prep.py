@@ -0,0 +1,146 @@
+"""Векторизованная подготовка изображений для tesseract.
+
+Работаем с NumPy-массивами прямо из буфера пиксмапа (без PPM/PIL):
+оттенки серого → уменьшение до целевого dpi → адаптивная бинаризация
+(Bradley) → выравнивание наклона → обрезка по содержимому.
+Чем меньше и чище картинка, тем быстрее tesseract и тем меньше мусора.
+"""
+import io
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+TARGET_DPI = 300            # оптимум tesseract для 9–12 pt
+MIN_DPI = 150               # ниже — мелкий шрифт не читается
+PHOTO_LONG_SIDE = 3300      # фото с телефона: ~A4 при 280 dpi
+BINARIZE_T = 0.15           # пиксель темнее среднего окна на 15% → чернила
+STRIPE_ROWS = 512           # бинаризация полосами: память не растёт с размером страницы
+MAX_SKEW = 5.0
+SKEW_STEP = 0.25
+MIN_SKEW = 0.3
+CROP_MARGIN = 12
+
+
+def pixmap_to_array(pix: fitz.Pixmap) -> np.ndarray:
+    """Пиксмап → (h, w) uint8 в оттенках серого; цветной сводим по яркости."""
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    arr = arr[:, : pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return arr[:, :, 0]
+    return to_gray(arr[:, :, :3])
+
+
+def to_gray(rgb: np.ndarray) -> np.ndarray:
+    if rgb.ndim == 2:
+        return rgb
+    # ITU-R 601, целочисленно: без float-копии всей картинки
+    r, g, b = (rgb[:, :, i].astype(np.uint32) for i in range(3))
+    return ((r * 299 + g * 587 + b * 114) // 1000).astype(np.uint8)
+
+
+def render_gray(page: fitz.Page, clip: fitz.Rect | None = None, dpi: float = TARGET_DPI) -> np.ndarray:
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, clip=clip)
+    return pixmap_to_array(pix)
+
+
+def load_photo(data: bytes, long_side: int = PHOTO_LONG_SIDE) -> np.ndarray:
+    """Фото/скан из jpg/png в серый массив не больше `long_side` по длинной стороне.
+
+    Для JPEG `draft` декодирует сразу в уменьшенном масштабе (DCT-scaling),
+    полноразмерные 12 Мп в память не попадают.
+    """
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (long_side, long_side))
+    gray = np.asarray(img.convert("L"))
+    factor = max(gray.shape) // long_side
+    return downscale(gray, factor) if factor > 1 else gray
+
+
+def downscale(gray: np.ndarray, factor: int) -> np.ndarray:
+    """Уменьшение в целое число раз усреднением блоков factor×factor."""
+    if factor <= 1:
+        return gray
+    h, w = (gray.shape[0] // factor) * factor, (gray.shape[1] // factor) * factor
+    blocks = gray[:h, :w].reshape(h // factor, factor, w // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32).astype(np.uint8)
+
+
+def adaptive_binarize(gray: np.ndarray, window: int | None = None, t: float = BINARIZE_T) -> np.ndarray:
+    """Бинаризация Брэдли по интегральному изображению: 0 — чернила, 255 — фон."""
+    h, w = gray.shape
+    s = window or max(15, (w // 40) | 1)
+    half = s // 2
+    col_sums = np.zeros((h + 1, w), dtype=np.int32)
+    np.cumsum(gray, axis=0, dtype=np.int32, out=col_sums[1:])
+    y0 = np.clip(np.arange(h) - half, 0, h)
+    y1 = np.clip(np.arange(h) + half + 1, 0, h)
+    x0 = np.clip(np.arange(w) - half, 0, w)
+    x1 = np.clip(np.arange(w) + half + 1, 0, w)
+    widths = (x1 - x0).astype(np.int32)
+    out = np.empty_like(gray)
+    for r0 in range(0, h, STRIPE_ROWS):
+        r1 = min(r0 + STRIPE_ROWS, h)
+        vert = col_sums[y1[r0:r1]] - col_sums[y0[r0:r1]]
+        horiz = np.zeros((r1 - r0, w + 1), dtype=np.int64)
+        np.cumsum(vert, axis=1, out=horiz[:, 1:])
+        box = horiz[:, x1] - horiz[:, x0]
+        area = (y1[r0:r1] - y0[r0:r1])[:, None] * widths[None, :]
+        ink = gray[r0:r1].astype(np.int64) * area * 100 <= box * int(100 - t * 100)
+        out[r0:r1] = np.where(ink, 0, 255)
+    return out
+
+
+def estimate_skew(binary: np.ndarray, max_angle: float = MAX_SKEW, step: float = SKEW_STEP) -> float:
+    """Угол наклона строк (градусы) по максимуму «резкости» горизонтальной проекции."""
+    small = binary[::4, ::4] == 0
+    ys, xs = np.nonzero(small)
+    if len(ys) < 50:
+        return 0.0
+    best_angle, best_score = 0.0, -1.0
+    offset = int(small.shape[1] * np.tan(np.radians(max_angle))) + 1
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        shifted = ys - np.round(xs * np.tan(np.radians(angle))).astype(np.int64) + offset
+        profile = np.bincount(shifted)
+        score = float(np.square(np.diff(profile)).sum())
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def deskew(binary: np.ndarray, angle: float) -> np.ndarray:
+    """Выравнивание сдвигом столбцов (shear): для |угол| ≤ 5° неотличимо от поворота."""
+    if abs(angle) < MIN_SKEW:
+        return binary
+    h, w = binary.shape
+    shifts = np.round(np.arange(w) * np.tan(np.radians(angle))).astype(np.int64)
+    out = np.full_like(binary, 255)
+    # столбцы с одинаковым сдвигом идут подряд — копируем блоками
+    bounds = np.flatnonzero(np.diff(shifts)) + 1
+    for start, stop in zip(np.r_[0, bounds], np.r_[bounds, w]):
+        d = int(shifts[start])
+        if d >= 0:
+            out[: h - d, start:stop] = binary[d:, start:stop]
+        else:
+            out[-d:, start:stop] = binary[: h + d, start:stop]
+    return out
+
+
+def crop_to_content(binary: np.ndarray, margin: int = CROP_MARGIN) -> np.ndarray:
+    ink = binary == 0
+    rows = np.flatnonzero(ink.any(axis=1))
+    if not len(rows):
+        return binary[:0, :0]
+    cols = np.flatnonzero(ink.any(axis=0))
+    h, w = binary.shape
+    return binary[
+        max(rows[0] - margin, 0): min(rows[-1] + margin + 1, h),
+        max(cols[0] - margin, 0): min(cols[-1] + margin + 1, w),
+    ]
+
+
+def prepare_for_ocr(gray: np.ndarray) -> np.ndarray:
+    binary = adaptive_binarize(gray)
+    binary = deskew(binary, estimate_skew(binary))
+    return crop_to_content(binary)
@@ -1,8 +1,46 @@
-import spacy, unicodedata, re
+"""Именованные сущности (spaCy, ru_core_news_lg).
+
+Модель грузится при первом обращении, а не при импорте: иначе каждый
+процесс, импортирующий модуль (воркеры Celery тоже), платит секундами
+старта и ~1 ГБ памяти. Грузится только то, что нужно NER: tok2vec и ner,
+остальные компоненты исключены и в память не попадают.
+
+Тексты идут пачками через `nlp.pipe`; результаты кэшируются по
+нормализованному тексту (NFKC, схлопнутые пробелы) — в договорах одни и
+те же реквизиты повторяются в десятках строк.
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
 from functools import lru_cache
+from typing import Iterable
 
-_nlp = spacy.load("ru_core_news_lg")
+MODEL = "ru_core_news_lg"
+EXCLUDED_PIPES = ["tagger", "morphologizer", "parser", "attribute_ruler", "lemmatizer", "senter"]
 DEF_LABELS = {"ORG", "PER", "DATE", "MONEY", "CARDINAL", "GPE"}
+BATCH_SIZE = 64
+CACHE_SIZE = 4096
+
+_nlp = None
+_nlp_lock = threading.Lock()
+_cache: "OrderedDict[str, tuple[tuple[str, str], ...]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load_model():
+    import spacy
+    return spacy.load(MODEL, exclude=EXCLUDED_PIPES)
+
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = _load_model()
+    return _nlp
+
 
 @lru_cache(1024)
 def normalize(t: str) -> str:
@@ -10,7 +48,32 @@ def normalize(t: str) -> str:
     t = re.sub(r"\s+", " ", t)
     return t.strip(" .,")
 
+
+def _cache_key(text: str) -> str:
+    # регистр не трогаем: от него зависит разметка модели
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def get_entities_many(texts: Iterable[str], labels: set[str] = DEF_LABELS,
+                      batch_size: int = BATCH_SIZE, n_process: int = 1) -> list[set[str]]:
+    """Сущности для каждого текста; модель видит только тексты, которых нет в кэше."""
+    keys = [_cache_key(t) for t in texts]
+    with _cache_lock:
+        found = {k: _cache[k] for k in keys if k in _cache}
+        for k in found:
+            _cache.move_to_end(k)
+    missing = [k for k in dict.fromkeys(keys) if k not in found]
+    if missing:
+        docs = get_nlp().pipe(missing, batch_size=batch_size, n_process=n_process)
+        for key, doc in zip(missing, docs):
+            found[key] = tuple((ent.label_, normalize(ent.text)) for ent in doc.ents)
+        with _cache_lock:
+            for key in missing:
+                _cache[key] = found[key]
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return [{text for label, text in found[k] if label in labels} for k in keys]
+
+
 def get_entities(text: str, labels: set[str] = DEF_LABELS) -> set[str]:
-    doc = _nlp(text)
-    ents = {normalize(ent.text) for ent in doc.ents if ent.label_ in labels}
-    return ents 
\ No newline at end of file
+    return get_entities_many([text], labels)[0]
@@ -13,38 +13,34 @@ def extract_text(file_bytes: bytes, filename: str) -> str:
     Универсальный извлекатель текста из PDF, DOCX и изображений.
     """
     import io
-    import fitz  # pymupdf
-    from pdf2image import convert_from_bytes
     import pytesseract
-    from docx import Document
+    from app.services.docx_stream import iter_lines
+    from app.services.image_prep import load_photo
+    from app.services.page_engine import extract_document, ocr_image
+    from app.services.text_extractors import STREAM_EXTRACTORS, collect, extract_streaming
 
     try:
         ext = filename.lower().split('.')[-1]
         if ext == "pdf":
-            # PDF: пробуем pymupdf, если не получилось — OCR
-            try:
-                doc = fitz.open(stream=file_bytes, filetype="pdf")
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-                if text.strip():
-                    log.info("pdf_text_extracted", filename=filename, ext=ext)
-                    return text
-            except Exception:
-                pass
-            # OCR по страницам
-            images = convert_from_bytes(file_bytes)
-            log.info("pdf_text_extracted", filename=filename, ext=ext, pages=len(images))
-            return "\n".join(pytesseract.image_to_string(img, lang="rus+eng") for img in images)
+            # PDF: решаем по каждой странице — текстовый слой или OCR
+            doc = extract_document(file_bytes)
+            log.info(
+                "pdf_text_extracted", filename=filename, ext=ext,
+                pages=doc.page_count, ocr_pages=doc.ocr_page_count,
+            )
+            return doc.text
         elif ext in ("jpg", "jpeg", "png"):
-            from PIL import Image
-            img = Image.open(io.BytesIO(file_bytes))
-            log.info("image_text_extracted", filename=filename, ext=ext)
-            return pytesseract.image_to_string(img, lang="rus+eng")
+            img = load_photo(file_bytes)
+            log.info("image_text_extracted", filename=filename, ext=ext, shape=img.shape)
+            return ocr_image(img)
         elif ext == "docx":
-            doc = Document(io.BytesIO(file_bytes))
-            log.info("docx_text_extracted", filename=filename, ext=ext)
-            return "\n".join([p.text for p in doc.paragraphs])
+            text = collect(iter_lines(file_bytes))
+            log.info("docx_text_extracted", filename=filename, ext=ext, chars=len(text))
+            return text
+        elif ext in STREAM_EXTRACTORS:
+            text = extract_streaming(file_bytes, ext)
+            log.info("stream_text_extracted", filename=filename, ext=ext, chars=len(text))
+            return text
         else:
             log.warning("unsupported_filetype", filename=filename, ext=ext)
             return ""
@@ -56,7 +52,17 @@ async def run_ocr(file_path: str) -> str:
     """
     Асинхронно извлекает текст из файла по пути file_path (PDF, DOCX, изображения).
     """
+    from app.services.text_extractors import STREAM_EXTRACTORS, extract_streaming
+
     filename = os.path.basename(file_path)
+    ext = filename.lower().split('.')[-1]
+    if ext in STREAM_EXTRACTORS:
+        # читаем прямо с диска, не поднимая весь файл в память
+        try:
+            return extract_streaming(file_path, ext)
+        except Exception as e:
+            log.error("ocr_failed", filename=filename, error=str(e))
+            return ""
     async with aiofiles.open(file_path, "rb") as f:
         file_bytes = await f.read()
     return extract_text(file_bytes, filename)
@@ -0,0 +1,206 @@
+"""Постраничный движок извлечения текста из PDF.
+
+Каждая страница классифицируется отдельно (text / scanned / blank / mixed)
+по дешёвым эвристикам PyMuPDF: текстовый слой берём как есть, пустые
+страницы пропускаем, OCR запускаем только там, где он действительно нужен.
+Используется и в `ocr.extract_text`, и в `BankDocumentOCR`. Перед OCR
+каждая область проходит предпроход из `page_prepass` (пустота и psm,
+по `OCR_PREPASS_OSD` — ещё поворот и письменность) и подготовку из
+`image_prep`; рендерим с разрешением
+вклеенной картинки, но не выше `TARGET_DPI`.
+"""
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Iterator, NamedTuple
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytesseract
+import structlog
+
+from app.services.image_prep import MIN_DPI, TARGET_DPI, prepare_for_ocr, render_gray
+from app.services.page_prepass import is_blank, preview_ink_share, profile_image
+
+log = structlog.get_logger(__name__)
+
+MIN_TEXT_CHARS = 100        # меньше символов в слое — страница «без текста»
+MIN_IMAGE_SHARE = 0.1       # картинки меньше 10% площади (логотипы, печати) не OCR-им
+UNCOVERED_TEXT_CHARS = 20   # под картинкой нет текста → это вклеенный скан
+OCR_WORKERS = 4
+DEFAULT_TESSERACT_CONFIG = "--oem 3 -l rus+eng"
+
+
+class OcrRegion(NamedTuple):
+    rect: fitz.Rect
+    dpi: float      # собственное разрешение картинки в этой области
+
+
+class PageKind(str, Enum):
+    TEXT = "text"
+    SCANNED = "scanned"
+    BLANK = "blank"
+    MIXED = "mixed"
+
+
+@dataclass
+class PageResult:
+    number: int
+    kind: PageKind
+    text: str = ""
+    ocr_regions: int = 0
+
+
+@dataclass
+class ExtractedDocument:
+    pages: list[PageResult] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(p.text for p in self.pages if p.text)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def ocr_page_count(self) -> int:
+        return sum(1 for p in self.pages if p.ocr_regions)
+
+    def kinds(self) -> Counter:
+        return Counter(p.kind for p in self.pages)
+
+
+def open_document(source: str | bytes, filetype: str = "pdf") -> fitz.Document:
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype=filetype)
+    return fitz.open(source)
+
+
+def _image_regions(page: fitz.Page) -> list[OcrRegion]:
+    page_area = abs(page.rect) or 1.0
+    regions = []
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"])
+        rect = bbox & page.rect
+        if not rect.is_empty and abs(rect) / page_area >= MIN_IMAGE_SHARE:
+            dpi = info["width"] * 72 / (bbox.width or 1.0)
+            regions.append(OcrRegion(rect, dpi))
+    return regions
+
+
+def classify_page(page: fitz.Page) -> tuple[PageKind, str, list[OcrRegion]]:
+    """Возвращает (тип страницы, текстовый слой, области для OCR)."""
+    text = page.get_text()
+    chars = len(text.strip())
+    images = _image_regions(page)
+    if not chars and not images:
+        return PageKind.BLANK, "", []
+    if chars < MIN_TEXT_CHARS:
+        if images:
+            return PageKind.SCANNED, "", [OcrRegion(page.rect, max(r.dpi for r in images))]
+        return PageKind.TEXT, text, []
+    # Текст есть. Картинки, под которыми уже лежит текстовый слой
+    # (OCR-нутые сканы), повторно не распознаём.
+    uncovered = [
+        r for r in images
+        if len(page.get_text(clip=r.rect).strip()) < UNCOVERED_TEXT_CHARS
+    ]
+    if uncovered:
+        return PageKind.MIXED, text, uncovered
+    return PageKind.TEXT, text, []
+
+
+def render_region(page: fitz.Page, region: OcrRegion) -> np.ndarray:
+    # Рендер выше разрешения исходного скана не добавляет деталей,
+    # только пикселей для tesseract
+    return render_gray(page, region.rect, dpi=min(max(region.dpi, MIN_DPI), TARGET_DPI))
+
+
+def ocr_image(
+    img: np.ndarray,
+    config: str = DEFAULT_TESSERACT_CONFIG,
+    prepass: bool = True,
+    ink_share: float | None = None,
+) -> str:
+    if prepass:
+        profile = profile_image(img, ink_share)
+        if profile.blank:
+            return ""
+        img, config = profile.upright(img), profile.config(config)
+    img = prepare_for_ocr(img)
+    if not img.size:
+        return ""
+    try:
+        return pytesseract.image_to_string(img, config=config)
+    except Exception as e:
+        log.warning("page_ocr_failed", error=str(e))
+        return ""
+
+
+def _finish(result: PageResult, futures: list[Future]) -> PageResult:
+    ocr_text = "\n".join(f.result() for f in futures).strip()
+    if result.kind == PageKind.SCANNED:
+        result.text = ocr_text
+    elif ocr_text:
+        result.text = f"{result.text}\n{ocr_text}"
+    return result
+
+
+def iter_pages(
+    doc: fitz.Document,
+    tesseract_config: str = DEFAULT_TESSERACT_CONFIG,
+    workers: int = OCR_WORKERS,
+    prepass: bool = True,
+) -> Iterator[PageResult]:
+    """Отдаёт страницы по порядку по мере готовности.
+
+    PyMuPDF не потокобезопасен, поэтому классификация и рендер идут в
+    текущем потоке, а tesseract — в пуле; в полёте держим не больше
+    `2 * workers` страниц, чтобы не копить картинки в памяти.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending: deque[tuple[PageResult, list[Future]]] = deque()
+    try:
+        for page in doc:
+            kind, text, regions = classify_page(page)
+            shares: list[float | None] = [None] * len(regions)
+            if prepass and regions:
+                # Пустые сканы (белый лист, оборот) отсекаем по превью,
+                # не рендеря страницу в полном разрешении
+                shares = [preview_ink_share(page, r.rect) for r in regions]
+                regions = [r for r, share in zip(regions, shares) if not is_blank(share)]
+                shares = [share for share in shares if not is_blank(share)]
+                if not regions and kind == PageKind.SCANNED:
+                    kind = PageKind.BLANK
+            result = PageResult(number=page.number + 1, kind=kind, text=text, ocr_regions=len(regions))
+            futures = [
+                pool.submit(ocr_image, render_region(page, region), tesseract_config, prepass, share)
+                for region, share in zip(regions, shares)
+            ]
+            pending.append((result, futures))
+            while pending and (len(pending) > 2 * workers or all(f.done() for f in pending[0][1])):
+                yield _finish(*pending.popleft())
+        while pending:
+            yield _finish(*pending.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_document(
+    source: str | bytes,
+    filetype: str = "pdf",
+    tesseract_config: str = DEFAULT_TESSERACT_CONFIG,
+    workers: int = OCR_WORKERS,
+    prepass: bool = True,
+) -> ExtractedDocument:
+    with open_document(source, filetype) as doc:
+        result = ExtractedDocument(pages=list(iter_pages(doc, tesseract_config, workers, prepass)))
+    kinds = result.kinds()
+    log.info(
+        "document_pages_extracted",
+        pages=result.page_count,
+        **{kind.value: kinds.get(kind, 0) for kind in PageKind},
+    )
+    return result
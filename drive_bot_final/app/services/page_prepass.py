@@ -0,0 +1,114 @@
+"""Дешёвый предпроход по странице перед OCR.
+
+По гистограмме уменьшенного пиксмапа отсекаем пустые страницы, по
+плотности чернил выбираем режим сегментации (psm). Это почти бесплатно
+и включено всегда.
+
+Tesseract OSD (поворот и письменность) — отдельный вызов tesseract на
+каждую непустую область, поэтому он только по `OCR_PREPASS_OSD`: окупиться
+он может лишь там, где много перевёрнутых или чисто латинских сканов
+(проверять `benchmarks/bench_ocr_prepass.py` на своём корпусе). По
+письменности сужаем языки: латинской странице хватает `-l eng`, а
+кириллической оставляем `rus+eng` — в выписках на ней IBAN, SWIFT и
+латинские имена плательщиков. OSD идёт по уменьшенной до `OSD_MAX_SIDE`
+копии.
+"""
+import re
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+import numpy as np
+import pytesseract
+import structlog
+
+from app.config import settings
+from app.services.image_prep import pixmap_to_array
+
+log = structlog.get_logger(__name__)
+
+PREVIEW_ZOOM = 0.25         # ~18 dpi: для гистограммы хватает с запасом
+INK_DELTA = 60              # насколько пиксель темнее фона, чтобы считаться «чернилами»
+BLANK_INK_SHARE = 0.002     # меньше 0.2% чернил — пустая страница (пыль, тень от скрепки)
+SPARSE_INK_SHARE = 0.02     # разреженный текст (бланки, подписи) → psm 11
+MIN_SCRIPT_CONF = 1.0
+MIN_ORIENTATION_CONF = 1.5
+OSD_MAX_SIDE = 1600         # пикселей по длинной стороне для OSD
+
+# письменность → языки, которые оставляем из базового набора
+SCRIPT_LANGS = {"Cyrillic": ("rus", "eng"), "Latin": ("eng",)}
+_LANG_RE = re.compile(r"-l\s+(\S+)")
+_PSM_RE = re.compile(r"\s*--psm\s+\d+")
+
+
+@dataclass
+class PageProfile:
+    blank: bool = False
+    ink_share: float = 0.0
+    rotate: int = 0
+    script: str | None = None
+
+    def config(self, base: str) -> str:
+        """Сужает базовый конфиг tesseract под страницу."""
+        config = base
+        match = _LANG_RE.search(base)
+        base_langs = match.group(1).split("+") if match else []
+        langs = [l for l in base_langs if l in SCRIPT_LANGS.get(self.script or "", base_langs)]
+        if langs and langs != base_langs:
+            config = _LANG_RE.sub(f"-l {'+'.join(langs)}", config)
+        if self.ink_share < SPARSE_INK_SHARE:
+            config = _PSM_RE.sub("", config).strip() + " --psm 11"
+        return config
+
+    def upright(self, img: np.ndarray) -> np.ndarray:
+        if not self.rotate:
+            return img
+        # OSD отдаёт поворот по часовой стрелке, rot90 крутит против
+        return np.ascontiguousarray(np.rot90(img, k=-(self.rotate // 90)))
+
+
+def ink_share(gray: np.ndarray) -> float:
+    """Доля «чернильных» пикселей относительно самого частого уровня (фона)."""
+    if not gray.size:
+        return 0.0
+    hist = np.bincount(gray.ravel(), minlength=256)
+    background = int(hist.argmax())
+    return float(hist[: max(background - INK_DELTA, 0)].sum()) / gray.size
+
+
+def preview_ink_share(page: fitz.Page, clip: fitz.Rect | None = None) -> float:
+    pix = page.get_pixmap(matrix=fitz.Matrix(PREVIEW_ZOOM, PREVIEW_ZOOM), colorspace=fitz.csGRAY, clip=clip)
+    return ink_share(pixmap_to_array(pix))
+
+
+def is_blank(share: float) -> bool:
+    return share < BLANK_INK_SHARE
+
+
+def osd_preview(img: np.ndarray) -> np.ndarray:
+    """Копия не больше `OSD_MAX_SIDE` по длинной стороне (прореживанием, без фильтрации)."""
+    step = -(-max(img.shape[:2], default=0) // OSD_MAX_SIDE)
+    return img if step <= 1 else np.ascontiguousarray(img[::step, ::step])
+
+
+def detect_orientation_script(img: np.ndarray) -> tuple[int, str | None]:
+    """Поворот и письменность через tesseract OSD; при неуверенности — (0, None)."""
+    try:
+        osd = pytesseract.image_to_osd(osd_preview(img), output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        # Слишком мало текста для OSD или нет osd.traineddata
+        log.debug("osd_failed", error=str(e))
+        return 0, None
+    rotate = int(osd.get("rotate", 0)) if float(osd.get("orientation_conf", 0)) >= MIN_ORIENTATION_CONF else 0
+    script = osd.get("script") if float(osd.get("script_conf", 0)) >= MIN_SCRIPT_CONF else None
+    return rotate, script
+
+
+def profile_image(img: np.ndarray, share: float | None = None) -> PageProfile:
+    if share is None:
+        share = ink_share(img)
+    if is_blank(share):
+        return PageProfile(blank=True, ink_share=share)
+    if not settings.OCR_PREPASS_OSD:
+        return PageProfile(ink_share=share)
+    rotate, script = detect_orientation_script(img)
+    return PageProfile(ink_share=share, rotate=rotate, script=script)
@@ -0,0 +1,108 @@
+"""Учёт платежей между выписками: дневные и месячные выписки пересекаются.
+
+Отпечаток платежа — хэш от нормализованных суммы (в копейках), валюты,
+даты, счетов и номера документа; нераспознанной даты в отпечатке нет —
+подставленное «сейчас» дало бы той же выписке, загруженной на другой
+день, новые отпечатки. Отпечатки пользователя лежат в
+Redis-множестве: SADD отвечает, новый ли платёж, за O(1). Итоги по
+валютам копятся в хэше через HINCRBY только для новых платежей — так
+сводные суммы по всем выпискам не задваиваются. SADD и HINCRBY идут
+одним Lua-скриптом: платёж не может оказаться «уже виденным», так и не
+попав в итоги, если воркер упал между ними.
+
+Одинаковые платежи внутри одной выписки (две комиссии по 100 ₽ за день)
+различаются порядковым номером повтора: повторная загрузка даст те же
+отпечатки, а месячная выписка, где таких комиссий три, добавит третью.
+"""
+import hashlib
+import re
+from collections import Counter
+from decimal import Decimal
+from typing import Iterable, List
+
+import redis.asyncio as aioredis
+import structlog
+
+from app.services.bank_ocr_service import BankPayment
+
+log = structlog.get_logger(__name__)
+
+LEDGER_TTL = 86400 * 400        # больше года: годовые выписки тоже ловим
+_NON_DIGITS = re.compile(r"\D")
+
+# KEYS: отпечатки, итоги; ARGV: TTL, затем тройки (отпечаток, валюта, сумма в копейках).
+# Возвращает 1/0 на каждый платёж — новый ли он.
+REGISTER_SCRIPT = """
+local added = {}
+for i = 2, #ARGV, 3 do
+    local new = redis.call('SADD', KEYS[1], ARGV[i])
+    if new == 1 then
+        redis.call('HINCRBY', KEYS[2], ARGV[i + 1], ARGV[i + 2])
+        redis.call('HINCRBY', KEYS[2], ARGV[i + 1] .. ':count', 1)
+    end
+    added[#added + 1] = new
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return added
+"""
+
+
+def payment_fingerprint(payment: BankPayment, occurrence: int = 0) -> str:
+    parts = (
+        str(int((payment.amount * 100).to_integral_value())),
+        payment.currency.upper(),
+        payment.date.strftime("%Y%m%d") if payment.date_parsed else "",
+        _NON_DIGITS.sub("", payment.account_from or ""),
+        _NON_DIGITS.sub("", payment.account_to or ""),
+        (payment.reference or "").strip().upper(),
+        str(occurrence),
+    )
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def statement_fingerprints(payments: Iterable[BankPayment]) -> List[str]:
+    seen: Counter = Counter()
+    fingerprints = []
+    for payment in payments:
+        base = payment_fingerprint(payment)
+        fingerprints.append(payment_fingerprint(payment, seen[base]) if seen[base] else base)
+        seen[base] += 1
+    return fingerprints
+
+
+class PaymentLedger:
+    """Отпечатки и сводные итоги платежей пользователя по всем выпискам."""
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self.redis = None
+        self._register = None
+    async def connect(self):
+        self.redis = aioredis.from_url(self.redis_url)
+        self._register = self.redis.register_script(REGISTER_SCRIPT)
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+    async def register(self, user_id: int, payments: List[BankPayment]) -> List[bool]:
+        """Запоминает платежи выписки; для каждого — True, если он новый."""
+        if not payments:
+            return []
+        seen_key, totals_key = f"payments_seen:{user_id}", f"payments_totals:{user_id}"
+        args = [LEDGER_TTL]
+        for payment, fingerprint in zip(payments, statement_fingerprints(payments)):
+            args += [fingerprint, payment.currency, int((payment.amount * 100).to_integral_value())]
+        is_new = [bool(added) for added in await self._register(keys=[seen_key, totals_key], args=args)]
+        log.info("payments_registered", user_id=user_id, payments=len(payments), new=sum(is_new))
+        return is_new
+    async def get_totals(self, user_id: int) -> dict[str, tuple[Decimal, int]]:
+        """Валюта → (сумма, число платежей) по всем загруженным выпискам."""
+        raw = await self.redis.hgetall(f"payments_totals:{user_id}")
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()
+        }
+        return {
+            field: (Decimal(value) / 100, fields.get(f"{field}:count", 0))
+            for field, value in sorted(fields.items()) if not field.endswith(":count")
+        }
+    async def reset(self, user_id: int):
+        await self.redis.delete(f"payments_seen:{user_id}", f"payments_totals:{user_id}")
@@ -0,0 +1,220 @@
+"""Колоночное хранение платежей выписки.
+
+Суммы лежат в int64 в минимальных единицах (копейки/центы) — сложение
+точное, как у Decimal, но векторное. Валюта и контрагент хранятся
+категориально: массив кодов + словарь значений, дата — datetime64[D]
+(NaT, если даты в документе не нашлось).
+Итоги и группировки считаются через `np.add.at` по кодам, без обхода
+платежей в Python; выгрузка в Excel идёт через write-only книгу openpyxl,
+строки собираются из колонок по одной и сразу пишутся в файл.
+"""
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+import openpyxl
+import structlog
+
+from app.services.bank_ocr_service import BankPayment
+
+log = structlog.get_logger(__name__)
+
+MINOR_UNITS = 100               # копеек в рубле, центов в долларе
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_DAY = np.iinfo(np.int64).min # NaT в datetime64[D]: у платежа нет даты (date_parsed=False)
+NO_DAY_LABEL = "без даты"
+GROUP_KEYS = ("currency", "counterparty", "date")
+REPORT_TOP = 10
+EXCEL_COLUMNS = ["Дата", "Сумма", "Валюта", "Контрагент", "Назначение", "Счет плательщика", "Счет получателя", "Номер"]
+
+
+class Group(NamedTuple):
+    key: str                    # контрагент / дата; для группировки по валюте — сама валюта
+    currency: str
+    count: int
+    total: Decimal
+
+
+class _Categories:
+    """Строка → код категории, в порядке первого появления."""
+
+    def __init__(self):
+        self.codes = array("i")
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+
+    def add(self, value: str):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+
+class PaymentTableBuilder:
+    """Накопление платежей по колонкам — можно кормить пачками по мере OCR."""
+
+    def __init__(self):
+        self._amounts = array("q")
+        self._days = array("q")
+        self._currency = _Categories()
+        self._counterparty = _Categories()
+        self._purposes: list[str] = []
+        self._accounts_from: list[str] = []
+        self._accounts_to: list[str] = []
+        self._references: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def extend(self, payments: Iterable[BankPayment]):
+        for p in payments:
+            self._amounts.append(int((p.amount * MINOR_UNITS).to_integral_value()))
+            # подставленное «сейчас» не храним: иначе платёж уйдёт в сегодняшний день
+            self._days.append(p.date.toordinal() - EPOCH_ORDINAL if p.date_parsed else NO_DAY)
+            self._currency.add(p.currency)
+            self._counterparty.add(p.counterparty)
+            self._purposes.append(p.purpose)
+            self._accounts_from.append(p.account_from)
+            self._accounts_to.append(p.account_to)
+            self._references.append(p.reference or "")
+
+    def build(self) -> "PaymentTable":
+        return PaymentTable(
+            amount_minor=np.frombuffer(self._amounts, dtype=np.int64).copy(),
+            currency_codes=np.frombuffer(self._currency.codes, dtype=np.int32).copy(),
+            currencies=list(self._currency.values),
+            counterparty_codes=np.frombuffer(self._counterparty.codes, dtype=np.int32).copy(),
+            counterparties=list(self._counterparty.values),
+            dates=np.frombuffer(self._days, dtype=np.int64).astype("datetime64[D]"),
+            purposes=self._purposes,
+            accounts_from=self._accounts_from,
+            accounts_to=self._accounts_to,
+            references=self._references,
+        )
+
+
+@dataclass
+class PaymentTable:
+    amount_minor: np.ndarray        # int64, копейки
+    currency_codes: np.ndarray      # int32 → currencies
+    currencies: list[str]
+    counterparty_codes: np.ndarray  # int32 → counterparties
+    counterparties: list[str]
+    dates: np.ndarray               # datetime64[D], NaT — без даты
+    purposes: list[str]
+    accounts_from: list[str]
+    accounts_to: list[str]
+    references: list[str]
+
+    @classmethod
+    def from_payments(cls, payments: Iterable[BankPayment]) -> "PaymentTable":
+        builder = PaymentTableBuilder()
+        builder.extend(payments)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.amount_minor)
+
+    def totals_by_currency(self) -> dict[str, Decimal]:
+        sums = np.zeros(len(self.currencies), dtype=np.int64)
+        np.add.at(sums, self.currency_codes, self.amount_minor)
+        return {cur: _to_decimal(s) for cur, s in zip(self.currencies, sums.tolist())}
+
+    def group_by(self, key: str) -> list[Group]:
+        """Итоги по валюте, контрагенту или дню; суммы не смешивают валюты.
+
+        Сортировка — по убыванию суммы внутри валюты.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Неизвестный ключ группировки: {key}")
+        n_cur = max(len(self.currencies), 1)
+        if key == "currency":
+            labels, codes = self.currencies, self.currency_codes
+        elif key == "counterparty":
+            labels, codes = self.counterparties, self.counterparty_codes
+        else:
+            days, codes = np.unique(self.dates, return_inverse=True)
+            labels = [d.strftime("%d.%m.%Y") if d else NO_DAY_LABEL for d in days.tolist()]
+        # составной код (ключ, валюта) → плотные номера групп
+        combined = codes.astype(np.int64) * n_cur + self.currency_codes
+        groups, inverse = np.unique(combined, return_inverse=True)
+        sums = np.zeros(len(groups), dtype=np.int64)
+        counts = np.zeros(len(groups), dtype=np.int64)
+        np.add.at(sums, inverse, self.amount_minor)
+        np.add.at(counts, inverse, 1)
+        order = np.lexsort((-sums, groups % n_cur))
+        return [
+            Group(labels[g // n_cur], self.currencies[g % n_cur], c, _to_decimal(s))
+            for g, c, s in zip(groups[order].tolist(), counts[order].tolist(), sums[order].tolist())
+        ]
+
+    def row(self, i: int) -> BankPayment:
+        """Один платёж обратно в BankPayment — для отчётов по отдельным строкам."""
+        day = int(self.dates[i].astype("int64"))
+        return BankPayment(
+            amount=_to_decimal(int(self.amount_minor[i])),
+            currency=self.currencies[self.currency_codes[i]],
+            counterparty=self.counterparties[self.counterparty_codes[i]],
+            purpose=self.purposes[i],
+            date=datetime.now() if day == NO_DAY else datetime.fromordinal(day + EPOCH_ORDINAL),
+            account_from=self.accounts_from[i],
+            account_to=self.accounts_to[i],
+            reference=self.references[i] or None,
+            date_parsed=day != NO_DAY,
+        )
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Строки для выгрузки, по одной; объекты BankPayment не создаются.
+
+        Дата без значения (NaT) уходит пустой ячейкой.
+        """
+        amounts = (self.amount_minor / MINOR_UNITS).tolist()
+        dates = self.dates.tolist()
+        counterparties = self.counterparty_codes.tolist()
+        for i, code in enumerate(self.currency_codes.tolist()):
+            yield (
+                dates[i], amounts[i], self.currencies[code],
+                self.counterparties[counterparties[i]], self.purposes[i],
+                self.accounts_from[i], self.accounts_to[i], self.references[i],
+            )
+
+
+def _to_decimal(minor: int) -> Decimal:
+    return Decimal(minor) / MINOR_UNITS
+
+
+def write_xlsx(table: PaymentTable, path: str):
+    """Платежи и итоги по контрагентам в xlsx через write-only книгу."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Платежи")
+    ws.append(EXCEL_COLUMNS)
+    for row in table.iter_rows():
+        ws.append(row)
+    summary = wb.create_sheet("Итоги")
+    summary.append(["Контрагент", "Валюта", "Платежей", "Сумма"])
+    for g in table.group_by("counterparty"):
+        summary.append([g.key, g.currency, g.count, float(g.total)])
+    summary.append([])
+    for g in table.group_by("currency"):
+        summary.append(["Итого", g.currency, g.count, float(g.total)])
+    wb.save(path)
+    log.info("payments_xlsx_written", path=path, rows=len(table))
+
+
+def format_detailed_report(table: PaymentTable, top: int = REPORT_TOP) -> str:
+    """Markdown: итоги по валютам, крупнейшие контрагенты и дни."""
+    report = f"📊 **Подробный отчет: {len(table)} платежей**\n\n💰 **По валютам:**\n"
+    for g in table.group_by("currency"):
+        report += f"   {g.currency}: {g.total:,.2f} ({g.count} шт.)\n"
+    for title, key in (("👤 **Крупнейшие контрагенты:**", "counterparty"), ("📅 **По дням:**", "date")):
+        groups = table.group_by(key)
+        report += f"\n{title}\n"
+        for g in groups[:top]:
+            report += f"   {g.key} — {g.total:,.2f} {g.currency} ({g.count} шт.)\n"
+        if len(groups) > top:
+            report += f"   ... и еще {len(groups) - top}\n"
+    return report
@@ -0,0 +1,21 @@
+"""Общий пул процессов для CPU-тяжёлой работы (сверка строк, таблицы PDF).
+
+Один пул на процесс бота: воркеры стартуют один раз и переиспользуются.
+Метод запуска — spawn: форк процесса с event loop и потоками бота
+небезопасен.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
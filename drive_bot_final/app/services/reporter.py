@@ -1,20 +1,76 @@
-from app.services.extractor import extract_pairs
-from app.services.tokeniser import extract_tokens
+from app.services.extractor import extract_pairs, pair_boxes, pair_pages
+from app.services.tokeniser import extract_tokens, iter_token_spans, normal
 from app.services.comparer import compare_tokens
-import shutil, docx, pdfplumber, fitz
+from app.services.process_pool import get_process_pool
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import as_completed
+from typing import Callable, Optional
+import fcntl, hashlib, os, shutil, docx, pdfplumber, fitz
 import structlog
 log = structlog.get_logger(__name__)
 
-def validate_doc(path: str):
+RULES_VERSION = 2           # менять при любой правке токенизации, сравнения или подсветки
+CHUNK_ROWS = 200            # строк таблицы на задачу пула
+MESSAGE_LIMIT = 3000        # символов отчёта на сообщение: запас под экранирование до 4096
+PARALLEL_MIN_ROWS = 400     # меньше — считаем в текущем процессе, пул дороже
+FICLONE = 0x40049409        # ioctl reflink: btrfs, XFS, overlayfs поверх них
+NOTE_STEP = 20              # pt между заметками «есть расхождение» на скане
+
+def _check_rows(rows: list[tuple[int, str, str]]) -> list[tuple[int, str, str]]:
+    misses = []
+    for i, l, r in rows:
+        if normal(l) == normal(r):
+            continue        # тексты совпадают — токены тоже
+        if compare_tokens(extract_tokens(l), extract_tokens(r)):
+            misses.append((i, l, r))
+    return misses
+
+def row_key(l: str, r: str) -> str:
+    """Ключ строки для кэша вердиктов: вердикт зависит только от текста обеих ячеек."""
+    return hashlib.blake2b(f"{l}\x00{r}".encode(), digest_size=12).hexdigest()
+
+def find_misses(pairs: list[tuple[str, str]],
+                on_progress: Optional[Callable[[int, int], None]] = None,
+                verdicts: Optional[Mapping[str, bool]] = None) -> list[tuple[int, str, str]]:
+    """Строки с расхождениями в порядке документа; большие таблицы — пулом процессов.
+
+    `verdicts` — известные результаты по `row_key`: такие строки не сверяются заново.
+    """
+    rows = [(i, l, r) for i, (l, r) in enumerate(pairs, 1)]
+    total = len(rows)
+    misses, done = [], 0
+    if verdicts:
+        todo = []
+        for row in rows:
+            verdict = verdicts.get(row_key(row[1], row[2]))
+            if verdict is None:
+                todo.append(row)
+            elif verdict:
+                misses.append(row)
+        done, rows = total - len(todo), todo
+    if len(rows) < PARALLEL_MIN_ROWS:
+        misses.extend(_check_rows(rows))
+        if on_progress:
+            on_progress(total, total)
+        return sorted(misses, key=lambda m: m[0])
+    chunks = [rows[k:k + CHUNK_ROWS] for k in range(0, len(rows), CHUNK_ROWS)]
+    pool = get_process_pool()
+    futures = {pool.submit(_check_rows, chunk): len(chunk) for chunk in chunks}
+    for future in as_completed(futures):
+        misses.extend(future.result())
+        done += futures[future]
+        if on_progress:
+            on_progress(done, total)
+    return sorted(misses, key=lambda m: m[0])
+
+def validate_doc(path: str, on_progress: Optional[Callable[[int, int], None]] = None,
+                 verdicts: Optional[Mapping[str, bool]] = None):
     try:
         pairs = extract_pairs(path)
-        all_miss = []
-        for i, (l, r) in enumerate(pairs, 1):
-            miss = compare_tokens(extract_tokens(l), extract_tokens(r))
-            if miss:
-                all_miss.append((i, l, r))
+        all_miss = find_misses(pairs, on_progress, verdicts)
         patched = highlight_diffs(path, all_miss)
-        log.info("doc_validated", file=path, misses=len(all_miss))
+        log.info("doc_validated", file=path, rows=len(pairs), misses=len(all_miss))
         return all_miss, patched
     except Exception as e:
         log.error("validate_doc_failed", file=path, error=str(e))
@@ -26,9 +82,79 @@ def build_report(misses):
         lines.append(f"| {i} | `{l[:40]}` | `{r[:40]}` |")
     return "\n".join(lines)
 
+def iter_report_chunks(misses, limit: int = MESSAGE_LIMIT):
+    """Отчёт кусками под лимит сообщения Telegram; шапка таблицы — в каждом."""
+    head = build_report([])
+    chunk, size = [], len(head)
+    for line in build_report(misses).split("\n")[2:]:
+        if chunk and size + len(line) + 1 > limit:
+            yield "\n".join([head, *chunk])
+            chunk, size = [], len(head)
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield "\n".join([head, *chunk])
+
+def clone_file(src: str, dst: str):
+    """Копия без копирования данных, где ФС умеет reflink; иначе обычная."""
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+def _note_point(area: fitz.Rect, k: int, box: Optional[fitz.Rect]) -> fitz.Point:
+    """Место заметки: у строки, если её рамка известна, иначе k-я клетка сетки; всегда в пределах `area`."""
+    if box is not None:
+        x, y = box.x0, box.y0
+    else:
+        per_column = max(int((area.height - 2 * NOTE_STEP) // NOTE_STEP), 1)
+        x = area.x0 + NOTE_STEP * (1 + k // per_column)
+        y = area.y0 + NOTE_STEP * (1 + k % per_column)
+    return fitz.Point(min(max(x, area.x0), area.x1 - NOTE_STEP), min(max(y, area.y0), area.y1 - NOTE_STEP))
+
+def _highlight_pdf(dst: str, misses, pages: Optional[list[int]], boxes: Optional[list] = None):
+    by_page = defaultdict(list)
+    for row_idx, l, r in misses:
+        known = pages and row_idx <= len(pages)
+        page_no = pages[row_idx - 1] if known else 0
+        box = fitz.Rect(boxes[row_idx - 1]) if known and boxes else None
+        by_page[page_no].append((row_idx, l, r, box))
+    doc = fitz.open(dst)
+    try:
+        # трогаем только страницы с расхождениями
+        for page_no, rows in sorted(by_page.items()):
+            page = doc[page_no]
+            for k, (row_idx, l, r, box) in enumerate(rows):
+                missing = set(compare_tokens(extract_tokens(l), extract_tokens(r)))
+                found = dict.fromkeys(raw for token, raw in iter_token_spans(l) if token in missing)
+                # только в своей строке: тот же счёт в других строках не подсвечиваем
+                rects = [rect for raw in found for rect in page.search_for(raw, clip=box)]
+                if rects:
+                    annot = page.add_highlight_annot(rects)
+                    annot.set_info(content=f"Строка {row_idx}: нет справа — {', '.join(found)}")
+                    annot.update()
+                else:
+                    # текста на странице нет (скан) — помечаем строку заметкой
+                    page.add_text_annot(_note_point(page.rect, k, box), f"⛔️ Строка {row_idx}: есть расхождение")
+        if doc.can_save_incrementally():
+            doc.saveIncr()      # дописываем аннотации в конец файла, остальное не трогаем
+            return
+        tmp = dst + ".tmp"
+        doc.save(tmp, garbage=1, deflate=True)
+    finally:
+        doc.close()
+    os.replace(tmp, dst)
+
+def patched_path(src: str) -> str:
+    root, ext = os.path.splitext(src)
+    return f"{root}_patched{ext}"
+
 def highlight_diffs(src: str, misses):
-    dst = src.replace(".", "_patched.")
-    shutil.copy(src, dst)
+    dst = patched_path(src)
+    clone_file(src, dst)
     if dst.endswith(".docx"):
         doc = docx.Document(dst)
         for i, (row_idx, *_ ) in enumerate(misses):
@@ -38,9 +164,6 @@ def highlight_diffs(src: str, misses):
             for run in tbl.rows[row_idx-1].cells[1].paragraphs[0].runs:
                 run.font.highlight_color = docx.enum.text.WD_COLOR_INDEX.RED
         doc.save(dst)
-    else:
-        doc = fitz.open(dst)
-        for page in doc:
-            annot = page.add_text_annot((50, 50), "⛔️ Есть расхождение")
-        doc.save(dst)
-    return dst 
\ No newline at end of file
+    elif misses:
+        _highlight_pdf(dst, misses, pair_pages(src), pair_boxes(src))
+    return dst
@@ -1,28 +1,127 @@
-import os, structlog
+"""Сверка документов в воркере Celery (очередь `validate`).
+
+Бот только ставит задачу: воркер сам скачивает файл по file_id, сверяет
+его на своём пуле процессов, обновляет статусное сообщение и шлёт в чат
+отчёт и файл с подсветкой. Задача подтверждается после выполнения
+(`acks_late`) — упавший воркер не теряет документ. Повторная сверка того
+же файла берётся из `ValidationCache`, новой редакции — сверяет только
+изменившиеся строки.
+
+Запуск воркера:
+    celery -A app.services.celery_app worker -Q validate --pool threads --concurrency 4
+"""
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import suppress
+
+import structlog
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from app.config import settings
+from app.services import worker_runtime
 from app.services.celery_app import celery_app
-from app.services.reporter import validate_doc, build_report
-from app.services.drive import upload_file
+from app.services.extractor import extract_pairs, file_hash
+from app.services.reporter import iter_report_chunks, row_key, validate_doc
+from app.services.validation_cache import ValidationCache, document_lineage, pack_patch, restore_patch
 from app.utils.telegram_utils import escape_markdown
 
 log = structlog.get_logger(__name__)
 
-@celery_app.task
-def validate_task(file_path: str, user_id: int, chat_id: int, bot_token: str):
-    from aiogram import Bot
-    bot = Bot(bot_token, parse_mode="HTML")
+PROGRESS_INTERVAL = 2.0     # секунд между обновлениями статуса
+
+
+@celery_app.task(name="validate.document", acks_late=True)
+def validate_document(file_id: str, filename: str, chat_id: int, status_message_id: int):
+    worker_runtime.run(run_validation_job(worker_runtime.get_bot(), file_id, filename, chat_id, status_message_id))
+
+
+async def edit_status(bot: Bot, chat_id: int, message_id: int, text: str):
+    """Правит статусное сообщение; ошибки Telegram только логируются."""
     try:
-        misses, patched = validate_doc(file_path)
+        await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+    except Exception as e:
+        # «message is not modified» и т.п. — статус не критичен
+        log.debug("validate_status_edit_failed", chat_id=chat_id, error=str(e))
+
 
+async def validate_cached(path: str, filename: str, chat_id: int, on_progress):
+    """`validate_doc` через кэш; без Redis — обычная сверка.
+
+    Ошибки Redis гасятся здесь, ошибки самого документа (битый файл) — нет.
+    """
+    loop = asyncio.get_running_loop()
+    doc_hash = await loop.run_in_executor(None, file_hash, path)
+    lineage = document_lineage(filename)
+    cache = ValidationCache(settings.REDIS_DSN)
+    try:
+        await cache.connect()
+        cached = await cache.get(doc_hash)
+    except Exception as e:
+        log.warning("validation_cache_failed", error=str(e))
+        await cache.close()
+        return await loop.run_in_executor(None, validate_doc, path, on_progress)
+    try:
+        if cached is not None:
+            patched = await loop.run_in_executor(None, restore_patch, path, cached)
+            log.info("validation_cache_hit", doc_hash=doc_hash, misses=len(cached.misses))
+            return cached.misses, patched
+        pairs = await loop.run_in_executor(None, extract_pairs, path)
+        keys = [row_key(l, r) for l, r in pairs]
+        try:
+            verdicts = await cache.get_verdicts(chat_id, lineage, keys)
+        except Exception as e:
+            log.warning("validation_cache_failed", error=str(e))
+            verdicts = {}
+        misses, patched = await loop.run_in_executor(None, validate_doc, path, on_progress, verdicts)
+        log.info("validation_rows_reused", rows=len(keys), reused=len(verdicts))
+        try:
+            missed = {i for i, *_ in misses}
+            kind, patch = await loop.run_in_executor(None, pack_patch, path, patched)
+            await cache.put(doc_hash, misses, kind, patch)
+            await cache.put_verdicts(chat_id, lineage, {k: i in missed for i, k in enumerate(keys, 1)})
+        except Exception as e:
+            log.warning("validation_cache_failed", error=str(e))
+        return misses, patched
+    finally:
+        await cache.close()
+
+
+async def run_validation_job(bot: Bot, file_id: str, filename: str, chat_id: int, status_message_id: int):
+    """Скачать, сверить, отправить отчёт и файл с подсветкой; временные файлы удаляются всегда."""
+    loop = asyncio.get_running_loop()
+    last_update = 0.0
+
+    def on_progress(done: int, total: int):
+        nonlocal last_update
+        if done != total and time.monotonic() - last_update < PROGRESS_INTERVAL:
+            return
+        last_update = time.monotonic()
+        text = f"🔎 Сверено строк: {done} из {total}"
+        asyncio.run_coroutine_threadsafe(edit_status(bot, chat_id, status_message_id, text), loop)
+
+    stem, ext = os.path.splitext(filename)
+    fd, path = tempfile.mkstemp(suffix=ext.lower())
+    os.close(fd)
+    patched = None
+    try:
+        await bot.download(file_id, destination=path)
+        misses, patched = await validate_cached(path, filename, chat_id, on_progress)
         if not misses:
-            txt = "✅ Проверка завершена, расхождений нет!"
-            await bot.send_message(chat_id, txt)
-        else:
-            report = build_report(misses)
-            await bot.send_message(chat_id, escape_markdown(report), parse_mode="Markdown")
-
-        await bot.send_document(chat_id, open(patched, "rb"), caption="Файл с подсветкой ⬆️")
-        os.remove(file_path)
-        os.remove(patched)
-        log.info("validate_task_success", file_path=file_path, user_id=user_id)
+            await bot.send_message(chat_id, "Ура! ❣️ Ошибок не найдено.")
+        for chunk in iter_report_chunks(misses):
+            await bot.send_message(chat_id, escape_markdown(chunk), parse_mode="Markdown")
+        await bot.send_document(
+            chat_id, FSInputFile(patched, filename=f"{stem}_patched{ext}"), caption="Подсветила различия 💡"
+        )
+        log.info("validation_sent", filename=filename, chat_id=chat_id, misses=len(misses))
     except Exception as e:
-        log.error("validate_task_error", file_path=file_path, user_id=user_id, error=str(e)) 
\ No newline at end of file
+        log.error("validation_failed", filename=filename, chat_id=chat_id, error=str(e))
+        await edit_status(bot, chat_id, status_message_id, f"❌ Ошибка при сверке: {e}")
+    finally:
+        for p in (path, patched):
+            if p:
+                with suppress(FileNotFoundError):
+                    os.remove(p)
@@ -0,0 +1,165 @@
+"""Потоковые извлекатели текста для xlsx, xls, doc, txt и tiff.
+
+Каждый извлекатель — генератор строк: файл читается по строкам таблицы,
+кускам текста или кадрам скана, а `collect` останавливает чтение, как
+только набрано `MAX_TEXT_CHARS` символов. Память не растёт с размером
+файла, а для угадывания имени документа хватает начала текста.
+"""
+import codecs
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import BinaryIO, Callable, Iterator
+
+import openpyxl
+import structlog
+
+from app.services.page_engine import PageKind, iter_pages, open_document
+
+log = structlog.get_logger(__name__)
+
+MAX_TEXT_CHARS = 200_000
+TXT_CHUNK = 64 * 1024
+TXT_ENCODINGS = ("utf-8-sig", "cp1251")     # cp1251 декодирует любые байты — последний
+ANTIWORD_TIMEOUT = 60
+
+Source = str | bytes
+
+
+def _open_binary(source: Source) -> BinaryIO:
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return open(source, "rb")
+
+
+def _row_text(values) -> str:
+    return "\t".join(str(v).strip() for v in values if v is not None and str(v).strip())
+
+
+def iter_xlsx(source: Source) -> Iterator[str]:
+    # read_only: строки читаются из XML по мере обхода, без дерева ячеек
+    with _open_binary(source) as f:
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                for row in ws.iter_rows(values_only=True):
+                    line = _row_text(row)
+                    if line:
+                        yield line
+        finally:
+            wb.close()
+
+
+def iter_xls(source: Source) -> Iterator[str]:
+    try:
+        import xlrd
+    except ImportError:
+        log.warning("xlrd_not_installed")
+        return
+    if isinstance(source, (bytes, bytearray)):
+        book = xlrd.open_workbook(file_contents=source, on_demand=True)
+    else:
+        book = xlrd.open_workbook(source, on_demand=True)
+    try:
+        for i in range(book.nsheets):
+            sheet = book.sheet_by_index(i)
+            for r in range(sheet.nrows):
+                line = _row_text(sheet.row_values(r))
+                if line:
+                    yield line
+            # on_demand: выгружаем прочитанный лист, держим в памяти один
+            book.unload_sheet(i)
+    finally:
+        book.release_resources()
+
+
+def iter_doc(source: Source) -> Iterator[str]:
+    """Старый бинарный .doc через antiword: читаем его stdout построчно."""
+    antiword = shutil.which("antiword")
+    if not antiword:
+        log.warning("antiword_not_installed")
+        return
+    tmp = None
+    if isinstance(source, (bytes, bytearray)):
+        fd, tmp = tempfile.mkstemp(suffix=".doc")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        source = tmp
+    proc = subprocess.Popen(
+        [antiword, "-w", "0", source], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                yield line
+    finally:
+        # генератор могли бросить на полпути (лимит символов) — не оставляем процесс
+        proc.kill()
+        proc.wait(timeout=ANTIWORD_TIMEOUT)
+        if tmp:
+            os.remove(tmp)
+
+
+def _guess_encoding(head: bytes) -> str:
+    for encoding in TXT_ENCODINGS:
+        try:
+            # инкрементальный декодер не спотыкается о символ, разрезанный границей куска
+            codecs.getincrementaldecoder(encoding)().decode(head)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return TXT_ENCODINGS[-1]
+
+
+def iter_txt(source: Source, chunk_size: int = TXT_CHUNK) -> Iterator[str]:
+    """Текст кусками по `chunk_size`; кодировку угадываем по первому куску."""
+    with _open_binary(source) as f:
+        chunk = f.read(chunk_size)
+        decoder = codecs.getincrementaldecoder(_guess_encoding(chunk))(errors="replace")
+        while chunk:
+            yield decoder.decode(chunk)
+            chunk = f.read(chunk_size)
+        yield decoder.decode(b"", final=True)
+
+
+def iter_tiff(source: Source) -> Iterator[str]:
+    # Кадры многостраничного TIFF — страницы того же движка: рендер по
+    # одному кадру, OCR параллельно в пуле
+    with open_document(source, filetype="tiff") as doc:
+        for page in iter_pages(doc):
+            if page.kind != PageKind.BLANK:
+                yield page.text
+
+
+STREAM_EXTRACTORS: dict[str, Callable[[Source], Iterator[str]]] = {
+    "xlsx": iter_xlsx,
+    "xls": iter_xls,
+    "doc": iter_doc,
+    "txt": iter_txt,
+    "tiff": iter_tiff,
+    "tif": iter_tiff,
+}
+
+
+def collect(parts: Iterator[str], limit: int = MAX_TEXT_CHARS, sep: str = "\n") -> str:
+    out, size = [], 0
+    try:
+        for part in parts:
+            size += len(part) + (len(sep) if out else 0)
+            out.append(part)
+            if size >= limit:
+                break
+    finally:
+        close = getattr(parts, "close", None)
+        if close:
+            close()
+    return sep.join(out)[:limit]
+
+
+def extract_streaming(source: Source, ext: str, limit: int = MAX_TEXT_CHARS) -> str:
+    extractor = STREAM_EXTRACTORS[ext]
+    sep = "" if extractor is iter_txt else "\n"
+    return collect(extractor(source), limit, sep)
@@ -1,17 +1,45 @@
-import re, unicodedata, transliterate
+"""Токены сверки: длинные номера, IBAN, даты, суммы с валютой.
+
+В таблице договора одни и те же счета, IBAN и даты повторяются в
+десятках строк, а сверка вызывает `extract_tokens` и `normal` для каждой
+ячейки. Результаты запоминаются (LRU по тексту ячейки и токена), токены
+интернируются — одинаковые строки в памяти одни и сравниваются по ссылке.
+
+Каждый токен содержит цифру, поэтому ячейки без цифр (обычный текст
+договора) отсекаются одним поиском `\\d`. Шаблоны в одно чередование не
+сливаются: их совпадения пересекаются (сумма с валютой содержит дату или
+длинный номер), а чередование нашло бы только одно из них.
+"""
+import re, sys, unicodedata, transliterate
+from functools import lru_cache
+
+CACHE_SIZE = 1 << 16        # ячеек и токенов в кэшах
 
 RE_NUM     = re.compile(r"\b\d{10,}\b")
 RE_IBAN    = re.compile(r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,}\b")
 RE_DATE    = re.compile(r"\d{2}\.\d{2}\.\d{4}")
 RE_CURRENCY= re.compile(r"\d[\d\s.,]+\s?(EUR|USD|RUB|₽|€|\$)")
+TOKEN_PATTERNS = (RE_NUM, RE_IBAN, RE_DATE, RE_CURRENCY)
+RE_DIGIT   = re.compile(r"\d")
+RE_SPACES  = re.compile(r"\s+")
 
+@lru_cache(CACHE_SIZE)
 def normal(txt: str) -> str:
     txt = txt.lower()
     txt = unicodedata.normalize("NFKD", txt)
-    return re.sub(r"\s+", "", txt)
+    return RE_SPACES.sub("", txt)
 
-def extract_tokens(s: str) -> set[str]:
+@lru_cache(CACHE_SIZE)
+def extract_tokens(s: str) -> frozenset[str]:
+    if not RE_DIGIT.search(s):
+        return frozenset()
     res = set()
-    for r in (RE_NUM, RE_IBAN, RE_DATE, RE_CURRENCY):
-        res |= set(r.findall(s))
-    return {normal(t) for t in res} 
\ No newline at end of file
+    for r in TOKEN_PATTERNS:
+        res.update(r.findall(s))
+    return frozenset(sys.intern(normal(t)) for t in res)
+
+def iter_token_spans(s: str):
+    """(токен, исходный текст) — то же, что `extract_tokens`, плюс фрагмент для поиска в PDF."""
+    for r in TOKEN_PATTERNS:
+        for m in r.finditer(s):
+            yield normal(m.group(1) if r.groups else m.group(0)), m.group(0)
@@ -0,0 +1,137 @@
+"""Кэш результатов сверки: договор перепроверяют после каждой правки.
+
+Два уровня, оба в Redis (воркеры сверки живут на разных машинах):
+
+* документ — по хэшу содержимого и `RULES_VERSION`: расхождения и
+  подсветка. PDF подсвечивается инкрементальным сохранением, то есть
+  файл с подсветкой — исходник плюс дописанный хвост; хранится только
+  хвост, файл собирается копией исходника и дозаписью. DOCX хранится
+  целиком, если не больше `MAX_PATCH_BYTES`; иначе — одни расхождения,
+  а подсветка пересчитывается без повторной сверки;
+* строки — вердикт «есть расхождение» по `row_key` в хэше «линии»
+  документа: чат плюс имя файла без пометок редакции (`Договор.v2.pdf`,
+  `Договор (1).pdf` → `договор`). В новой редакции договора заново
+  сверяются только изменившиеся строки. Хэш каждый раз заменяется
+  вердиктами последней редакции, так что он не больше одного документа.
+
+Смена `RULES_VERSION` меняет ключи: старые результаты просто истекают.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import redis.asyncio as aioredis
+
+from app.services.reporter import RULES_VERSION, clone_file, highlight_diffs, patched_path
+
+CACHE_TTL = 86400 * 30
+MAX_PATCH_BYTES = 10 * 1024 * 1024
+PATCH_APPEND, PATCH_FULL, PATCH_NONE = "append", "full", "none"
+_READ_CHUNK = 1 << 20
+# хвост имени, который меняется от редакции к редакции
+_REVISION_SUFFIX = re.compile(
+    r"(?:[\s._-]*(?:v|ver|ред|редакция|rev)\.?\s*\d+|[\s._-]*\(\d+\)|[\s._-]*(?:final|финал|копия|copy|правки?))+$"
+)
+
+
+def document_lineage(filename: str) -> str:
+    """Ключ линии документа: имя без расширения и пометок редакции."""
+    stem = os.path.splitext(filename)[0].lower().replace("ё", "е")
+    stem = _REVISION_SUFFIX.sub("", stem).strip(" ._-") or stem
+    return hashlib.blake2b(stem.encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class CachedValidation:
+    misses: list[tuple[int, str, str]]
+    kind: str
+    patch: bytes = b""
+
+
+def _is_prefix(src: str, patched: str) -> bool:
+    if os.path.getsize(patched) < os.path.getsize(src):
+        return False
+    with open(src, "rb") as a, open(patched, "rb") as b:
+        for chunk in iter(lambda: a.read(_READ_CHUNK), b""):
+            if b.read(len(chunk)) != chunk:
+                return False
+    return True
+
+
+def pack_patch(src: str, patched: str) -> tuple[str, bytes]:
+    """Что хранить от файла с подсветкой: дописанный хвост, файл целиком или ничего."""
+    if _is_prefix(src, patched):
+        with open(patched, "rb") as f:
+            f.seek(os.path.getsize(src))
+            return PATCH_APPEND, f.read()
+    if os.path.getsize(patched) <= MAX_PATCH_BYTES:
+        with open(patched, "rb") as f:
+            return PATCH_FULL, f.read()
+    return PATCH_NONE, b""
+
+
+def restore_patch(src: str, cached: CachedValidation) -> str:
+    """Файл с подсветкой рядом с `src`, как его сделал бы `highlight_diffs`."""
+    if cached.kind == PATCH_NONE:
+        return highlight_diffs(src, cached.misses)
+    dst = patched_path(src)
+    if cached.kind == PATCH_APPEND:
+        clone_file(src, dst)
+        with open(dst, "ab") as f:
+            f.write(cached.patch)
+    else:
+        with open(dst, "wb") as f:
+            f.write(cached.patch)
+    return dst
+
+
+class ValidationCache:
+    """Результаты сверки по содержимому документа и вердикты строк по чатам."""
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self.redis = None
+    async def connect(self):
+        self.redis = aioredis.from_url(self.redis_url)
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+    def _doc_key(self, doc_hash: str) -> str:
+        return f"validation:{RULES_VERSION}:{doc_hash}"
+    def _rows_key(self, chat_id: int, lineage: str) -> str:
+        return f"validation_rows:{RULES_VERSION}:{chat_id}:{lineage}"
+    async def get(self, doc_hash: str) -> Optional[CachedValidation]:
+        raw = await self.redis.hgetall(self._doc_key(doc_hash))
+        if not raw:
+            return None
+        raw = {(k.decode() if isinstance(k, bytes) else k): v for k, v in raw.items()}
+        kind = raw["kind"].decode() if isinstance(raw["kind"], bytes) else raw["kind"]
+        misses = [tuple(m) for m in json.loads(raw["misses"])]
+        return CachedValidation(misses, kind, raw.get("patch", b""))
+    async def put(self, doc_hash: str, misses, kind: str, patch: bytes):
+        key = self._doc_key(doc_hash)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={
+            "misses": json.dumps(misses, ensure_ascii=False), "kind": kind, "patch": patch,
+        })
+        pipe.expire(key, CACHE_TTL)
+        await pipe.execute()
+    async def get_verdicts(self, chat_id: int, lineage: str, keys: Iterable[str]) -> dict[str, bool]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        values = await self.redis.hmget(self._rows_key(chat_id, lineage), keys)
+        return {k: v in (b"1", "1") for k, v in zip(keys, values) if v is not None}
+    async def put_verdicts(self, chat_id: int, lineage: str, verdicts: dict[str, bool]):
+        """Заменяет вердикты линии вердиктами последней редакции."""
+        if not verdicts:
+            return
+        key = self._rows_key(chat_id, lineage)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={k: int(v) for k, v in verdicts.items()})
+        pipe.expire(key, CACHE_TTL)
+        await pipe.execute()
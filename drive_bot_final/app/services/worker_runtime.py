@@ -0,0 +1,84 @@
+"""Асинхронная среда для задач Celery: один event loop и один Bot на процесс.
+
+Задачи Celery синхронные. `asyncio.run` в каждой задаче создаёт и
+закрывает свой loop, поэтому aiohttp-сессию бота приходится открывать
+заново на каждое сообщение. Здесь loop живёт в фоновом потоке всё время
+работы воркера, задачи отдают ему корутины через `run` и ждут
+результат. Bot с его пулом соединений создаётся один раз и закрывается
+при остановке процесса воркера.
+
+Воркер сверки запускается с `--pool threads`: потоки делят один loop
+и один Bot, а CPU-тяжёлая часть уходит в общий пул процессов
+(`process_pool.get_process_pool`). С prefork у каждого дочернего процесса
+были бы свои loop, Bot и пул — тоже работает, но дороже.
+"""
+import asyncio
+import os
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+import structlog
+from aiogram import Bot
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from app.config import settings
+from app.utils.telegram_utils import make_session
+
+log = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+SHUTDOWN_TIMEOUT = 10       # секунд на закрытие сессии бота
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_bot: Optional[Bot] = None
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _pid
+    # после fork поток loop-а в дочерний процесс не переходит — заводим свой
+    if _loop is None or _pid != os.getpid():
+        with _lock:
+            if _loop is None or _pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="worker-loop", daemon=True).start()
+                _loop, _pid = loop, os.getpid()
+    return _loop
+
+
+def get_bot() -> Bot:
+    """Bot процесса; сессия открывается в loop-е `get_loop` при первом запросе."""
+    global _bot
+    get_loop()
+    if _bot is None:
+        with _lock:
+            if _bot is None:
+                _bot = Bot(settings.bot_token, session=make_session())
+    return _bot
+
+
+def run(coro: Awaitable[T]) -> T:
+    """Выполняет корутину в loop-е процесса и ждёт результат."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+def shutdown():
+    global _loop, _bot
+    if _loop is None or _pid != os.getpid():
+        return
+    loop, bot = _loop, _bot
+    _loop = _bot = None
+    if bot is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(bot.session.close(), loop).result(SHUTDOWN_TIMEOUT)
+        except Exception as e:
+            log.warning("worker_bot_close_failed", error=str(e))
+    loop.call_soon_threadsafe(loop.stop)
+    log.info("worker_runtime_stopped", pid=os.getpid())
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _on_worker_shutdown(**kwargs):
+    shutdown()
@@ -4,7 +4,7 @@ from typing import Optional
 
 __all__ = ["FilenameInfo", "parse_filename"]
 
-SUPPORTED_EXTS = {"pdf", "docx", "doc", "xlsx", "xls", "txt", "png", "jpeg", "jpg", "tiff"}
+SUPPORTED_EXTS = {"pdf", "docx", "doc", "xlsx", "xls", "txt", "csv", "png", "jpeg", "jpg", "tiff"}
 DOC_TYPES = [
     "договор", "агентский_договор", "агентский-договор", "поручение", "акт"
 ]
@@ -1,3 +1,29 @@
+from typing import Optional
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from app.config import settings
+
+TELEGRAM_DOWNLOAD_LIMIT = 20 * 1024 * 1024      # getFile облачного Bot API
+
+
+def make_session() -> Optional[AiohttpSession]:
+    """Сессия для локального Bot API; None — облачный api.telegram.org.
+
+    В режиме `--local` сервер отдаёт путь к файлу на своём диске, и
+    `Bot.download` читает файл оттуда, поэтому каталог сервера должен быть
+    смонтирован по тому же пути и у бота, и у воркеров.
+    """
+    if not settings.TELEGRAM_API_URL:
+        return None
+    return AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL, is_local=True))
+
+
+def can_download(file_size: Optional[int]) -> bool:
+    return bool(settings.TELEGRAM_API_URL) or not file_size or file_size <= TELEGRAM_DOWNLOAD_LIMIT
+
+
 def escape_markdown(text: str) -> str:
     """Экранирование спецсимволов для Telegram MarkdownV2."""
     escape_chars = r'_[]()~`>#+-=|{}.!'
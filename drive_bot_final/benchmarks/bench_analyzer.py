@@ -0,0 +1,73 @@
+"""Реквизиты из текста: один проход против findall по каждому шаблону.
+
+    python -m benchmarks.bench_analyzer [--words 60000] [--density 0.03] [--repeat 3]
+
+Генерирует текст договора (русская проза с вкраплениями IBAN, SWIFT,
+счетов, дат, номеров и сумм; `--density` — доля реквизитов среди слов),
+сверяет результат с прежним `extract_parameters` и печатает время.
+"""
+import argparse
+import logging
+import random
+import re
+import time
+
+import structlog
+
+from app.services.analyzer import R_PATTERNS, extract_parameters
+
+WORDS = (
+    "настоящий договор заключен между сторонами в лице генерального директора действующего "
+    "на основании устава о нижеследующем поставщик обязуется передать покупатель принять оплатить товар"
+).split()
+
+
+def legacy_extract(text: str) -> dict[str, list[str]]:
+    """Прежний `extract_parameters`: re.findall по каждому шаблону."""
+    res = {}
+    for key, pattern in R_PATTERNS.items():
+        found = [m.strip() for m in re.findall(pattern, text, flags=re.IGNORECASE)]
+        if found:
+            res[key] = found
+    return res
+
+
+def make_text(words: int, density: float, seed: int = 2) -> str:
+    rnd = random.Random(seed)
+    requisites = [
+        lambda: "DE89370400440532013000", lambda: "SABRRUMM", lambda: f"№ {rnd.randint(1, 999)}",
+        lambda: f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2024",
+        lambda: "".join(rnd.choices("0123456789", k=20)), lambda: f"{rnd.randint(1, 999)} 500,00 EUR",
+    ]
+    parts = []
+    for _ in range(words):
+        parts.append(rnd.choice(WORDS))
+        if rnd.random() < density:
+            parts.append(rnd.choice(requisites)())
+    return " ".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=60_000)
+    parser.add_argument("--density", type=float, default=0.03)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+    text = make_text(args.words, args.density)
+    assert extract_parameters(text) == legacy_extract(text)
+    timings = {}
+    for label, fn in (("findall×6", legacy_extract), ("один проход", extract_parameters)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            fn(text)
+        timings[label] = (time.perf_counter() - started) / args.repeat
+        print(f"{label:<12}: {timings[label] * 1000:.0f} мс на {len(text)} символов")
+    print(f"ускорение: x{timings['findall×6'] / timings['один проход']:.1f}")
+    started = time.perf_counter()
+    extract_parameters(text, ("iban", "date"), limit=1)
+    print(f"первые iban и date: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Разбор выписки: однопроходный сканер против прежних шаблонов по одному.
+
+    python -m benchmarks.bench_bank_scanner [--payments 2000] [--repeat 5]
+
+Генерирует синтетическую выписку, сверяет результаты (счета — как
+множества: раньше их порядок был случайным) и печатает время разбора.
+"""
+import argparse
+import random
+import re
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from app.services.bank_ocr_service import BankDocumentOCR, BankPayment
+
+LEGACY_PATTERNS = {
+    'amount': [
+        r'(\d+(?:\s?\d{3})*[,\.]\d{2})\s*(?:руб|рублей|USD|EUR|CNY)',
+        r'Сумма:?\s*(\d+(?:\s?\d{3})*[,\.]\d{2})',
+        r'К\s*доплате:?\s*(\d+(?:\s?\d{3})*[,\.]\d{2})'
+    ],
+    'currency': [
+        r'(\d+(?:\s?\d{3})*[,\.]\d{2})\s*(руб|рублей|USD|EUR|CNY)',
+        r'Валюта:?\s*(RUB|USD|EUR|CNY)'
+    ],
+    'account': [r'Счет:?\s*(\d{20})', r'Р/?с\s*(\d{20})', r'(\d{20})'],
+    'date': [
+        r'(\d{1,2}[\.\/]\d{1,2}[\.\/]\d{2,4})',
+        r'Дата:?\s*(\d{1,2}[\.\/]\d{1,2}[\.\/]\d{2,4})',
+        r'(\d{2}\.\d{2}\.\d{4})'
+    ],
+    'counterparty': [
+        r'(?:ООО|ИП|ЗАО|ОАО|АО)\s+"?([^"\n\r]{3,50})"?',
+        r'Плательщик:?\s*([^\n\r]{10,80})',
+        r'Получатель:?\s*([^\n\r]{10,80})'
+    ],
+}
+
+
+def legacy_payment(text: str):
+    """Прежний `_extract_single_payment`: по re.search на каждый шаблон."""
+    amount = None
+    for pattern in LEGACY_PATTERNS['amount']:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            amount = Decimal(match.group(1).replace(' ', '').replace(',', '.'))
+            break
+    if not amount:
+        return None
+    currency = 'RUB'
+    for pattern in LEGACY_PATTERNS['currency']:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            currency = match.group(match.lastindex).upper()
+            currency = 'RUB' if currency in ['РУБЛЕЙ', 'РУБ'] else currency
+            break
+    date = None
+    for pattern in LEGACY_PATTERNS['date']:
+        match = re.search(pattern, text)
+        if match:
+            for fmt in ['%d.%m.%Y', '%d/%m/%Y', '%d.%m.%y']:
+                try:
+                    date = datetime.strptime(match.group(1), fmt)
+                    break
+                except ValueError:
+                    continue
+            if date:
+                break
+    counterparty = "Не определен"
+    for pattern in LEGACY_PATTERNS['counterparty']:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            counterparty = match.group(1).strip()
+            break
+    accounts = set()
+    for pattern in LEGACY_PATTERNS['account']:
+        accounts.update(re.findall(pattern, text))
+    return amount, currency, date, counterparty, accounts
+
+
+def make_statement(payments: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    blocks = []
+    for i in range(payments):
+        rub = rnd.randrange(1, 10**7)
+        acc_from = "".join(rnd.choices("0123456789", k=20))
+        acc_to = "".join(rnd.choices("0123456789", k=20))
+        cur = rnd.choice(["руб", "USD", "EUR", "CNY"])
+        blocks.append(
+            f"Операция № {i}\nДата: {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2025\n"
+            f"Плательщик: ООО \"Ромашка {i}\"\nСчет: {acc_from}\nПолучатель: АО \"Лютик\" Р/с {acc_to}\n"
+            f"Сумма: {rub // 100:,}.{rub % 100:02d} {cur}\n".replace(",", " ")
+            + "Назначение платежа: оплата по договору поставки, НДС не облагается\n"
+        )
+    return blocks
+
+
+def as_tuple(p: BankPayment):
+    return p.amount, p.currency, p.date, p.counterparty, {p.account_from, p.account_to} - {""}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    blocks = make_statement(args.payments)
+    ocr = BankDocumentOCR()
+    for block in blocks:
+        assert as_tuple(ocr._extract_single_payment(block)) == legacy_payment(block), block
+    timings = {}
+    for label, fn in (("по шаблону", legacy_payment), ("сканер", ocr._extract_single_payment)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for block in blocks:
+                fn(block)
+        timings[label] = (time.perf_counter() - started) / args.repeat
+        print(f"{label:<10}: {timings[label] * 1000:.1f} мс на {len(blocks)} платежей")
+    print(f"ускорение: x{timings['по шаблону'] / timings['сканер']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Поиск контрагента по имени из OCR: индекс триграмм против перебора.
+
+    python -m benchmarks.bench_company_index [--size 50000] [--queries 2000]
+
+Генерирует `--size` компаний, портит часть имён как OCR (латиница вместо
+кириллицы, потерянная или заменённая буква), сверяет ответы индекса с
+полным перебором и печатает время на один поиск.
+"""
+import argparse
+import random
+import time
+
+from app.services.company_index import MIN_SCORE, CompanyIndex, skeleton, trigrams
+
+SYLLABLES = [c + v + e for c in "бвгдзклмнпрстфхш" for v in "аеиоуя" for e in ["", "й", "л", "н", "р", "с", "к"]]
+COMMON = ["Строй", "Инвест", "Трейд", "Логистик", "Групп", "Холдинг", "Сервис", "Пром"]
+FORMS = ["ООО", "АО", "ИП", ""]
+LATIN = str.maketrans("аеорсху", "aeopcxy")
+
+
+def make_names(size: int, rnd: random.Random, words: int = 5000) -> dict[str, float]:
+    """Имена из словаря `words` слов и частых «Строй», «Инвест», как в реальной базе."""
+    pool = list(dict.fromkeys("".join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4))).capitalize() for _ in range(words)))
+    names = {}
+    while len(names) < size:
+        parts = rnd.sample(pool, rnd.choice([1, 1, 2]))
+        if rnd.random() < 0.4:
+            parts.append(rnd.choice(COMMON))
+        names.setdefault(" ".join(parts), float(rnd.randint(1, 100)))
+    return names
+
+
+def corrupt(name: str, rnd: random.Random) -> str:
+    chars = list(name.translate(LATIN) if rnd.random() < 0.5 else name)
+    if rnd.random() < 0.5:
+        i = rnd.randrange(len(chars))
+        chars[i] = rnd.choice("нилш") if rnd.random() < 0.5 else ""
+    return f'{rnd.choice(FORMS)} "{"".join(chars)}"'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--naive-queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rnd = random.Random(17)
+    names = make_names(args.size, rnd)
+    queries = [corrupt(n, rnd) for n in rnd.sample(list(names), args.queries)]
+
+    index = CompanyIndex()
+    started = time.perf_counter()
+    index.update_companies(names)
+    build = time.perf_counter() - started
+
+    answers, timings = [], []
+    for query in queries:
+        started = time.perf_counter()
+        answers.append(index.lookup(query, limit=1))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    # перебор: та же оценка (Дайс по триграммам) по всем компаниям
+    grams = {name: trigrams(skeleton(name)) for name in names}
+    started = time.perf_counter()
+    for query, answer in zip(queries[:args.naive_queries], answers):
+        q = trigrams(skeleton(query))
+        best = max((2 * len(q & g) / (len(q) + len(g)), names[n], n) for n, g in grams.items())
+        assert [c.name for c in answer] == ([best[2]] if best[0] >= MIN_SCORE else [])
+    naive = (time.perf_counter() - started) / args.naive_queries
+
+    found = sum(1 for a in answers if a)
+    print(f"companies: {len(index)}, build: {build:.2f}s, resolved {found}/{args.queries} (min_score={MIN_SCORE})")
+    print(f"index: median {timings[len(timings) // 2] * 1e6:.0f} µs, "
+          f"p95 {timings[len(timings) * 95 // 100] * 1e6:.0f} µs, mean {sum(timings) / len(timings) * 1e6:.0f} µs")
+    print(f"full scan: {naive * 1e6:.0f} µs/lookup")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Сверка токенов: пакетный cdist против попарного цикла Levenshtein.ratio.
+
+    python -m benchmarks.bench_comparer [--rows 200] [--tokens 300] [--repeat 3]
+
+Генерирует пары строк RU/EN-договора с сотнями реквизитов (счета, IBAN,
+даты) на строку, часть токенов справа искажает опечатками, сверяет
+результаты с прежним циклом и печатает время.
+"""
+import argparse
+import random
+import time
+
+from Levenshtein import ratio
+
+from app.services.comparer import compare_tokens
+
+
+def legacy_compare(left: set[str], right: set[str]) -> list[str]:
+    """Прежний `compare_tokens`: ratio для каждой пары."""
+    miss = []
+    for t in left:
+        if not any(ratio(t, r) > .8 for r in right):
+            miss.append(t)
+    return miss
+
+
+def make_token(rnd: random.Random) -> str:
+    kind = rnd.random()
+    if kind < 0.4:
+        return "".join(rnd.choices("0123456789", k=rnd.choice([10, 12, 20])))
+    if kind < 0.7:
+        return rnd.choice(["de", "gb", "ru", "kz"]) + "".join(rnd.choices("0123456789abcdefghijklmnop", k=rnd.randint(13, 28)))
+    return f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2000, 2030)}"
+
+
+def typo(token: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(token))
+    return token[:i] + rnd.choice("0123456789") + token[i + 1:]
+
+
+def make_pairs(rows: int, tokens: int, seed: int = 3):
+    rnd = random.Random(seed)
+    pairs = []
+    for _ in range(rows):
+        left = {make_token(rnd) for _ in range(tokens)}
+        right = set()
+        for t in left:
+            r = rnd.random()
+            if r < 0.6:
+                right.add(t)
+            elif r < 0.9:
+                right.add(typo(t, rnd))
+            else:
+                right.add(make_token(rnd))
+        pairs.append((left, right))
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pairs = make_pairs(args.rows, args.tokens)
+    for left, right in pairs:
+        assert compare_tokens(left, right) == legacy_compare(left, right)
+    timings = {}
+    for label, fn in (("цикл", legacy_compare), ("cdist", compare_tokens)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for left, right in pairs:
+                fn(left, right)
+        timings[label] = (time.perf_counter() - started) / args.repeat
+        print(f"{label:<6}: {timings[label] * 1000:.0f} мс на {len(pairs)} строк × {args.tokens} токенов")
+    print(f"ускорение: x{timings['цикл'] / timings['cdist']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Потоковый DOCX-ридер против python-docx.
+
+    python -m benchmarks.bench_docx_stream [file.docx] [--rows 20000]
+
+Без файла генерирует синтетический договор: абзацы и двухколоночная
+таблица RU/EN на `--rows` строк. Печатает время и пик памяти
+(tracemalloc) на извлечение пар для сверки.
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import docx
+
+from app.services.docx_stream import iter_table_pairs
+
+
+def python_docx_pairs(path: str) -> list[tuple[str, str]]:
+    doc = docx.Document(path)
+    return [
+        (row.cells[0].text, row.cells[1].text)
+        for tbl in doc.tables for row in tbl.rows if len(row.cells) >= 2
+    ]
+
+
+def stream_pairs(path: str) -> list[tuple[str, str]]:
+    return list(iter_table_pairs(path))
+
+
+def make_contract(path: Path, rows: int) -> None:
+    doc = docx.Document()
+    for i in range(rows // 10):
+        doc.add_paragraph(f"{i}. Агент обязуется совершать по поручению Принципала юридические действия.")
+    table = doc.add_table(rows=rows, cols=2)
+    for i, row in enumerate(table.rows):
+        row.cells[0].text = f"Сумма платежа {i} составляет 1 000,00 долларов США"
+        row.cells[1].text = f"Payment amount {i} is USD 1,000.00"
+    doc.save(path)
+
+
+def measure(fn, path: str) -> tuple[int, float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    pairs = fn(path)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return len(pairs), elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file", type=Path, nargs="?")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = Path(tmp) / "contract.docx"
+            make_contract(path, args.rows)
+        print(f"{path.name}: {path.stat().st_size / 2**20:.1f} МБ")
+        results = {}
+        for label, fn in (("python-docx", python_docx_pairs), ("поток", stream_pairs)):
+            count, elapsed, peak = measure(fn, str(path))
+            results[label] = elapsed
+            print(f"{label:<11}: {count} пар за {elapsed:.2f} с, пик памяти {peak:.0f} МБ")
+        print(f"ускорение: x{results['python-docx'] / results['поток']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Сопоставление с заявками: индекс по (сумма, валюта, день) против перебора.
+
+    python -m benchmarks.bench_matcher [--size 10000] [--naive-size 1000]
+
+Генерирует выписку и реестр заявок (часть платежей без заявки, часть с
+опечатками в имени и сдвигом даты), сверяет индексный поиск с полным
+перебором пар на `--naive-size` и печатает время на `--size` × `--size`.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from rapidfuzz import fuzz
+
+from app.services.application_matcher import (
+    MIN_SCORE, WINDOW_DAYS, Application, match_payments, normalize_name,
+)
+from app.services.bank_ocr_service import BankPayment
+from app.services.payment_table import PaymentTable
+
+FORMS = ["ООО", "АО", "ИП", ""]
+
+
+def make_data(size: int, seed: int = 11):
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    payments, applications = [], []
+    for i in range(size):
+        amount = Decimal(rnd.randrange(100, 10**7)) / 100
+        currency = rnd.choice(["RUB", "RUB", "USD", "EUR"])
+        client = f"Клиент {rnd.choice(['Альфа', 'Бета', 'Гамма', 'Дельта'])} {i}"
+        day = start + timedelta(days=rnd.randrange(120))
+        name = f'{rnd.choice(FORMS)} "{client}"'
+        if rnd.random() < 0.1:
+            name = name.replace("а", "о", 1)     # опечатка OCR
+        payments.append(BankPayment(amount, currency, name, "оплата", day, "", ""))
+        if rnd.random() < 0.9:
+            shift = timedelta(days=rnd.randint(-2, 2))
+            applications.append(Application(amount, currency, client, day + shift, f"З-{i}"))
+        else:
+            applications.append(Application(amount + 1, currency, client, day, f"З-{i}"))
+    return payments, applications
+
+
+def naive_candidates(payments, applications):
+    """Полный перебор: все пары, прошедшие те же фильтры, что и индекс."""
+    pairs = set()
+    for p, pay in enumerate(payments):
+        name = normalize_name(pay.counterparty)
+        for a, app in enumerate(applications):
+            if app.amount != pay.amount or app.currency != pay.currency:
+                continue
+            if app.date and abs((app.date - pay.date).days) > WINDOW_DAYS:
+                continue
+            if fuzz.token_set_ratio(name, normalize_name(app.client), processor=None) >= MIN_SCORE:
+                pairs.add((p, a))
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--naive-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    payments, applications = make_data(args.naive_size)
+    table = PaymentTable.from_payments(payments)
+    started = time.perf_counter()
+    expected = naive_candidates(payments, applications)
+    naive = time.perf_counter() - started
+    result = match_payments(table, applications)
+    found = {(payments.index(m.payment), applications.index(m.application)) for m in result.matched}
+    assert found == expected, (len(found), len(expected))
+    print(f"перебор {args.naive_size}×{args.naive_size}: {naive:.2f} с")
+
+    payments, applications = make_data(args.size)
+    started = time.perf_counter()
+    table = PaymentTable.from_payments(payments)
+    result = match_payments(table, applications)
+    indexed = time.perf_counter() - started
+    print(f"индекс {args.size}×{args.size}: {indexed:.2f} с — сопоставлено {len(result.matched)}, "
+          f"спорных {len(result.ambiguous)}, без заявки {len(result.unmatched_payments)}")
+    print(f"перебор {args.size}×{args.size} (оценка): ~{naive * (args.size / args.naive_size) ** 2:.0f} с")
+
+
+if __name__ == "__main__":
+    main()
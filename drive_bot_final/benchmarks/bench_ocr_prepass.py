@@ -0,0 +1,84 @@
+"""Пропускная способность OCR с предпроходом и без.
+
+    python -m benchmarks.bench_ocr_prepass path/to/corpus [--workers 4]
+
+Корпус — каталог с PDF (сканы выписок, договоров и т.п.), обходится
+рекурсивно. Три прогона: без предпрохода, предпроход как по умолчанию
+(отсев пустых и psm) и с OSD (`OCR_PREPASS_OSD`). Печатает страниц/сек,
+долю пустых страниц и время самих вызовов OSD: так видно, стоит ли
+включать OSD на этом корпусе.
+"""
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import settings
+from app.services import page_prepass
+from app.services.page_engine import PageKind, extract_document
+
+MODES = {
+    "none": "без предпрохода   ",
+    "no-osd": "предпроход без OSD",
+    "full": "предпроход с OSD  ",
+}
+
+
+@contextmanager
+def osd_mode(mode: str, spent: list[float]):
+    """Включает OSD для режима `full` и считает время вызовов (они идут из потоков пула)."""
+    real, enabled = page_prepass.detect_orientation_script, settings.OCR_PREPASS_OSD
+    lock = threading.Lock()
+
+    def timed(img):
+        started = time.perf_counter()
+        try:
+            return real(img)
+        finally:
+            with lock:
+                spent.append(time.perf_counter() - started)
+
+    settings.OCR_PREPASS_OSD = mode == "full"
+    page_prepass.detect_orientation_script = timed
+    try:
+        yield
+    finally:
+        page_prepass.detect_orientation_script = real
+        settings.OCR_PREPASS_OSD = enabled
+
+
+def run(files: list[Path], workers: int, mode: str) -> tuple[int, int, float, list[float]]:
+    pages = blank = 0
+    osd: list[float] = []
+    started = time.perf_counter()
+    with osd_mode(mode, osd):
+        for path in files:
+            doc = extract_document(str(path), workers=workers, prepass=mode != "none")
+            pages += doc.page_count
+            blank += doc.kinds().get(PageKind.BLANK, 0)
+    return pages, blank, time.perf_counter() - started, osd
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    files = sorted(args.corpus.rglob("*.pdf"))
+    if not files:
+        raise SystemExit(f"В {args.corpus} нет PDF")
+    print(f"{len(files)} файлов, workers={args.workers}")
+    rates = {}
+    for mode, label in MODES.items():
+        pages, blank, elapsed, osd = run(files, args.workers, mode)
+        rates[mode] = pages / elapsed
+        line = f"{label}: {pages} стр за {elapsed:.1f} с — {rates[mode]:.2f} стр/с, пустых {blank}"
+        if osd:
+            line += f", OSD {len(osd)} вызовов, {sum(osd) / len(osd) * 1000:.0f} мс в среднем"
+        print(line)
+    print(f"предпроход без OSD: x{rates['no-osd'] / rates['none']:.2f}, с OSD: x{rates['full'] / rates['none']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
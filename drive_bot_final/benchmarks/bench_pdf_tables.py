@@ -0,0 +1,82 @@
+"""Пары из таблиц PDF: pdfplumber на каждой странице против быстрого пути.
+
+    python -m benchmarks.bench_pdf_tables [--docs 3] [--pages 40] [--text-share 0.3]
+
+Генерирует корпус двуязычных договоров: страницы с таблицей реквизитов
+вперемешку с текстовыми страницами без таблиц. Сверяет пары с прежним
+`extract_tables()` pdfplumber и печатает время: первый прогон и
+повторный (из кэша по хэшу файла).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+from app.services import extractor
+
+
+def legacy_pairs(path: str) -> list[tuple[str, str]]:
+    """Прежний `_extract_pdf`: pdfplumber `extract_tables()` на каждой странице."""
+    pairs = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            for tbl in (page.extract_tables() or []):
+                for row in tbl:
+                    if len(row) >= 2:
+                        pairs.append((row[0] or "", row[1] or ""))
+    return pairs
+
+
+def make_contract(path: str, pages: int, text_share: float, rnd: random.Random):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        if rnd.random() < text_share:
+            for line in range(40):
+                page.insert_text((50, 50 + line * 18), f"Clause {line}: the parties agree to the terms set out below.", fontsize=9)
+            continue
+        y = 50
+        for r in range(22):
+            acc = "".join(rnd.choices("0123456789", k=20))
+            for x, label in ((50, "Schet"), (300, "Account")):
+                page.draw_rect(fitz.Rect(x, y, x + 250, y + 32), color=(0, 0, 0), width=0.7)
+                page.insert_text((x + 5, y + 13), f"{label} {acc}", fontsize=8)
+                page.insert_text((x + 5, y + 26), f"{rnd.randint(1, 28):02d}.02.2025 {rnd.randint(1, 10**6)},00 EUR", fontsize=8)
+            y += 32
+    doc.save(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--text-share", type=float, default=0.3)
+    args = parser.parse_args()
+    rnd = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f"contract_{i}.pdf")
+            make_contract(path, args.pages, args.text_share, rnd)
+            paths.append(path)
+        extractor.get_process_pool().submit(int).result()     # прогрев воркеров не в счёт
+        timings = {}
+        for label, fn in (("pdfplumber", legacy_pairs), ("быстрый", extractor.extract_pairs),
+                          ("из кэша", extractor.extract_pairs)):
+            started = time.perf_counter()
+            results = [fn(p) for p in paths]
+            timings[label] = time.perf_counter() - started
+            if label != "pdfplumber":
+                assert results == expected
+            else:
+                expected = results
+            print(f"{label:<10}: {timings[label]:.2f} с на {args.docs} × {args.pages} стр.")
+        print(f"ускорение: x{timings['pdfplumber'] / timings['быстрый']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Токены ячеек: кэшированный `extract_tokens` против прежнего прохода без кэша.
+
+    python -m benchmarks.bench_tokeniser [--cells 300] [--rows 20000]
+
+Таблица договора повторяет одни и те же счета, IBAN и даты: строки
+берутся из `--cells` различных ячеек. Результаты сверяются с прежней
+реализацией, печатается время обоих вариантов.
+"""
+import argparse
+import random
+import re
+import time
+import unicodedata
+
+from app.services.tokeniser import extract_tokens, normal
+
+LEGACY_PATTERNS = (
+    re.compile(r"\b\d{10,}\b"),
+    re.compile(r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,}\b"),
+    re.compile(r"\d{2}\.\d{2}\.\d{4}"),
+    re.compile(r"\d[\d\s.,]+\s?(EUR|USD|RUB|₽|€|\$)"),
+)
+
+
+def legacy_normal(txt: str) -> str:
+    txt = unicodedata.normalize("NFKD", txt.lower())
+    return re.sub(r"\s+", "", txt)
+
+
+def legacy_tokens(s: str) -> set[str]:
+    res = set()
+    for r in LEGACY_PATTERNS:
+        res |= set(r.findall(s))
+    return {legacy_normal(t) for t in res}
+
+
+def make_cell(rnd: random.Random) -> str:
+    pieces = [
+        lambda: f"Счёт № {rnd.randint(10**19, 10**20 - 1)}",
+        lambda: "IBAN GB29NWBK60161331926819",
+        lambda: f"от {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2000, 2030)}",
+        lambda: f"{rnd.randint(1, 999)} {rnd.randint(0, 999):03d},{rnd.randint(0, 99):02d} {rnd.choice(['EUR', 'USD', 'RUB'])}",
+        lambda: rnd.choice(["Покупатель обязуется оплатить", "Agreement", "ИНН"]),
+    ]
+    return " ".join(rnd.choice(pieces)() for _ in range(rnd.randint(1, 5)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+    rnd = random.Random(3)
+    cells = [make_cell(rnd) for _ in range(args.cells)]
+    rows = [rnd.choice(cells) for _ in range(args.rows)]
+    extract_tokens.cache_clear()
+    normal.cache_clear()
+    timings, results = {}, {}
+    for label, fn in (("без кэша", legacy_tokens), ("с кэшем", extract_tokens)):
+        started = time.perf_counter()
+        results[label] = [fn(c) for c in rows]
+        timings[label] = time.perf_counter() - started
+        print(f"{label:<8}: {timings[label] * 1000:.0f} мс на {len(rows)} строк из {len(cells)} ячеек")
+    assert results["без кэша"] == results["с кэшем"]
+    print(f"ускорение: x{timings['без кэша'] / timings['с кэшем']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
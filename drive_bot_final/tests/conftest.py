@@ -0,0 +1,132 @@
+import pytest
+import redis.asyncio as aioredis
+
+from app.services import payment_ledger
+
+
+def _encode(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """Хэши и множества Redis в памяти — ровно то, что используют сервисы.
+
+    Значения хранятся байтами, как в Redis; клиент с `decode_responses=True`
+    получает строки. Клиенты из одного `fake_redis` делят данные. Lua-скрипты
+    сервисов повторены на Python в `SCRIPTS`.
+    """
+    def __init__(self, decode_responses=False, hashes=None, sets=None):
+        self.decode_responses = decode_responses
+        self.hashes = {} if hashes is None else hashes
+        self.sets = {} if sets is None else sets
+
+    def client(self, decode_responses=False) -> "FakeRedis":
+        return FakeRedis(decode_responses, self.hashes, self.sets)
+
+    def _out(self, value):
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode()
+
+    def _field(self, field: str):
+        return field if self.decode_responses else field.encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script: str):
+        handler = SCRIPTS[script]
+
+        async def run(keys=(), args=()):
+            return await handler(self, list(keys), list(args))
+        return run
+
+    async def hgetall(self, key):
+        return {self._field(k): self._out(v) for k, v in self.hashes.get(key, {}).items()}
+
+    async def hget(self, key, field):
+        return self._out(self.hashes.get(key, {}).get(field))
+
+    async def hmget(self, key, fields):
+        h = self.hashes.get(key, {})
+        return [self._out(h.get(f)) for f in fields]
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        h = self.hashes.setdefault(key, {})
+        items = mapping.items() if mapping else [(field, value)]
+        added = sum(k not in h for k, _ in items)
+        h.update({k: _encode(v) for k, v in items})
+        return added
+
+    async def hsetnx(self, key, field, value):
+        h = self.hashes.setdefault(key, {})
+        if field in h:
+            return 0
+        h[field] = _encode(value)
+        return 1
+
+    async def hincrby(self, key, field, amount=1):
+        h = self.hashes.setdefault(key, {})
+        h[field] = _encode(int(h.get(field, b"0")) + amount)
+        return int(h[field])
+
+    async def hdel(self, key, *fields):
+        h = self.hashes.get(key, {})
+        return sum(h.pop(f, None) is not None for f in fields)
+
+    async def hexists(self, key, field):
+        return field in self.hashes.get(key, {})
+
+    async def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    async def sadd(self, key, *members):
+        s = self.sets.setdefault(key, set())
+        added = sum(m not in s for m in members)
+        s.update(members)
+        return added
+
+    async def delete(self, *keys):
+        return sum((self.hashes.pop(k, None), self.sets.pop(k, None)) != (None, None) for k in keys)
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def aclose(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis, self.ops = redis, []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.ops.append(lambda: method(*args, **kwargs))
+
+    async def execute(self):
+        return [await op() for op in self.ops]
+
+
+async def _register_payments(redis, keys, args):
+    seen_key, totals_key = keys
+    added = []
+    for i in range(1, len(args), 3):
+        fingerprint, currency, amount = args[i:i + 3]
+        new = await redis.sadd(seen_key, fingerprint)
+        if new:
+            await redis.hincrby(totals_key, currency, int(amount))
+            await redis.hincrby(totals_key, f"{currency}:count", 1)
+        added.append(new)
+    return added
+
+
+SCRIPTS = {payment_ledger.REGISTER_SCRIPT: _register_payments}
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """`redis.asyncio.from_url` отдаёт клиентов общего FakeRedis."""
+    redis = FakeRedis()
+    monkeypatch.setattr(aioredis, "from_url", lambda url, decode_responses=False, **kwargs: redis.client(decode_responses))
+    return redis
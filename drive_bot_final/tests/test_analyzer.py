@@ -1,7 +1,67 @@
+import random
+import re
+
+from app.services.analyzer import R_PATTERNS, compare_ru_en, extract_parameters, iter_parameters
 
-from app.services.analyzer import extract_parameters
 
 def test_extract():
     text = "Оплата 1000 EUR, IBAN DE89370400440532013000"
     p = extract_parameters(text)
     assert p["iban"][0] == "DE89370400440532013000"
+
+
+def legacy_extract(text):
+    res = {}
+    for key, pattern in R_PATTERNS.items():
+        found = [m.strip() for m in re.findall(pattern, text, flags=re.IGNORECASE)]
+        if found:
+            res[key] = found
+    return res
+
+
+def random_text(rnd, words=400):
+    pieces = [
+        lambda: "DE89370400440532013000", lambda: "SABRRUMM", lambda: "DEUTDEFF500",
+        lambda: "".join(rnd.choices("0123456789", k=rnd.randint(8, 22))),
+        lambda: f"№ {rnd.randint(1, 999)}", lambda: f"№{rnd.randint(1, 99)}",
+        lambda: f"{rnd.randint(1, 31)}.{rnd.randint(1, 12):02d}.{rnd.randint(1990, 2030)}",
+        lambda: f"{rnd.randint(1, 999)} {rnd.randint(0, 999):03d},{rnd.randint(0, 99):02d} {rnd.choice(['EUR', 'USD', 'RUB', '₽', '€', '$'])}",
+        lambda: rnd.choice(["оплата", "payment", "договор", "agreement", "от", "dated", "\n", " "]),
+    ]
+    return " ".join(rnd.choice(pieces)() for _ in range(words))
+
+
+def test_single_pass_matches_findall():
+    rnd = random.Random(4)
+    for _ in range(30):
+        text = random_text(rnd)
+        assert extract_parameters(text) == legacy_extract(text)
+
+
+def test_chunked_matches_whole_text():
+    rnd = random.Random(9)
+    text = random_text(rnd, 3000)
+    expected = list(iter_parameters([text]))
+    for size in (1, 7, 300, 5000):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(iter_parameters(chunks)) == expected
+    assert extract_parameters(iter([text[:10], text[10:]])) == legacy_extract(text)
+
+
+def test_limit_stops_early():
+    consumed = []
+    def chunks():
+        for part in ["IBAN DE89370400440532013000 ", "от 01.02.2024 " + "x" * 500, "№ 5 " + "y" * 500, "02.03.2025 " * 1000]:
+            consumed.append(part)
+            yield part
+    params = extract_parameters(chunks(), keys=("iban", "date"), limit=1)
+    assert params == {"iban": ["DE89370400440532013000"], "date": ["01.02.2024"]}
+    assert len(consumed) < 4
+
+
+def test_compare_ru_en():
+    ru = "Счёт DE89370400440532013000 от 01.02.2024, договор № 7"
+    en = "Account DE89370400440532013000 dated 01.02.2024, agreement № 8"
+    issues = compare_ru_en(ru, en)
+    assert "Несовпадение number: RU='№ 7' EN='№ 8'" in issues
+    assert not any("iban" in i or "date" in i for i in issues)
@@ -0,0 +1,133 @@
+from datetime import datetime
+from decimal import Decimal
+
+import openpyxl
+import pytest
+
+from app.handlers import menu
+from app.services.application_matcher import (
+    Application, format_match_report, load_applications, match_payments, normalize_name,
+)
+from app.services.bank_ocr_service import BankPayment
+from app.services.payment_table import PaymentTable
+
+
+def pay(amount, name, day, currency="RUB"):
+    return BankPayment(Decimal(amount), currency, name, "", datetime(2025, 4, day), "", "")
+
+
+def app(amount, client, day=None, number="", currency="RUB"):
+    return Application(Decimal(amount), currency, client, datetime(2025, 4, day) if day else None, number)
+
+
+def test_normalize_name():
+    assert normalize_name('ООО "Ромашка"') == "ромашка"
+    assert normalize_name("Ромашка, ао") == "ромашка"
+
+
+def test_match_sets():
+    table = PaymentTable.from_payments([
+        pay("100.00", 'ООО "Ромашка"', 10),       # точное совпадение со сдвигом даты
+        pay("250.00", "ИП Лютиков", 10),            # две одинаковые заявки → спорный
+        pay("999.00", "АО Незнакомец", 10),         # заявки нет
+        pay("300.00", "Васильков", 20),             # сумма есть, но дата вне окна
+        pay("50.00", "Acme", 5, "USD"),             # заявка без даты
+    ])
+    applications = [
+        app("100.00", "Ромашка", 12, "1"),
+        app("250.00", "Лютиков", 10, "2"),
+        app("250.00", "Лютиков И.П.", 10, "3"),
+        app("300.00", "Васильков", 1, "4"),
+        app("50.00", "ACME LLC", None, "5", "USD"),
+        app("100.00", "Ромашка", 10, "6", "USD"),
+    ]
+    result = match_payments(table, applications)
+    assert [(m.payment.counterparty, m.application.number, m.days) for m in result.matched] == [
+        ('ООО "Ромашка"', "1", 2), ("Acme", "5", 0),
+    ]
+    assert [[a.number for a, _ in amb.candidates] for amb in result.ambiguous] == [["2", "3"]]
+    assert {p.counterparty for p in result.unmatched_payments} == {"АО Незнакомец", "Васильков"}
+    assert [a.number for a in result.unmatched_applications] == ["2", "3", "4", "6"]
+
+
+def test_one_application_per_payment():
+    table = PaymentTable.from_payments([pay("10.00", "Бета", 1), pay("10.00", "Бета", 3)])
+    result = match_payments(table, [app("10.00", "Бета", 1)])
+    assert len(result.matched) == 1 and result.matched[0].payment.date.day == 1
+    assert len(result.unmatched_payments) == 1
+
+
+def test_payment_without_date():
+    undated = BankPayment(Decimal("70.00"), "RUB", "Гамма", "", datetime.now(), "", "", date_parsed=False)
+    table = PaymentTable.from_payments([undated, pay("80.00", "Дельта", 1)])
+    result = match_payments(table, [app("70.00", "Гамма", 1, "7"), app("80.00", "Дельта", 28, "8")])
+    # без даты окно не действует; подставленное «сейчас» не мешает сопоставлению
+    assert [(m.application.number, m.days) for m in result.matched] == [("7", 0)]
+    assert "Дельта (01.04.2025)" in format_match_report(result)
+    result = match_payments(table, [])
+    assert "Гамма (без даты)" in format_match_report(result)
+
+
+def test_load_applications(tmp_path):
+    path = tmp_path / "reg.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["№ заявки", "Клиент", "Сумма", "Валюта", "Дата"])
+    ws.append(["А-1", "ООО Ромашка", 1500.5, "rub", datetime(2025, 4, 1)])
+    ws.append(["А-2", "итого", None, None, None])
+    wb.save(path)
+    (first,) = load_applications(str(path))
+    assert (first.number, first.amount, first.currency, first.date) == ("А-1", Decimal("1500.50"), "RUB", datetime(2025, 4, 1))
+    csv_path = tmp_path / "reg.csv"
+    csv_path.write_bytes("Номер;Контрагент;Сумма;Дата\n7;ИП Лютиков;1 000,00;02.04.2025\n".encode("cp1251"))
+    (row,) = load_applications(str(csv_path))
+    assert (row.number, row.client, row.amount) == ("7", "ИП Лютиков", Decimal("1000.00"))
+    (tmp_path / "bad.csv").write_text("Клиент;Дата\n")
+    with pytest.raises(ValueError):
+        load_applications(str(tmp_path / "bad.csv"))
+
+
+class DummyState:
+    def __init__(self):
+        self.state = None
+    async def set_state(self, state):
+        self.state = state
+    async def clear(self):
+        self.state = None
+
+
+class DummyBot:
+    def __init__(self, data):
+        self.data = data
+    async def get_file(self, file_id):
+        return type("File", (), {"file_path": file_id})()
+    async def download_file(self, file_path, dest):
+        with open(dest, "wb") as f:
+            f.write(self.data)
+
+
+class DummyMsg:
+    def __init__(self, document=None, data=b""):
+        self.document = document
+        self.bot = DummyBot(data)
+        self.from_user = type("User", (), {"id": 7})()
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+@pytest.mark.asyncio
+async def test_registry_flow(monkeypatch):
+    monkeypatch.setattr(menu, "_bank_tables", {7: PaymentTable.from_payments([pay("100.00", "ООО Ромашка", 10)])})
+    state = DummyState()
+    callback = type("Cb", (), {"from_user": type("User", (), {"id": 7})(), "message": DummyMsg()})()
+    async def answer(*args, **kwargs):
+        pass
+    callback.answer = answer
+    await menu.match_applications(callback, state)
+    assert state.state == menu.ApplicationStates.waiting_registry
+    doc = type("Doc", (), {"file_id": "fid", "file_name": "заявки.csv"})()
+    msg = DummyMsg(doc, "Номер;Клиент;Сумма;Дата\n1;Ромашка;100,00;11.04.2025\n".encode())
+    await menu.process_application_registry(msg, state)
+    assert state.state is None
+    assert "Сопоставлено: 1" in msg.answers[0]
@@ -0,0 +1,94 @@
+import random
+import re
+from datetime import datetime
+from decimal import Decimal
+
+from app.services.bank_ocr_service import BankDocumentOCR, PaymentBlockSplitter, iter_payment_blocks
+
+ACC1 = "40702810900000000001"
+ACC2 = "40817810500000000002"
+
+
+def parse(text):
+    return BankDocumentOCR()._extract_single_payment(text)
+
+
+def test_fields_from_single_scan():
+    p = parse(
+        f"Дата: 05.03.2025\nПлательщик: ООО \"Ромашка\"\nСчет: {ACC1}\n"
+        f"Получатель: ИП Иванов Р/с {ACC2}\nСумма: 1 250 000,50 USD\n"
+    )
+    assert p.amount == Decimal("1250000.50") and p.currency == "USD"
+    assert p.date == datetime(2025, 3, 5)
+    assert p.counterparty == "Ромашка"
+    assert (p.account_from, p.account_to) == (ACC1, ACC2)
+
+
+def test_amount_priority_and_currency_label():
+    # число с валютой важнее подписи «Сумма», даже если стоит позже
+    p = parse("Сумма: 10,00\nК доплате: 20,00\nитого 30,00 руб\nВалюта: EUR")
+    assert p.amount == Decimal("30.00") and p.currency == "RUB"
+    p = parse("к доплате 20,00\nвалюта: eur")
+    assert p.amount == Decimal("20.00") and p.currency == "EUR"
+    assert parse("Без суммы 01.02.2025") is None
+
+
+def test_amount_glued_to_account():
+    p = parse(f"{ACC1}.00 руб, счет получателя {ACC2}")
+    assert p.amount == Decimal(ACC1 + ".00")
+    assert (p.account_from, p.account_to) == (ACC1, ACC2)
+
+
+def test_accounts_are_exact_and_ordered():
+    p = parse(f"Сумма 5,00 руб {ACC2} {ACC1} {ACC2} 1234567890123456789012345")
+    assert (p.account_from, p.account_to) == (ACC2, ACC1)
+
+
+def test_date_fallbacks():
+    # первая дата не разбирается форматами → берём дату после подписи
+    p = parse("1/2/25 Дата: 07.08.2024 сумма 1,00 руб")
+    assert p.date == datetime(2024, 8, 7)
+
+
+def test_counterparty_fallback_to_payer():
+    p = parse("Плательщик: Иванов Иван Иванович\nСумма 1,00 руб")
+    assert p.counterparty == "Иванов Иван Иванович"
+
+
+def _legacy_split(text):
+    blocks = [text]
+    for separator in [r'^\s*\d+\.\s*', r'Операция\s*№', r'Документ\s*№', r'={20,}', r'-{20,}']:
+        new_blocks = []
+        for block in blocks:
+            parts = re.split(separator, block, flags=re.MULTILINE)
+            new_blocks.extend([part.strip() for part in parts if part.strip()])
+        blocks = new_blocks
+    return [block for block in blocks if len(block) > 50]
+
+
+def _statement(seed):
+    rnd = random.Random(seed)
+    pieces = [
+        "Операция №", "Документ № ", "=" * 25, "-" * 30, "\n 12. ", "\n3.", " 4. ", "\n\n",
+        "Плательщик: ООО \"Ромашка\" оплата по договору поставки № 15 от 01.02.2025 ",
+        "Сумма: 1 000,00 руб ", "назначение платежа без НДС ", "--", "==",
+    ]
+    return "".join(rnd.choice(pieces) for _ in range(200))
+
+
+def test_block_splitter_matches_sequential_splits():
+    for seed in range(30):
+        text = _statement(seed)
+        assert list(iter_payment_blocks(text)) == _legacy_split(text)
+
+
+def test_block_splitter_incremental_feed():
+    text = _statement(1)
+    expected = list(iter_payment_blocks(text))
+    for size in (7, 100, 1000):
+        splitter = PaymentBlockSplitter()
+        blocks = []
+        for i in range(0, len(text), size):
+            blocks.extend(splitter.feed(text[i:i + size]))
+        blocks.extend(splitter.close())
+        assert blocks == expected
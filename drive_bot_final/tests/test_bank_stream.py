@@ -0,0 +1,130 @@
+import asyncio
+from contextlib import aclosing
+from decimal import Decimal
+
+import fitz
+import pytest
+
+from app.handlers import menu
+from app.services.bank_ocr_service import BankDocumentOCR, BankPayment, PagePayments
+
+
+def _statement_pdf(path, pages=3):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        text = "".join(
+            f"Operation No {n}{i}\nPayer: LLC Alpha and partners group\nAmount 1 000,00 USD dated 01.02.2025\n"
+            + "-" * 25 + "\n"
+            for i in range(2)
+        )
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontname="helv")
+    doc.save(path)
+
+
+@pytest.mark.asyncio
+async def test_payments_arrive_page_by_page(tmp_path):
+    path = tmp_path / "statement.pdf"
+    _statement_pdf(str(path))
+    ocr = BankDocumentOCR()
+    batches = [b async for b in ocr.iter_page_payments(str(path))]
+    assert [b.page.number if b.page else None for b in batches] == [1, 2, 3, None]
+    assert all(b.payments for b in batches[:3])
+    streamed = [p for b in batches for p in b.payments]
+    assert len(streamed) == len(ocr._process_document_sync(str(path))) == 6
+
+
+@pytest.mark.asyncio
+async def test_early_exit_stops_producer(tmp_path, monkeypatch):
+    seen = {}
+    def pages(self, file_path, stop=None):
+        for n in range(1, 100):
+            yield PagePayments(None, 99, [])
+            if stop.is_set():
+                seen["stopped_at"] = n
+                return
+    monkeypatch.setattr(BankDocumentOCR, "_iter_page_payments", pages)
+    async with aclosing(BankDocumentOCR().iter_page_payments("x.pdf")) as batches:
+        async for _ in batches:
+            break
+    assert seen["stopped_at"] < 99
+
+
+def _payment(amount, currency):
+    return BankPayment(Decimal(amount), currency, "Альфа", "", __import__("datetime").datetime(2025, 2, 1), "", "")
+
+
+class DummyBot:
+    async def get_file(self, file_id):
+        return type("File", (), {"file_path": file_id})()
+    async def download_file(self, file_path, dest):
+        open(dest, "wb").close()
+
+
+class DummyMsg:
+    def __init__(self, document=None):
+        self.document = document
+        self.bot = DummyBot()
+        self.message_id = 501
+        self.chat = type("Chat", (), {"id": -100200})()
+        self.from_user = type("User", (), {"id": 7})()
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+    async def edit_text(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+
+
+class DummyCallback:
+    def __init__(self, data, chat_id=-100200):
+        self.data = data
+        self.message = type("Msg", (), {"chat": type("Chat", (), {"id": chat_id})()})()
+        self.answered = []
+    async def answer(self, text=None, **kwargs):
+        self.answered.append(text)
+
+
+@pytest.fixture
+def statement_msg(monkeypatch):
+    monkeypatch.setattr(menu, "BANK_STATUS_INTERVAL", 0)
+    doc = type("Doc", (), {"mime_type": "application/pdf", "file_size": 1024,
+                           "file_id": "fid", "file_name": "выписка.pdf"})()
+    return DummyMsg(doc)
+
+
+@pytest.mark.asyncio
+async def test_handler_shows_running_totals(statement_msg, monkeypatch):
+    async def batches(self, file_path):
+        page = type("Page", (), {"number": 1})()
+        yield PagePayments(page, 2, [_payment("10.00", "USD"), _payment("5.50", "RUB")])
+        page = type("Page", (), {"number": 2})()
+        yield PagePayments(page, 2, [_payment("2.00", "USD")])
+    monkeypatch.setattr(BankDocumentOCR, "iter_page_payments", batches)
+    await menu.analyze_bank_document(statement_msg)
+    assert any("Страница 2 из 2" in a and "USD: 12.00" in a for a in statement_msg.answers)
+    assert any("Найдено платежей: 3" in a for a in statement_msg.answers)
+    assert not menu._bank_cancel_events
+
+
+@pytest.mark.asyncio
+async def test_handler_cancel(statement_msg, monkeypatch):
+    async def batches(self, file_path):
+        for n in range(1, 6):
+            page = type("Page", (), {"number": n})()
+            yield PagePayments(page, 5, [_payment("1.00", "RUB")])
+            if n == 1:
+                # та же кнопка из другого чата чужой разбор не останавливает
+                callback = DummyCallback(f"cancel_bank_-100200_{statement_msg.message_id}", chat_id=42)
+                await menu.cancel_bank_analysis(callback)
+                assert callback.answered == ["Анализ уже завершён"]
+            if n == 2:
+                callback = DummyCallback(f"cancel_bank_-100200_{statement_msg.message_id}")
+                await menu.cancel_bank_analysis(callback)
+                await asyncio.sleep(0)
+    monkeypatch.setattr(BankDocumentOCR, "iter_page_payments", batches)
+    await menu.analyze_bank_document(statement_msg)
+    final = [a for a in statement_msg.answers if "Найдено платежей" in a][-1]
+    assert "Остановлено на странице 3 из 5" in final
+    assert "Найдено платежей: 3" in final
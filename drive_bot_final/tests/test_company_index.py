@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from app.handlers import upload
+from app.services.company_index import CompanyIndex, skeleton, trigrams
+from app.services.doc_classifier import DocClassifier
+
+
+def test_skeleton_folds_homoglyphs_and_legal_form():
+    # латинские e, p, C вперемешку с кириллицей
+    assert skeleton('ООО "ДeмиpeкC"') == "демирекс"
+    assert skeleton("OOO «Демирекс»") == "демирекс"
+    assert skeleton("Сбер-Лизинг АО") == "сбер лизинг"
+
+
+def test_lookup_resolves_ocr_names():
+    index = CompanyIndex()
+    index.update_companies({"Демирекс": 3, "Ромашка": 10, "Ромашка-Трейд": 1, "Альфа Логистик": 2})
+    assert index.resolve('ООО "ДeмиpeкC"') == "Демирекс"
+    assert index.resolve("Ромашкa") == "Ромашка"
+    assert index.resolve("Альфа Логистнк") == "Альфа Логистик"    # «и» прочитана как «н»
+    assert index.resolve("Бета Строй") is None
+    names = [c.name for c in index.lookup("Ромашка Трейд", limit=2, min_score=0.3)]
+    assert names == ["Ромашка-Трейд", "Ромашка"]
+
+
+def test_lookup_matches_full_scan():
+    rnd = random.Random(5)
+    words = ["".join(rnd.choices("абвгдежзиклмнопрстуфхя", k=rnd.randint(3, 8))) for _ in range(300)]
+    names = {" ".join(rnd.sample(words, rnd.randint(1, 3))): rnd.randint(1, 5) for _ in range(3000)}
+    index = CompanyIndex()
+    index.update_companies(names)
+    grams = {name: trigrams(skeleton(name)) for name in names}
+    for _ in range(300):
+        query = " ".join(rnd.sample(words, rnd.randint(1, 3)))
+        if rnd.random() < 0.5:
+            query = query.replace(rnd.choice(query), rnd.choice("аои"), 1)
+        q = trigrams(skeleton(query))
+        full = sorted(
+            ((2 * len(q & g) / (len(q) + len(g)), names[n], n) for n, g in grams.items()), reverse=True,
+        )
+        expected = [(n, s) for s, _, n in full if s >= 0.5][:3]
+        assert index.lookup(query, limit=3, min_score=0.5) == expected
+
+
+def test_update_is_incremental():
+    index = CompanyIndex()
+    assert index.update_companies(["Ромашка", "Василек"])
+    assert not index.update_companies(["Ромашка", "Василек"])
+    assert index.update_companies(["Ромашка", "Лютик"])
+    assert index.resolve("Василек") is None
+    assert index.resolve("Лютик") == "Лютик"
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_try_guess_filename_resolves_ocr_names(monkeypatch):
+    index = CompanyIndex()
+    index.update_companies({"Демирекс": 1, "Ромашка": 1})
+
+    async def fake_ocr(path):
+        return 'Договор № 7 от 01.03.2024 между ООО "ДeмиpeкC" и ООО «Poмaшкa»'
+
+    async def fake_classifier(redis_url):
+        return DocClassifier()
+
+    async def fake_index(redis_url):
+        return index
+
+    monkeypatch.setattr(upload, "run_ocr", fake_ocr)
+    monkeypatch.setattr(upload, "get_fresh_classifier", fake_classifier)
+    monkeypatch.setattr(upload, "get_fresh_company_index", fake_index)
+    info = await upload.try_guess_filename("scan.pdf", "scan.pdf")
+    assert (info.principal, info.agent, info.doctype) == ("Демирекс", "Ромашка", "договор")
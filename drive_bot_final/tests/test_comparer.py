@@ -0,0 +1,30 @@
+import random
+
+from Levenshtein import ratio
+
+from app.services.comparer import compare_tokens
+
+
+def legacy(left, right):
+    return [t for t in left if not any(ratio(t, r) > .8 for r in right)]
+
+
+def test_matches_legacy_loop():
+    rnd = random.Random(5)
+    alphabet = "0123456789abc.-₽€"
+    for _ in range(300):
+        left = {"".join(rnd.choices(alphabet, k=rnd.randint(1, 12))) for _ in range(rnd.randint(0, 15))}
+        right = {"".join(rnd.choices(alphabet, k=rnd.randint(1, 12))) for _ in range(rnd.randint(0, 15))}
+        # правые токены с одной-двумя правками — чтобы попадать в окрестность порога 0.8
+        for t in list(left)[:5]:
+            i = rnd.randrange(len(t))
+            right.add(t[:i] + rnd.choice(alphabet) + t[i + 1:] + rnd.choice(["", "1"]))
+        assert compare_tokens(left, right) == legacy(left, right)
+
+
+def test_threshold_is_strict():
+    # ratio ровно 0.8 — не совпадение, чуть выше — совпадение
+    assert compare_tokens({"abcde"}, {"abcdx"}) == ["abcde"]
+    assert compare_tokens({"1234567890"}, {"1234567899"}) == []
+    assert compare_tokens({"01.02.2024"}, set()) == ["01.02.2024"]
+    assert compare_tokens(set(), {"x"}) == []
@@ -0,0 +1,65 @@
+import pytest
+
+from app.handlers import upload
+from app.services.doc_classifier import DocClassifier
+
+
+def make_classifier(*companies):
+    classifier = DocClassifier()
+    classifier.update_companies(companies)
+    return classifier
+
+
+def test_doctype_respects_word_boundaries():
+    classifier = make_classifier()
+    assert classifier.classify("Контракт поставки").doctype is None
+    assert classifier.classify("Подписан акт сверки").doctype == "акт"
+
+
+def test_longest_doctype_wins():
+    classifier = make_classifier()
+    assert classifier.classify("Агентский_Договор №5").doctype == "агентский_договор"
+    assert classifier.classify("поручение к договору; договор").doctype == "поручение"
+
+
+def test_companies_in_text_order():
+    classifier = make_classifier("Ромашка", "Василёк", "Лютик")
+    found = classifier.classify("Между ООО ВАСИЛЕК и ООО Ромашка, ООО Ромашка")
+    assert found.companies == ["Василёк", "Ромашка"]
+
+
+def test_update_companies_is_incremental():
+    classifier = make_classifier("Ромашка", "Василек")
+    assert not classifier.update_companies(["Василек", "Ромашка"])
+    assert classifier.update_companies(["Ромашка", "Лютик", "ab"])
+    found = classifier.classify("Ромашка, Лютик, Василек, ab")
+    assert found.companies == ["Ромашка", "Лютик"]
+
+
+def test_bank_markers():
+    classifier = make_classifier()
+    assert classifier.classify("kl_to_1c.txt").bank
+    assert classifier.classify("Выписка по счёту.pdf").bank
+    for name in ("statements_2024.csv", "bankstatement.csv", "Выписка2024.xlsx"):
+        assert classifier.classify(name).bank, name
+    assert not classifier.classify("договор.pdf").bank
+
+
+@pytest.mark.asyncio
+async def test_try_guess_filename_from_text(monkeypatch):
+    classifier = make_classifier("Ромашка", "Василек")
+
+    async def fake_ocr(path):
+        return "Агентский договор № 123 от 05.02.2024 между Ромашка и Василек"
+
+    async def fake_fresh(redis_url):
+        return classifier
+
+    monkeypatch.setattr(upload, "run_ocr", fake_ocr)
+    monkeypatch.setattr(upload, "get_fresh_classifier", fake_fresh)
+    info = await upload.try_guess_filename("scan.pdf", "scan.pdf")
+    assert info.principal == "Ромашка"
+    assert info.agent == "Василек"
+    assert info.doctype == "агентский_договор"
+    assert info.number == "123"
+    assert info.gdrive_folder == "Ромашка/агентский_договор/2024"
@@ -0,0 +1,58 @@
+import io
+
+import docx
+import pytest
+
+from app.services.docx_stream import iter_blocks, iter_lines, iter_table_pairs
+from app.services.extractor import extract_pairs
+
+
+@pytest.fixture
+def contract(tmp_path):
+    doc = docx.Document()
+    doc.add_paragraph("Агентский договор № 7")
+    run = doc.add_paragraph("Сумма:").add_run()
+    run.add_tab()
+    run.add_text("1 000 USD")
+    table = doc.add_table(rows=4, cols=3)
+    table.cell(0, 0).text = "Принципал"
+    table.cell(0, 1).text = "Principal"
+    table.cell(1, 0).text = "Агент"
+    table.cell(1, 1).text = "Agent"
+    table.cell(1, 1).add_paragraph("второй абзац")
+    table.cell(2, 0).merge(table.cell(3, 0)).text = "Объединено"
+    table.cell(2, 1).merge(table.cell(2, 2)).text = "Merged"
+    nested = table.cell(3, 2).add_table(rows=1, cols=2)
+    nested.cell(0, 0).text = "вложенная"
+    doc.add_paragraph("Подписи сторон")
+    path = tmp_path / "contract.docx"
+    doc.save(path)
+    return path
+
+
+def test_blocks_in_document_order(contract):
+    blocks = list(iter_blocks(str(contract)))
+    assert blocks[0] == "Агентский договор № 7"
+    assert blocks[1] == "Сумма:\t1 000 USD"
+    assert isinstance(blocks[2], list) and blocks[2][:2] == ["Принципал", "Principal"]
+    assert blocks[-1] == "Подписи сторон"
+
+
+def test_rows_match_python_docx(contract):
+    reference = [[c.text for c in row.cells] for row in docx.Document(str(contract)).tables[0].rows]
+    rows = [b for b in iter_blocks(contract.read_bytes()) if isinstance(b, list)]
+    assert rows == reference
+
+
+def test_pairs_and_lines(contract):
+    pairs = extract_pairs(str(contract))
+    assert pairs[1] == ("Агент", "Agent\nвторой абзац")
+    assert pairs == list(iter_table_pairs(str(contract)))
+    lines = list(iter_lines(str(contract)))
+    assert "Принципал\tPrincipal" in lines
+    assert not any("вложенная" in line for line in lines)
+
+
+def test_not_a_docx():
+    with pytest.raises(Exception):
+        list(iter_blocks(io.BytesIO(b"nope").getvalue()))
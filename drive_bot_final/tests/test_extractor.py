@@ -0,0 +1,78 @@
+import fitz
+import pdfplumber
+import pytest
+
+from app.services import extractor
+
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        if n % 3 == 2:
+            page.insert_text((50, 50), "Plain text page without a table")
+            continue
+        for r in range(4):
+            for x, label in ((50, "Schet"), (300, "Account")):
+                page.draw_rect(fitz.Rect(x, 50 + r * 30, x + 250, 80 + r * 30), color=(0, 0, 0))
+                page.insert_text((x + 5, 70 + r * 30), f"{label} {n}-{r} 4070281090000000000{r}", fontsize=9)
+    doc.save(path)
+
+
+def plumber_pairs(path):
+    with pdfplumber.open(path) as pdf:
+        return [(row[0] or "", row[1] or "") for page in pdf.pages
+                for tbl in page.extract_tables() for row in tbl if len(row) >= 2]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    extractor._cache.clear()
+    yield
+    extractor._cache.clear()
+
+
+def test_pdf_pairs_match_pdfplumber(tmp_path):
+    path = tmp_path / "c.pdf"
+    make_pdf(str(path), 3)
+    pairs = extractor.extract_pairs(str(path))
+    assert pairs == plumber_pairs(str(path))
+    assert pairs[0] == ("Schet 0-0 40702810900000000000", "Account 0-0 40702810900000000000")
+    assert len(pairs) == 8
+
+
+def test_fallback_to_pdfplumber(tmp_path, monkeypatch):
+    path = tmp_path / "c.pdf"
+    make_pdf(str(path), 1)
+    monkeypatch.setattr(fitz.Page, "find_tables", lambda self, **kw: type("T", (), {"tables": []})())
+    assert extractor.extract_pairs(str(path)) == plumber_pairs(str(path))
+
+
+def test_row_boxes_from_both_libraries(tmp_path, monkeypatch):
+    path = tmp_path / "c.pdf"
+    make_pdf(str(path), 1)
+    boxes = extractor.pair_boxes(str(path))
+    assert boxes[1] == (50.0, 80.0, 550.0, 110.0)
+    extractor._cache.clear()
+    monkeypatch.setattr(fitz.Page, "find_tables", lambda self, **kw: type("T", (), {"tables": []})())
+    assert extractor.pair_boxes(str(path)) == boxes
+
+
+def test_cache_by_content(tmp_path, monkeypatch):
+    path = tmp_path / "c.pdf"
+    make_pdf(str(path), 1)
+    first = extractor.extract_pairs(str(path))
+    monkeypatch.setattr(extractor, "_extract_pdf", lambda p: pytest.fail("не из кэша"))
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(path.read_bytes())
+    assert extractor.extract_pairs(str(copy)) == first
+    first.clear()       # вызывающий не портит кэш
+    assert extractor.extract_pairs(str(path))
+
+
+def test_parallel_pages_keep_order(tmp_path, monkeypatch):
+    path = tmp_path / "c.pdf"
+    make_pdf(str(path), 7)
+    monkeypatch.setattr(extractor, "PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(extractor, "PAGES_PER_TASK", 2)
+    assert extractor.extract_pairs(str(path)) == plumber_pairs(str(path))
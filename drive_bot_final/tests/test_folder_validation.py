@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+from unittest.mock import MagicMock
+
+import openpyxl
+import pytest
+
+from app.services import drive, folder_validation
+
+
+class DummyBot:
+    def __init__(self):
+        self.messages, self.reports, self.edits = [], [], []
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+    async def send_document(self, chat_id, document, **kwargs):
+        wb = openpyxl.load_workbook(document.path, read_only=True)
+        self.reports.append({ws.title: [list(r) for r in ws.iter_rows(values_only=True)] for ws in wb})
+        wb.close()
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edits.append(text)
+
+
+LISTING = [
+    {"id": "a", "name": "Договор A.pdf", "mimeType": "application/pdf", "size": "100", "path": ""},
+    {"id": "b", "name": "Договор B.docx", "mimeType": "x", "size": "100", "path": "2024/"},
+    {"id": "c", "name": "Договор C.pdf", "mimeType": "application/pdf", "size": "100", "path": "2024/"},
+    {"id": "big", "name": "Скан.pdf", "mimeType": "application/pdf", "size": str(10 ** 10), "path": ""},
+    {"id": "t", "name": "readme.txt", "mimeType": "text/plain", "size": "1", "path": ""},
+]
+MISSES = {"a": [], "b": [(3, "Счёт 40702810900000000001", "Account 1")], "c": []}
+
+
+@pytest.fixture
+def job(fake_redis, monkeypatch):
+    calls = {"listed": 0, "queued": [], "temp": []}
+
+    async def listing(folder_id):
+        calls["listed"] += 1
+        return LISTING
+
+    async def download(file_id, destination):
+        calls["temp"].append(destination)
+        with open(destination, "w") as f:
+            f.write(file_id)
+
+    async def validate(path, filename, chat_id, on_progress):
+        with open(path) as f:
+            file_id = f.read()
+        patched = path + ".patched"
+        open(patched, "w").close()
+        calls["temp"].append(patched)
+        return MISSES[file_id], patched
+
+    monkeypatch.setattr(folder_validation, "list_files_recursive", listing)
+    monkeypatch.setattr(folder_validation, "download_file", download)
+    monkeypatch.setattr(folder_validation, "validate_cached", validate)
+    monkeypatch.setattr(folder_validation.validate_folder_file, "delay",
+                        lambda job, file_id: calls["queued"].append(file_id))
+    calls["redis"] = fake_redis
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_folder_job_resumes_and_reports_once(job, monkeypatch):
+    bot, jid = DummyBot(), folder_validation.job_id(1, "folder")
+    await folder_validation.start_folder_job(bot, jid, "folder", "Ромашка", 1, 7)
+    assert job["queued"] == ["a", "b", "c", "big"]
+    await folder_validation.check_folder_file(bot, jid, "a")
+    await folder_validation.check_folder_file(bot, jid, "big")
+
+    # повторный запуск, пока задачи в очереди, ничего не дублирует
+    job["queued"].clear()
+    await folder_validation.start_folder_job(bot, jid, "folder", "Ромашка", 1, 8)
+    assert job["queued"] == [] and job["listed"] == 1
+
+    # воркеры упали, очередь потеряна — после QUEUED_STALE ставится только остаток
+    monkeypatch.setattr(folder_validation, "QUEUED_STALE", -1)
+    await folder_validation.start_folder_job(bot, jid, "folder", "Ромашка", 1, 8)
+    assert job["queued"] == ["b", "c"] and job["listed"] == 1
+    assert bot.edits[-1] == "📂 Ромашка: документов 4, уже проверено 2"
+    await asyncio.gather(*(folder_validation.check_folder_file(bot, jid, f) for f in ["b", "c", "b"]))
+
+    assert len(bot.reports) == 1 and len(bot.messages) == 1
+    assert "⚠️ С расхождениями: 1 (строк: 1)" in bot.messages[0]
+    assert "❌ Не удалось проверить: 1" in bot.messages[0]
+    report = bot.reports[0]
+    assert [r[:3] for r in report["Документы"][1:]] == [
+        [None, "Договор A.pdf", 0], [None, "Скан.pdf", 0], ["2024/", "Договор B.docx", 1], ["2024/", "Договор C.pdf", 0],
+    ]
+    assert report["Расхождения"][1:] == [["2024/", "Договор B.docx", 3, "Счёт 40702810900000000001", "Account 1"]]
+    assert not job["redis"].hashes
+    assert job["temp"] and not any(os.path.exists(p) for p in job["temp"])
+
+    # запоздалая повторная доставка после отчёта ничего не шлёт
+    await folder_validation.check_folder_file(bot, jid, "c")
+    assert len(bot.reports) == 1
+
+
+@pytest.mark.asyncio
+async def test_folder_without_documents(job, monkeypatch):
+    async def empty(folder_id):
+        return LISTING[-1:]
+
+    monkeypatch.setattr(folder_validation, "list_files_recursive", empty)
+    bot = DummyBot()
+    await folder_validation.start_folder_job(bot, "1:x", "x", "Пусто", 1, 7)
+    assert bot.edits == ["📂 Пусто: нет DOCX и PDF"] and not job["queued"]
+
+
+@pytest.mark.asyncio
+async def test_find_folder_escapes_names(monkeypatch):
+    client = MagicMock()
+    client.files.return_value.list.return_value.execute.return_value = {"files": [{"id": "f1"}]}
+    monkeypatch.setattr(drive, "drive", client)
+    assert await drive.find_folder(["O'Brien\\Co"]) == "f1"
+    q = client.files.return_value.list.call_args.kwargs["q"]
+    assert "name = 'O\\'Brien\\\\Co'" in q
+
+
+def test_downloads_use_a_transport_per_thread(monkeypatch, tmp_path):
+    client = MagicMock()
+    client.files.return_value.get_media.side_effect = lambda fileId: MagicMock(name=fileId)
+    used = {}
+
+    class Download:
+        def __init__(self, f, request):
+            used[request._mock_name] = request.http
+        def next_chunk(self):
+            return None, True
+
+    monkeypatch.setattr(drive, "drive", client)
+    monkeypatch.setattr(drive, "MediaIoBaseDownload", Download)
+    threads = [threading.Thread(target=drive._download, args=(i, str(tmp_path / i))) for i in "ab"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    drive._download("c", str(tmp_path / "c"))
+    drive._download("d", str(tmp_path / "d"))
+    assert used["a"] is not used["b"]
+    assert used["c"] is used["d"] and used["c"] not in (used["a"], used["b"])
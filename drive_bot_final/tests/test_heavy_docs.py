@@ -0,0 +1,135 @@
+import os
+
+import fitz
+import pytest
+from aiogram import Bot
+
+from app.handlers import menu
+from app.services import heavy_docs
+from app.services.heavy_docs import is_heavy_pdf, pdf_page_count, run_heavy_statement
+from app.utils import telegram_utils
+
+LINE = "Payment order No 15 dated 01.02.2025, amount 1 000,00 USD. Counterparty LLC Alpha\n"
+
+
+def _pdf(pages=3, pad_mb=0):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 400), LINE * 3, fontname="helv")
+    if pad_mb:
+        # несжимаемое вложение: PDF больше лимита getFile облачного API
+        doc.embfile_add("pad.bin", os.urandom(pad_mb * 1024 * 1024))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_heavy_by_size_and_pages(monkeypatch):
+    monkeypatch.setattr(heavy_docs.settings, "HEAVY_PDF_MB", 1)
+    monkeypatch.setattr(heavy_docs.settings, "HEAVY_PDF_PAGES", 5)
+    assert is_heavy_pdf(2 * 1024 * 1024)
+    assert not is_heavy_pdf(1024)
+    assert is_heavy_pdf(1024, pages=6)
+    assert not is_heavy_pdf(None, pages=5)
+
+
+def test_page_count(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(_pdf(4))
+    assert pdf_page_count(str(path)) == 4
+    path.write_bytes(b"not a pdf")
+    assert pdf_page_count(str(path)) == 0
+
+
+class DummyBot:
+    def __init__(self, data):
+        self.data = data
+        self.edits = []
+    async def download(self, file_id, destination):
+        with open(destination, "wb") as f:
+            f.write(self.data)
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edits.append(text)
+
+
+@pytest.mark.asyncio
+async def test_worker_streams_progress_and_report(monkeypatch):
+    monkeypatch.setattr(heavy_docs, "PROGRESS_EVERY", 2)
+    bot = DummyBot(_pdf(3))
+    await run_heavy_statement(bot, "fid", "big.pdf", 1, 10)
+    progress, report = bot.edits[:-1], bot.edits[-1]
+    assert [p.rsplit(": ", 1)[1] for p in progress] == ["2 из 3", "3 из 3"]
+    assert "Найдено платежей" in report
+
+
+@pytest.mark.asyncio
+async def test_worker_reports_error(monkeypatch):
+    bot = DummyBot(b"broken")
+    await run_heavy_statement(bot, "fid", "big.pdf", 1, 10)
+    assert bot.edits[-1].startswith("❌")
+
+
+class DummyMsg:
+    def __init__(self, document):
+        self.document = document
+        self.chat = type("Chat", (), {"id": 42})()
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return type("Sent", (), {"message_id": 7})()
+
+
+@pytest.mark.asyncio
+async def test_worker_reads_large_pdf_from_local_api(tmp_path, monkeypatch):
+    # локальный Bot API отдаёт путь к файлу в общем каталоге, минуя лимит 20 МБ
+    monkeypatch.setattr(heavy_docs.settings, "TELEGRAM_API_URL", "http://telegram-bot-api:8081")
+    stored = tmp_path / "documents" / "file_1.pdf"
+    stored.parent.mkdir()
+    stored.write_bytes(_pdf(2, pad_mb=21))
+    assert stored.stat().st_size > 20 * 1024 * 1024
+
+    bot = Bot("123:abc", session=telegram_utils.make_session())
+    edits = []
+
+    async def get_file(file_id, **kwargs):
+        return type("File", (), {"file_path": str(stored)})()
+
+    async def edit(text, chat_id, message_id, **kwargs):
+        edits.append(text)
+
+    monkeypatch.setattr(bot, "get_file", get_file)
+    monkeypatch.setattr(bot, "edit_message_text", edit)
+    await run_heavy_statement(bot, "fid", "big.pdf", 1, 10)
+    await bot.session.close()
+    assert "Найдено платежей" in edits[-1]
+
+
+@pytest.mark.asyncio
+async def test_handler_rejects_large_pdf_without_local_api(monkeypatch):
+    sent = []
+    monkeypatch.setattr(menu.process_heavy_statement, "delay", lambda *args: sent.append(args))
+    monkeypatch.setattr(heavy_docs.settings, "TELEGRAM_API_URL", None)
+    document = type("Doc", (), {
+        "mime_type": "application/pdf", "file_size": 45 * 1024 * 1024,
+        "file_id": "fid", "file_name": "выписка.pdf",
+    })()
+    msg = DummyMsg(document)
+    await menu.analyze_bank_document(msg)
+    assert not sent and "больше 20 МБ" in msg.answers[0]
+
+
+@pytest.mark.asyncio
+async def test_handler_enqueues_large_pdf(monkeypatch):
+    sent = []
+    monkeypatch.setattr(heavy_docs.settings, "TELEGRAM_API_URL", "http://telegram-bot-api:8081")
+    monkeypatch.setattr(menu.process_heavy_statement, "delay", lambda *args: sent.append(args))
+    monkeypatch.setattr(heavy_docs.settings, "HEAVY_PDF_MB", 1)
+    document = type("Doc", (), {
+        "mime_type": "application/pdf", "file_size": 45 * 1024 * 1024,
+        "file_id": "fid", "file_name": "выписка.pdf",
+    })()
+    msg = DummyMsg(document)
+    await menu.analyze_bank_document(msg)
+    assert sent == [("fid", "выписка.pdf", 42, 7)]
+    assert "очередь" in msg.answers[0]
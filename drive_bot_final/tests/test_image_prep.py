@@ -0,0 +1,67 @@
+import io
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from app.services.image_prep import (
+    adaptive_binarize,
+    crop_to_content,
+    deskew,
+    downscale,
+    estimate_skew,
+    load_photo,
+    pixmap_to_array,
+    prepare_for_ocr,
+)
+
+
+def _lines_image(h=400, w=600, slope=0.0, background=200):
+    img = np.full((h, w), background, dtype=np.uint8)
+    xs = np.arange(40, w - 40)
+    for y0 in range(60, h - 60, 40):
+        ys = (y0 + xs * np.tan(np.radians(slope))).astype(int)
+        for dy in range(3):
+            img[ys + dy, xs] = 30
+    return img
+
+
+def test_pixmap_to_array_gray_and_rgb():
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 7, 5), False)
+    pix.clear_with(100)
+    arr = pixmap_to_array(pix)
+    assert arr.shape == (5, 7) and arr.dtype == np.uint8
+    assert (arr == 100).all()
+
+
+def test_binarize_handles_uneven_lighting():
+    img = _lines_image()
+    # градиент освещения слева направо: глобальный порог тут не справится
+    img = np.clip(img.astype(int) - np.linspace(0, 120, img.shape[1]).astype(int), 0, 255).astype(np.uint8)
+    binary = adaptive_binarize(img)
+    assert set(np.unique(binary)) <= {0, 255}
+    assert binary[61, 300] == 0            # строка
+    assert binary[80, 300] == 255          # межстрочье
+    assert binary[80, 550] == 255          # тёмный край фона — всё ещё фон
+
+
+def test_skew_estimated_and_corrected():
+    binary = adaptive_binarize(_lines_image(slope=2.0))
+    angle = estimate_skew(binary)
+    assert abs(angle - 2.0) <= 0.5
+    assert abs(estimate_skew(deskew(binary, angle))) <= 0.5
+
+
+def test_crop_and_empty_page():
+    binary = adaptive_binarize(_lines_image())
+    cropped = crop_to_content(binary)
+    assert cropped.shape[0] < binary.shape[0] and cropped.shape[1] < binary.shape[1]
+    assert prepare_for_ocr(np.full((100, 100), 240, dtype=np.uint8)).size == 0
+
+
+def test_load_photo_limits_long_side():
+    buf = io.BytesIO()
+    Image.fromarray(_lines_image(800, 1200)).save(buf, format="PNG")
+    gray = load_photo(buf.getvalue(), long_side=500)
+    assert gray.ndim == 2 and max(gray.shape) <= 600
+    assert downscale(gray, 1) is gray
@@ -0,0 +1,53 @@
+import pytest
+
+from app.services import ner_engine
+
+
+class Ent:
+    def __init__(self, text, label):
+        self.text, self.label_ = text, label
+
+
+class FakeNLP:
+    """Сущности — слова с заглавной буквы (ORG) и числа (CARDINAL)."""
+    def __init__(self):
+        self.seen = []
+    def pipe(self, texts, batch_size, n_process):
+        self.batch_size = batch_size
+        for text in texts:
+            self.seen.append(text)
+            yield type("Doc", (), {"ents": [
+                Ent(w, "CARDINAL" if w.isdigit() else "ORG") for w in text.split() if w[0].isupper() or w.isdigit()
+            ]})()
+
+
+@pytest.fixture
+def nlp(monkeypatch):
+    fake = FakeNLP()
+    monkeypatch.setattr(ner_engine, "_nlp", None)
+    monkeypatch.setattr(ner_engine, "_load_model", lambda: fake)
+    monkeypatch.setattr(ner_engine, "_cache", type(ner_engine._cache)())
+    return fake
+
+
+def test_model_loaded_lazily_once(nlp, monkeypatch):
+    assert ner_engine._nlp is None
+    assert ner_engine.get_nlp() is nlp
+    monkeypatch.setattr(ner_engine, "_load_model", lambda: pytest.fail("модель грузится повторно"))
+    assert ner_engine.get_nlp() is nlp
+
+
+def test_batched_entities_with_cache(nlp):
+    texts = ["Ромашка  платит 100", "Ромашка платит 100", "Лютик"]
+    assert ner_engine.get_entities_many(texts, batch_size=8) == [{"ромашка", "100"}, {"ромашка", "100"}, {"лютик"}]
+    # одинаковые после нормализации тексты уходят в модель один раз
+    assert nlp.seen == ["Ромашка платит 100", "Лютик"] and nlp.batch_size == 8
+    assert ner_engine.get_entities("Лютик", labels={"CARDINAL"}) == set()
+    assert ner_engine.get_entities("Ромашка\nплатит 100", labels={"CARDINAL"}) == {"100"}
+    assert nlp.seen == ["Ромашка платит 100", "Лютик"]
+
+
+def test_cache_is_bounded(nlp, monkeypatch):
+    monkeypatch.setattr(ner_engine, "CACHE_SIZE", 2)
+    ner_engine.get_entities_many(["А", "Б", "В"])
+    assert list(ner_engine._cache) == ["Б", "В"]
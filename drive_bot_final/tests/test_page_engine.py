@@ -0,0 +1,91 @@
+import fitz
+import pytest
+from app.services import page_engine
+from app.services.page_engine import PageKind, extract_document
+
+LONG_TEXT = "Payment order No 15 dated 01.02.2025, amount 1 000,00 USD. " * 3
+
+
+def _image_stream(width=400, height=300, ink=True):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.clear_with(230)
+    if ink:
+        # «строки текста» — тёмные полосы
+        for y in range(20, height - 20, 30):
+            pix.set_rect(fitz.IRect(20, y, width - 20, y + 8), (20, 20, 20))
+    return pix.tobytes("png")
+
+
+@pytest.fixture
+def mixed_pdf():
+    doc = fitz.open()
+    text_page = doc.new_page()
+    text_page.insert_textbox(fitz.Rect(50, 50, 550, 400), LONG_TEXT, fontname="helv")
+    doc.new_page()  # пустая
+    scan_page = doc.new_page()
+    scan_page.insert_image(scan_page.rect, stream=_image_stream())
+    mixed_page = doc.new_page()
+    mixed_page.insert_textbox(fitz.Rect(50, 50, 550, 300), LONG_TEXT, fontname="helv")
+    mixed_page.insert_image(fitz.Rect(50, 400, 550, 800), stream=_image_stream())
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    calls = []
+    def ocr(img, config=page_engine.DEFAULT_TESSERACT_CONFIG, prepass=True, ink_share=None):
+        calls.append(img.shape)
+        return "OCR"
+    monkeypatch.setattr(page_engine, "ocr_image", ocr)
+    return calls
+
+
+def test_pages_classified(mixed_pdf, fake_ocr):
+    doc = extract_document(mixed_pdf)
+    assert [p.kind for p in doc.pages] == [PageKind.TEXT, PageKind.BLANK, PageKind.SCANNED, PageKind.MIXED]
+    assert doc.ocr_page_count == 2
+    assert len(fake_ocr) == 2
+
+
+def test_blank_skipped_and_text_merged(mixed_pdf, fake_ocr):
+    doc = extract_document(mixed_pdf)
+    text_page, blank, scanned, mixed = doc.pages
+    assert "Payment order" in text_page.text and "OCR" not in text_page.text
+    assert blank.text == ""
+    assert scanned.text == "OCR"
+    assert "Payment order" in mixed.text and mixed.text.endswith("OCR")
+
+
+def test_mixed_region_rendered_clipped(mixed_pdf, fake_ocr):
+    extract_document(mixed_pdf)
+    region, full_page = sorted(fake_ocr, key=lambda shape: shape[0])
+    assert region[0] < full_page[0] / 2
+    assert region[1] < full_page[1]
+
+
+def test_render_dpi_follows_embedded_image(mixed_pdf, fake_ocr):
+    # картинка 400 px на всю ширину A4 (~48 dpi) → рендер на нижней границе MIN_DPI
+    extract_document(mixed_pdf)
+    full_page = max(fake_ocr)
+    assert full_page[1] == pytest.approx(595 * page_engine.MIN_DPI / 72, abs=2)
+
+
+def test_bank_ocr_uses_engine(tmp_path, mixed_pdf, fake_ocr, monkeypatch):
+    from app.services.bank_ocr_service import BankDocumentOCR
+    path = tmp_path / "statement.pdf"
+    path.write_bytes(mixed_pdf)
+    seen = []
+    monkeypatch.setattr(BankDocumentOCR, "_payments_from_blocks", lambda self, blocks: seen.extend(blocks) or [])
+    BankDocumentOCR()._process_document_sync(str(path))
+    assert "\n".join(seen).count("OCR") == 2
+
+
+def test_blank_scan_detected_by_histogram(fake_ocr):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=_image_stream(ink=False))
+    result = extract_document(doc.tobytes())
+    assert [p.kind for p in result.pages] == [PageKind.BLANK]
+    assert fake_ocr == []
@@ -0,0 +1,61 @@
+import numpy as np
+from app.services import page_prepass
+from app.services.page_prepass import PageProfile, ink_share, profile_image
+
+BASE = "--oem 3 --psm 6 -l rus+eng"
+
+
+def test_ink_share_relative_to_background():
+    gray = np.full((100, 100), 180, dtype=np.uint8)  # серая бумага
+    assert ink_share(gray) == 0.0
+    gray[10:20, :] = 30
+    assert abs(ink_share(gray) - 0.1) < 1e-9
+
+
+def test_config_narrows_languages():
+    assert PageProfile(ink_share=0.1, script="Latin").config(BASE) == "--oem 3 --psm 6 -l eng"
+    # IBAN и SWIFT на кириллической странице: английский остаётся в наборе
+    assert PageProfile(ink_share=0.1, script="Cyrillic").config(BASE) == BASE
+    assert PageProfile(ink_share=0.1, script="Han").config(BASE) == BASE
+    assert PageProfile(ink_share=0.1).config(BASE) == BASE
+    # язык, которого нет в базовом наборе, не подставляем
+    assert PageProfile(ink_share=0.1, script="Latin").config("--oem 3 -l rus") == "--oem 3 -l rus"
+
+
+def test_sparse_page_switches_psm():
+    assert PageProfile(ink_share=0.005, script="Cyrillic").config(BASE) == "--oem 3 -l rus+eng --psm 11"
+
+
+def test_osd_runs_on_preview(monkeypatch):
+    seen = []
+    monkeypatch.setattr(page_prepass.pytesseract, "image_to_osd",
+                        lambda img, output_type: seen.append(img.shape) or {"rotate": 0, "script": "Latin",
+                                                                            "orientation_conf": 5, "script_conf": 5})
+    assert page_prepass.detect_orientation_script(np.zeros((3508, 2480), dtype=np.uint8)) == (0, "Latin")
+    assert max(seen[0]) <= page_prepass.OSD_MAX_SIDE
+    small = np.zeros((800, 600), dtype=np.uint8)
+    assert page_prepass.osd_preview(small) is small
+
+
+def test_profile_blank_skips_osd(monkeypatch):
+    monkeypatch.setattr(page_prepass, "detect_orientation_script", lambda img: (_ for _ in ()).throw(AssertionError))
+    img = np.full((200, 200), 255, dtype=np.uint8)
+    assert profile_image(img).blank
+
+
+def test_osd_is_opt_in(monkeypatch):
+    monkeypatch.setattr(page_prepass, "detect_orientation_script", lambda img: (_ for _ in ()).throw(AssertionError))
+    img = np.full((100, 300), 255, dtype=np.uint8)
+    img[10:40, 10:290] = 0
+    profile = profile_image(img)
+    assert not profile.blank and profile.rotate == 0 and profile.script is None
+
+
+def test_profile_rotation(monkeypatch):
+    monkeypatch.setattr(page_prepass.settings, "OCR_PREPASS_OSD", True)
+    monkeypatch.setattr(page_prepass, "detect_orientation_script", lambda img: (90, "Cyrillic"))
+    img = np.full((100, 300), 255, dtype=np.uint8)
+    img[10:40, 10:290] = 0
+    profile = profile_image(img)
+    assert profile.rotate == 90 and profile.script == "Cyrillic"
+    assert profile.upright(img).shape == (300, 100)
@@ -0,0 +1,80 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.handlers import menu
+from app.services import payment_ledger
+from app.services.bank_ocr_service import BankPayment
+from app.services.payment_ledger import PaymentLedger, payment_fingerprint, statement_fingerprints
+
+
+def pay(amount, day, ref=None, account="40702810900000000001"):
+    return BankPayment(Decimal(amount), "RUB", "ООО Альфа", "", datetime(2025, 5, day), account, "", ref)
+
+
+def test_fingerprint_normalization():
+    a = pay("100.00", 1, " 15 ", "4070 2810 9000 0000 0001")
+    b = pay("100", 1, "15")
+    assert payment_fingerprint(a) == payment_fingerprint(b)
+    assert payment_fingerprint(a) != payment_fingerprint(pay("100.01", 1, "15"))
+    # повторы внутри выписки различаются номером повтора
+    fps = statement_fingerprints([pay("1.00", 2), pay("1.00", 2), pay("1.00", 3)])
+    assert len(set(fps)) == 3 and fps[0] == payment_fingerprint(pay("1.00", 2))
+
+
+@pytest.mark.asyncio
+async def test_overlapping_statements(fake_redis):
+    ledger = PaymentLedger("redis://")
+    await ledger.connect()
+    daily = [pay("100.00", 1, "1"), pay("5.00", 1), pay("5.00", 1)]
+    monthly = daily + [pay("5.00", 1), pay("300.00", 20, "2")]
+    assert await ledger.register(7, daily) == [True, True, True]
+    assert await ledger.register(7, monthly) == [False, False, False, True, True]
+    assert await ledger.register(7, monthly) == [False] * 5
+    assert await ledger.get_totals(7) == {"RUB": (Decimal("415.00"), 5)}
+    assert await ledger.get_totals(8) == {}
+    await ledger.reset(7)
+    assert await ledger.get_totals(7) == {}
+
+
+@pytest.mark.asyncio
+async def test_report_note(fake_redis):
+    payments = [pay("100.00", 1, "1")]
+    assert "Итого по всем выпискам" in await menu._register_statement(7, payments)
+    note = await menu._register_statement(7, payments)
+    assert "Уже были в прошлых выписках: 1" in note
+    assert "RUB: 100.00 (1 шт.)" in note
+
+
+@pytest.mark.asyncio
+async def test_report_without_redis(monkeypatch):
+    def broken(url):
+        raise ConnectionError("redis down")
+    monkeypatch.setattr(payment_ledger.aioredis, "from_url", broken)
+    assert await menu._register_statement(7, [pay("1.00", 1)]) == ""
+
+
+def test_fingerprint_ignores_fallback_date():
+    # без даты в выписке подставлено время загрузки — на отпечаток оно не влияет
+    today = BankPayment(Decimal("7.00"), "RUB", "ООО Альфа", "", datetime(2025, 5, 1, 10), "", "", "9", date_parsed=False)
+    tomorrow = BankPayment(Decimal("7.00"), "RUB", "ООО Альфа", "", datetime(2025, 5, 2, 9), "", "", "9", date_parsed=False)
+    assert payment_fingerprint(today) == payment_fingerprint(tomorrow)
+    assert payment_fingerprint(pay("7.00", 1, "9")) != payment_fingerprint(pay("7.00", 2, "9"))
+
+
+@pytest.mark.asyncio
+async def test_totals_command_without_redis(monkeypatch):
+    def broken(url):
+        raise ConnectionError("redis down")
+    monkeypatch.setattr(payment_ledger.aioredis, "from_url", broken)
+    answers = []
+
+    class Msg:
+        text = "/итоги"
+        from_user = type("User", (), {"id": 7})()
+        async def answer(self, text, **kwargs):
+            answers.append(text)
+
+    await menu.show_ledger_totals(Msg())
+    assert answers == ["⚠️ Сводный учёт сейчас недоступен, попробуйте позже"]
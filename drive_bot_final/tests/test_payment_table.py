@@ -0,0 +1,117 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+
+import openpyxl
+import pytest
+
+from app.handlers import menu
+from app.services.bank_ocr_service import BankPayment
+from app.services.payment_table import PaymentTable, PaymentTableBuilder, format_detailed_report, write_xlsx
+
+
+def pay(amount, currency="RUB", counterparty="ООО Альфа", day=1):
+    return BankPayment(Decimal(amount), currency, counterparty, "оплата", datetime(2025, 3, day), "", "", None)
+
+
+PAYMENTS = [
+    pay("100.10"), pay("0.20", day=2), pay("50.00", "USD", "Acme"),
+    pay("1000.00", counterparty="ООО Бета"), pay("25.55", "USD", "Acme", day=2),
+]
+
+
+def test_totals_are_exact():
+    table = PaymentTable.from_payments(PAYMENTS)
+    assert table.amount_minor.dtype.name == "int64"
+    assert table.totals_by_currency() == {"RUB": Decimal("1100.30"), "USD": Decimal("75.55")}
+    # суммы в копейках не накапливают ошибку float
+    many = PaymentTable.from_payments([pay("0.10")] * 1000)
+    assert many.totals_by_currency() == {"RUB": Decimal("100.00")}
+
+
+def test_group_by():
+    table = PaymentTable.from_payments(PAYMENTS)
+    by_cp = [(g.key, g.currency, g.count, g.total) for g in table.group_by("counterparty")]
+    assert by_cp == [
+        ("ООО Бета", "RUB", 1, Decimal("1000.00")),
+        ("ООО Альфа", "RUB", 2, Decimal("100.30")),
+        ("Acme", "USD", 2, Decimal("75.55")),
+    ]
+    by_day = {(g.key, g.currency): g.total for g in table.group_by("date")}
+    assert by_day[("01.03.2025", "RUB")] == Decimal("1100.10")
+    assert by_day[("02.03.2025", "USD")] == Decimal("25.55")
+    with pytest.raises(ValueError):
+        table.group_by("purpose")
+
+
+def test_builder_in_batches():
+    builder = PaymentTableBuilder()
+    builder.extend(PAYMENTS[:2])
+    builder.extend(PAYMENTS[2:])
+    assert len(builder) == 5
+    assert builder.build().counterparties == ["ООО Альфа", "Acme", "ООО Бета"]
+
+
+def test_write_xlsx(tmp_path):
+    path = tmp_path / "p.xlsx"
+    write_xlsx(PaymentTable.from_payments(PAYMENTS), str(path))
+    wb = openpyxl.load_workbook(path, read_only=True)
+    rows = list(wb["Платежи"].iter_rows(values_only=True))
+    assert len(rows) == 6
+    assert rows[1][1:4] == (100.1, "RUB", "ООО Альфа")
+    totals = [r for r in wb["Итоги"].iter_rows(values_only=True) if r and r[0] == "Итого"]
+    assert ("Итого", "USD", 2, 75.55) in totals
+
+
+def test_payment_without_date(tmp_path):
+    undated = BankPayment(Decimal("5.00"), "RUB", "ООО Альфа", "", datetime.now(), "", "", None, date_parsed=False)
+    table = PaymentTable.from_payments([pay("1.00"), undated])
+    assert [(g.key, g.total) for g in table.group_by("date")] == [("без даты", Decimal("5.00")), ("01.03.2025", Decimal("1.00"))]
+    assert not table.row(1).date_parsed and table.row(0).date_parsed
+    path = tmp_path / "p.xlsx"
+    write_xlsx(table, str(path))
+    rows = list(openpyxl.load_workbook(path, read_only=True)["Платежи"].iter_rows(values_only=True))
+    assert rows[2][:2] == (None, 5.0)
+
+
+def test_detailed_report():
+    report = format_detailed_report(PaymentTable.from_payments(PAYMENTS), top=1)
+    assert "RUB: 1,100.30 (3 шт.)" in report
+    assert "ООО Бета — 1,000.00 RUB" in report
+    assert "... и еще 2" in report
+
+
+class DummyMessage:
+    def __init__(self):
+        self.documents = []
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+    async def answer_document(self, document, **kwargs):
+        assert os.path.exists(document.path)
+        self.documents.append(document)
+
+
+class DummyCallback:
+    def __init__(self, data, user_id=7):
+        self.data = data
+        self.from_user = type("User", (), {"id": user_id})()
+        self.message = DummyMessage()
+        self.answered = []
+    async def answer(self, text=None, **kwargs):
+        self.answered.append(text)
+
+
+@pytest.mark.asyncio
+async def test_bank_buttons(monkeypatch):
+    monkeypatch.setattr(menu, "_bank_tables", {7: PaymentTable.from_payments(PAYMENTS)})
+    cb = DummyCallback("save_bank_excel")
+    await menu.save_bank_excel(cb)
+    assert len(cb.message.documents) == 1
+    assert not os.path.exists(cb.message.documents[0].path)
+    cb = DummyCallback("detailed_bank_report")
+    await menu.detailed_bank_report(cb)
+    assert "Подробный отчет: 5" in cb.message.answers[0]
+    cb = DummyCallback("detailed_bank_report", user_id=8)
+    await menu.detailed_bank_report(cb)
+    assert cb.answered == ["Сначала пришли выписку"]
@@ -0,0 +1,54 @@
+import datetime
+
+import pytest
+from aiogram import Bot
+from aiogram.types import Chat, Document, Message, User
+
+from app.routers import build_dispatcher
+from app.handlers.menu import ApplicationStates
+
+
+@pytest.fixture(scope="module")
+def dispatcher():
+    # роутеры привязываются к диспетчеру один раз на процесс
+    return build_dispatcher()
+
+
+def make_message(text=None, file_name=None) -> Message:
+    document = Document(file_id="f", file_unique_id="f", file_name=file_name) if file_name else None
+    return Message(
+        message_id=1, date=datetime.datetime.now(), chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="u"), text=text, document=document,
+    )
+
+
+async def resolve(dispatcher, message: Message, state=None) -> str:
+    """Имя хендлера, который получит сообщение, — в порядке, как у диспетчера."""
+    bot = Bot("123:abc")
+    for router in dispatcher.chain_tail:
+        for handler in router.message.handlers:
+            ok, _ = await handler.check(message, bot=bot, raw_state=state)
+            if ok:
+                return handler.callback.__name__
+
+
+@pytest.mark.asyncio
+async def test_registry_reaches_matcher(dispatcher):
+    state = ApplicationStates.waiting_registry.state
+    message = make_message(file_name="Заявки.xlsx")
+    assert await resolve(dispatcher, message, state) == "process_application_registry"
+
+
+@pytest.mark.asyncio
+async def test_ledger_totals_command(dispatcher):
+    assert await resolve(dispatcher, make_message("/итоги")) == "show_ledger_totals"
+    assert await resolve(dispatcher, make_message("/итоги сброс")) == "show_ledger_totals"
+
+
+@pytest.mark.asyncio
+async def test_validate_folder_command(dispatcher):
+    assert await resolve(dispatcher, make_message("/validate_folder Ромашка/Договоры")) == "run_folder_validation"
+    # в сценарии создания папки команда тоже не теряется
+    message = make_message("/validate_folder")
+    assert await resolve(dispatcher, message, "waiting_for_new_folder_name") == "run_folder_validation"
+    assert await resolve(dispatcher, make_message("Новая папка"), "waiting_for_new_folder_name") == "handle_new_folder_name"
@@ -0,0 +1,116 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.handlers import menu
+from app.services.bank_ocr_service import BankDocumentOCR
+from app.services.statement_import import detect_format, load_statement
+
+OWN = "40702810900000000001"
+ONE_C = f"""1CClientBankExchange
+ВерсияФормата=1.03
+Кодировка=Windows
+Отправитель=Бухгалтерия предприятия
+ДатаНачала=01.02.2025
+ДатаКонца=28.02.2025
+РасчСчет={OWN}
+СекцияРасчСчет
+ДатаНачала=01.02.2025
+РасчСчет={OWN}
+КонецРасчСчет
+СекцияДокумент=Платежное поручение
+Номер=15
+Дата=03.02.2025
+Сумма=125000.50
+ПлательщикСчет={OWN}
+Плательщик=ИНН 7701000000 ООО "Альфа"
+Плательщик1=ООО "Альфа"
+ПолучательСчет=40817810500000000002
+Получатель1=ООО "Бета"
+ДатаСписано=03.02.2025
+НазначениеПлатежа=Оплата по договору № 7
+КонецДокумента
+СекцияДокумент=Платежное поручение
+Номер=16
+Дата=05.02.2025
+Сумма=700.00
+ПлательщикСчет=40817810500000000003
+Плательщик1=ИП Гамма
+ПолучательСчет={OWN}
+ДатаПоступило=05.02.2025
+НазначениеПлатежа=Возврат
+КонецДокумента
+КонецФайла
+"""
+
+
+@pytest.mark.parametrize("encoding", ["cp1251", "utf-8"])
+def test_1c_exchange(encoding):
+    data = ONE_C.encode(encoding)
+    assert detect_format(data) == "1c"
+    out, inc = load_statement(data)
+    assert (out.amount, out.currency, out.counterparty) == (Decimal("125000.50"), "RUB", 'ООО "Бета"')
+    assert out.date == datetime(2025, 2, 3) and out.reference == "15"
+    assert (out.account_from, out.purpose) == (OWN, "Оплата по договору № 7")
+    assert (inc.amount, inc.counterparty) == (Decimal("700.00"), "ИП Гамма")
+
+
+def test_1c_dos_encoding():
+    data = ONE_C.replace("Кодировка=Windows", "Кодировка=DOS").encode("cp866")
+    assert len(load_statement(data)) == 2
+
+
+def test_csv_statement():
+    data = (
+        "Дата;Номер;Контрагент;Сумма;Валюта;Назначение платежа\n"
+        "01.02.2025;1;ООО Альфа;1 000,50;usd;Оплата инвойса\n"
+        "02.02.2025;2;ООО Бета;;RUB;пустая сумма\n"
+        "2025-02-03;3;ООО Гамма;-200;RUR;Комиссия\n"
+    ).encode("cp1251")
+    assert detect_format(data) == "csv"
+    first, second = load_statement(data)
+    assert (first.amount, first.currency, first.counterparty) == (Decimal("1000.50"), "USD", "ООО Альфа")
+    assert (second.amount, second.currency, second.date) == (Decimal("200"), "RUB", datetime(2025, 2, 3))
+
+
+def test_unknown_format():
+    assert detect_format(b"%PDF-1.4") is None
+    assert load_statement(b"just some text, nothing else") is None
+
+
+class DummyBot:
+    def __init__(self, data):
+        self.data = data
+    async def get_file(self, file_id):
+        return type("File", (), {"file_path": file_id})()
+    async def download_file(self, file_path, dest):
+        with open(dest, "wb") as f:
+            f.write(self.data)
+
+
+class DummyMsg:
+    def __init__(self, document, data):
+        self.document = document
+        self.bot = DummyBot(data)
+        self.message_id = 1
+        self.from_user = type("User", (), {"id": 7})()
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+    async def edit_text(self, text, **kwargs):
+        self.answers.append(text)
+        return self
+
+
+@pytest.mark.asyncio
+async def test_handler_skips_ocr_for_1c(monkeypatch):
+    def no_ocr(*args, **kwargs):
+        raise AssertionError("OCR не нужен")
+    monkeypatch.setattr(BankDocumentOCR, "iter_page_payments", no_ocr)
+    doc = type("Doc", (), {"mime_type": "text/plain", "file_size": 2048,
+                           "file_id": "fid", "file_name": "kl_to_1c.txt"})()
+    msg = DummyMsg(doc, ONE_C.encode("cp1251"))
+    await menu.analyze_bank_document(msg)
+    assert any("Найдено платежей: 2" in a for a in msg.answers)
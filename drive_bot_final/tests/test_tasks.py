@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app.handlers import validate
+from app.services import reporter, tasks, worker_runtime
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    async def refused(self):
+        raise ConnectionError("redis недоступен")
+    # без Redis сверка идёт как обычно, мимо кэша
+    monkeypatch.setattr(tasks.ValidationCache, "connect", refused)
+
+
+class DummyBot:
+    def __init__(self):
+        self.messages, self.documents, self.edits = [], [], []
+    async def download(self, file_id, destination):
+        with open(destination, "wb") as f:
+            f.write(b"%PDF-1.4")
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+    async def send_document(self, chat_id, document, **kwargs):
+        # файл ещё на месте, пока идёт отправка
+        self.documents.append((document.filename, os.path.exists(document.path)))
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edits.append(text)
+
+
+@pytest.mark.asyncio
+async def test_job_sends_report_and_cleans_up(monkeypatch):
+    paths = []
+
+    def fake_validate(path, on_progress, verdicts=None):
+        patched = path.replace(".pdf", "_patched.pdf")
+        open(patched, "wb").close()
+        paths.extend([path, patched])
+        on_progress(10, 10)
+        return [(1, "Счёт 40702810900000000001", "Account 1")] * 300, patched
+
+    monkeypatch.setattr(tasks, "validate_doc", fake_validate)
+    bot = DummyBot()
+    await tasks.run_validation_job(bot, "fid", "Договор.v2.pdf", 1, 7)
+    await asyncio.sleep(0)
+    assert len(bot.messages) > 1 and all(len(m) < 4096 for m in bot.messages)
+    assert bot.documents == [("Договор.v2_patched.pdf", True)]
+    assert bot.edits == ["🔎 Сверено строк: 10 из 10"]
+    assert paths and not any(os.path.exists(p) for p in paths)
+
+
+@pytest.mark.asyncio
+async def test_job_reports_error_and_cleans_up(monkeypatch):
+    paths = []
+
+    def broken(path, on_progress, verdicts=None):
+        paths.append(path)
+        raise ValueError("битый файл")
+
+    monkeypatch.setattr(tasks, "validate_doc", broken)
+    bot = DummyBot()
+    await tasks.run_validation_job(bot, "fid", "a.docx", 1, 7)
+    assert bot.edits == ["❌ Ошибка при сверке: битый файл"]
+    assert paths[0].endswith(".docx") and not os.path.exists(paths[0])
+
+
+def test_report_chunks_keep_all_rows():
+    misses = [(i, f"левая {i}" * 5, f"правая {i}" * 5) for i in range(1, 200)]
+    chunks = list(reporter.iter_report_chunks(misses, limit=1000))
+    assert len(chunks) > 1 and all(len(c) <= 1000 for c in chunks)
+    assert all(c.startswith("| # | Левая | Правая |\n|---") for c in chunks)
+    rows = [line for c in chunks for line in c.split("\n")[2:]]
+    assert rows == reporter.build_report(misses).split("\n")[2:]
+    assert list(reporter.iter_report_chunks([])) == []
+
+
+def test_worker_runtime_shares_loop_and_bot(monkeypatch):
+    monkeypatch.setattr(worker_runtime.settings, "bot_token", "123:abc")
+
+    async def where():
+        return threading.current_thread().name, asyncio.get_running_loop()
+
+    first, second = worker_runtime.run(where()), worker_runtime.run(where())
+    assert first == second and first[0] == "worker-loop"
+    assert worker_runtime.get_bot() is worker_runtime.get_bot()
+    worker_runtime.shutdown()
+    assert worker_runtime._bot is None and worker_runtime._loop is None
+
+
+class DummyMsg:
+    def __init__(self):
+        self.document = type("Doc", (), {"file_id": "fid", "file_name": "a.pdf", "file_size": 1024})()
+        self.chat = type("Chat", (), {"id": 42})()
+        self.answers = []
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+        return type("Sent", (), {"message_id": 7})()
+
+
+@pytest.mark.asyncio
+async def test_handler_enqueues_in_worker_mode(monkeypatch):
+    sent = []
+    monkeypatch.setattr(validate.settings, "VALIDATE_IN_WORKER", True)
+    monkeypatch.setattr(validate.validate_document, "delay", lambda *args: sent.append(args))
+    msg = DummyMsg()
+    await validate.run_validation(msg)
+    assert sent == [("fid", "a.pdf", 42, 7)]
+    assert msg.answers == ["🔎 Сверяю строки..."]
@@ -0,0 +1,71 @@
+import io
+
+import openpyxl
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services import page_engine, text_extractors
+from app.services.ocr import extract_text
+from app.services.text_extractors import collect, extract_streaming, iter_txt, iter_xlsx
+
+
+def _xlsx(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in rows:
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def test_xlsx_rows_streamed():
+    data = _xlsx([["Принципал", "Агент"], ["ООО Альфа", None, 1500.5], [None, None]])
+    assert list(iter_xlsx(data)) == ["Принципал\tАгент", "ООО Альфа\t1500.5"]
+    assert "ООО Альфа" in extract_text(data, "реестр.xlsx")
+
+
+def test_xlsx_stops_at_limit():
+    data = _xlsx([[f"строка {i}"] for i in range(5000)])
+    text = extract_streaming(data, "xlsx", limit=100)
+    assert len(text) == 100 and text.startswith("строка 0\nстрока 1")
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp1251"])
+def test_txt_encodings_and_chunks(tmp_path, encoding):
+    path = tmp_path / "note.txt"
+    path.write_bytes(("Договор № 12 от 01.02.2025\n" * 50).encode(encoding))
+    chunks = list(iter_txt(str(path), chunk_size=64))
+    assert len(chunks) > 10
+    assert "".join(chunks).startswith("Договор № 12")
+
+
+def test_collect_closes_generator():
+    closed = []
+    def gen():
+        try:
+            while True:
+                yield "x" * 10
+        finally:
+            closed.append(True)
+    assert collect(gen(), limit=25) == "x" * 10 + "\n" + "x" * 10 + "\n" + "xxx"
+    assert closed == [True]
+
+
+def test_multipage_tiff_goes_through_engine(monkeypatch):
+    monkeypatch.setattr(page_engine, "ocr_image", lambda img, *args, **kwargs: f"frame {img.shape[1]}")
+    frames = []
+    for _ in range(3):
+        img = Image.new("L", (800, 600), 230)
+        ImageDraw.Draw(img).rectangle((40, 40, 760, 60), fill=10)
+        frames.append(img)
+    frames.insert(1, Image.new("L", (800, 600), 230))  # пустой кадр
+    buf = io.BytesIO()
+    frames[0].save(buf, format="TIFF", save_all=True, append_images=frames[1:], dpi=(200, 200))
+    text = extract_text(buf.getvalue(), "scan.tiff")
+    assert text.count("frame") == 3
+
+
+def test_doc_without_antiword(monkeypatch):
+    monkeypatch.setattr(text_extractors.shutil, "which", lambda name: None)
+    assert extract_text(b"\xd0\xcf\x11\xe0", "old.doc") == ""
@@ -0,0 +1,64 @@
+import random
+import re
+import unicodedata
+
+from app.services.tokeniser import extract_tokens, normal
+
+# Шаблоны до кэширования — копией, чтобы сверка не зависела от модуля
+LEGACY_PATTERNS = (
+    re.compile(r"\b\d{10,}\b"),
+    re.compile(r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,}\b"),
+    re.compile(r"\d{2}\.\d{2}\.\d{4}"),
+    re.compile(r"\d[\d\s.,]+\s?(EUR|USD|RUB|₽|€|\$)"),
+)
+
+
+def legacy_normal(txt):
+    txt = txt.lower()
+    txt = unicodedata.normalize("NFKD", txt)
+    return re.sub(r"\s+", "", txt)
+
+
+def legacy_tokens(s):
+    res = set()
+    for r in LEGACY_PATTERNS:
+        res |= set(r.findall(s))
+    return {legacy_normal(t) for t in res}
+
+
+def random_cell(rnd):
+    pieces = [
+        lambda: f"Счёт № {rnd.randint(10**19, 10**20 - 1)}",
+        lambda: "DE89370400440532013000", lambda: "IBAN GB29NWBK60161331926819",
+        lambda: f"от {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(2000, 2030)}",
+        lambda: f"{rnd.randint(1, 999)} {rnd.randint(0, 999):03d},{rnd.randint(0, 99):02d} {rnd.choice(['EUR', 'USD', 'RUB', '₽', '€', '$'])}",
+        lambda: f"1234567890.{rnd.randint(10, 12)}.2024 EUR",     # номер, дата и сумма внахлёст
+        lambda: rnd.choice(["Покупатель обязуется оплатить", "Agreement", "Ёлка  ИНН", " "]),
+    ]
+    return " ".join(rnd.choice(pieces)() for _ in range(rnd.randint(1, 5)))
+
+
+def test_tokens_match_legacy():
+    rnd = random.Random(8)
+    for _ in range(2000):
+        cell = random_cell(rnd)
+        assert extract_tokens(cell) == legacy_tokens(cell)
+        assert normal(cell) == legacy_normal(cell)
+    assert extract_tokens("Стороны договорились о нижеследующем") == frozenset()
+
+
+def test_tokens_are_interned():
+    a = extract_tokens("Счёт 40702810900000000001 от 01.02.2024")
+    b = extract_tokens("Account 40702810900000000001")
+    token = next(t for t in b)
+    assert any(t is token for t in a)
+
+
+def test_repeated_cells_from_cache():
+    rnd = random.Random(3)
+    cells = [random_cell(rnd) for _ in range(300)]
+    rows = [rnd.choice(cells) for _ in range(5000)]
+    extract_tokens.cache_clear()
+    assert [extract_tokens(c) for c in rows] == [legacy_tokens(c) for c in rows]
+    info = extract_tokens.cache_info()
+    assert info.misses <= len(set(cells)) and info.hits == len(rows) - info.misses
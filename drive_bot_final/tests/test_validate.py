@@ -33,4 +33,89 @@ def test_validate_doc_too_large(tmp_path):
     file = tmp_path / "big.pdf"
     file.write_bytes(b"%PDF-1.4\n" + b"0" * (100 * 1024 * 1024) + b"\n%%EOF")
     with pytest.raises(FileValidationError):
-        validate_file(file.name, file.stat().st_size) 
\ No newline at end of file
+        validate_file(file.name, file.stat().st_size) 
+
+def test_find_misses_parallel_matches_serial(monkeypatch):
+    from app.services import reporter
+    pairs = []
+    for i in range(60):
+        acc = f"{4070281090000000000 + i}"
+        right = acc if i % 3 else "1111111111111111111"
+        pairs.append((f"Счёт {acc} от 01.02.2024", f"Account {right} dated 01.02.2024"))
+        pairs.append(("Одинаковый текст 1234567890", "одинаковый  текст 1234567890"))
+    serial = reporter.find_misses(pairs)
+    assert [m[0] for m in serial] == [i * 2 + 1 for i in range(0, 60, 3)]
+    monkeypatch.setattr(reporter, "PARALLEL_MIN_ROWS", 10)
+    monkeypatch.setattr(reporter, "CHUNK_ROWS", 16)
+    progress = []
+    assert reporter.find_misses(pairs, lambda done, total: progress.append((done, total))) == serial
+    assert progress[-1] == (120, 120) and len(progress) == 8
+
+def test_highlight_diffs_pdf_incremental(tmp_path):
+    import fitz
+    from app.services import extractor, reporter
+    src = tmp_path / "contract.v2.pdf"
+    doc = fitz.open()
+    for n in range(5):
+        page = doc.new_page()
+        for r in range(3):
+            right = "11111111111111111111" if (n, r) == (3, 1) else f"4070281090000000{n}{r:03d}"
+            for x, text in ((50, f"Schet 4070281090000000{n}{r:03d}"), (300, f"Account {right}")):
+                page.draw_rect(fitz.Rect(x, 50 + r * 30, x + 250, 80 + r * 30), color=(0, 0, 0))
+                page.insert_text((x + 5, 70 + r * 30), text, fontsize=9)
+    doc.save(str(src))
+    extractor._cache.clear()
+
+    misses, patched = reporter.validate_doc(str(src))
+    assert [m[0] for m in misses] == [11]
+    assert patched == str(tmp_path / "contract.v2_patched.pdf")
+    original, result = src.read_bytes(), open(patched, "rb").read()
+    assert result.startswith(original)      # дописано в конец, исходник не переписан
+    with fitz.open(patched) as out:
+        pages = list(out)
+        annots = {page.number: [(a.type[1], a.info["content"]) for a in page.annots()] for page in pages}
+        rect = pages[3].first_annot.rect
+        assert "40702810900000003001" in pages[3].get_textbox(rect + (-1, -1, 1, 1))
+    assert annots[3] == [("Highlight", "Строка 11: нет справа — 40702810900000003001")]
+    assert all(not a for n, a in annots.items() if n != 3)
+
+
+def test_highlight_stays_in_the_row(tmp_path):
+    import fitz
+    from app.services import extractor, reporter
+    src = tmp_path / "contract.pdf"
+    doc = fitz.open()
+    page = doc.new_page()
+    # один и тот же счёт в двух строках; справа он потерян только во второй
+    for r, right in enumerate(["Account 40702810900000000001", "Account 11111111111111111111"]):
+        for x, text in ((50, "Schet 40702810900000000001"), (300, right)):
+            page.draw_rect(fitz.Rect(x, 50 + r * 30, x + 250, 80 + r * 30), color=(0, 0, 0))
+            page.insert_text((x + 5, 70 + r * 30), text, fontsize=9)
+    doc.save(str(src))
+    extractor._cache.clear()
+
+    misses, patched = reporter.validate_doc(str(src))
+    assert [m[0] for m in misses] == [2]
+    with fitz.open(patched) as out:
+        rects = [a.rect for a in out[0].annots()]
+    assert len(rects) == 1 and 80 <= rects[0].y0 and rects[0].y1 <= 110
+
+
+def test_scan_notes_stay_on_the_page(tmp_path):
+    import fitz
+    from app.services import reporter
+    path = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(str(path))
+    misses = [(i, "Schet 40702810900000000001", "Account") for i in range(1, 101)]
+    reporter._highlight_pdf(str(path), misses, [0] * 100)
+    with fitz.open(str(path)) as out:
+        page = out[0]
+        points = {(a.rect.x0, a.rect.y0) for a in page.annots()}
+        assert len(points) == 100
+        assert all(page.rect.contains(a.rect) for a in page.annots())
+    # с известной рамкой строки заметка встаёт у неё, но не за краем страницы
+    area = fitz.Rect(0, 0, 595, 842)
+    assert reporter._note_point(area, 0, fitz.Rect(50, 80, 550, 110)) == fitz.Point(50, 80)
+    assert reporter._note_point(area, 0, fitz.Rect(590, 900, 600, 950)) == fitz.Point(575, 822)
@@ -0,0 +1,137 @@
+import fitz
+import pytest
+
+from app.services import extractor, reporter, tasks, validation_cache
+from app.services.validation_cache import (
+    PATCH_APPEND, PATCH_FULL, PATCH_NONE, CachedValidation, pack_patch, restore_patch,
+)
+
+
+@pytest.fixture
+def fake_redis(fake_redis):
+    extractor._cache.clear()
+    yield fake_redis
+    extractor._cache.clear()
+
+
+def make_pdf(changed_row=None):
+    doc = fitz.open()
+    for n in range(3):
+        page = doc.new_page()
+        for r in range(5):
+            acc = f"4070281090000000{n}{r:03d}"
+            right = "11111111111111111111" if (n, r) == (1, 2) else acc
+            if (n, r) == changed_row:
+                right = "22222222222222222222"
+            for x, text in ((50, f"Schet {acc}"), (300, f"Account {right}")):
+                page.draw_rect(fitz.Rect(x, 50 + r * 30, x + 250, 80 + r * 30), color=(0, 0, 0))
+                page.insert_text((x + 5, 70 + r * 30), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_pack_and_restore_patch(tmp_path, monkeypatch):
+    src = tmp_path / "a.pdf"
+    src.write_bytes(b"%PDF original")
+    patched = tmp_path / "a_patched.pdf"
+    patched.write_bytes(b"%PDF original + update")
+    kind, patch = pack_patch(str(src), str(patched))
+    assert (kind, patch) == (PATCH_APPEND, b" + update")
+    patched.unlink()
+    assert restore_patch(str(src), CachedValidation([], kind, patch)) == str(patched)
+    assert patched.read_bytes() == b"%PDF original + update"
+
+    patched.write_bytes(b"rewritten")
+    assert pack_patch(str(src), str(patched)) == (PATCH_FULL, b"rewritten")
+    monkeypatch.setattr(validation_cache, "MAX_PATCH_BYTES", 4)
+    assert pack_patch(str(src), str(patched)) == (PATCH_NONE, b"")
+    monkeypatch.setattr(validation_cache, "highlight_diffs", lambda src, misses: ("highlighted", misses))
+    assert restore_patch(str(src), CachedValidation([(1, "a", "b")], PATCH_NONE)) == ("highlighted", [(1, "a", "b")])
+
+
+def test_find_misses_skips_known_rows(monkeypatch):
+    pairs = [(f"Счёт {4070281090000000000 + i}", f"Account {4070281090000000000 + i * (i % 4 != 0)}") for i in range(20)]
+    full = reporter.find_misses(pairs)
+    verdicts = {reporter.row_key(l, r): any(m[0] == i for m in full) for i, (l, r) in enumerate(pairs, 1) if i % 2}
+    checked = []
+    real = reporter._check_rows
+    monkeypatch.setattr(reporter, "_check_rows", lambda rows: checked.extend(i for i, *_ in rows) or real(rows))
+    assert reporter.find_misses(pairs, verdicts=verdicts) == full
+    assert checked == list(range(2, 21, 2))
+
+
+class DummyBot:
+    def __init__(self, data):
+        self.data, self.messages, self.documents = data, [], []
+    async def download(self, file_id, destination):
+        with open(destination, "wb") as f:
+            f.write(self.data)
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+    async def send_document(self, chat_id, document, **kwargs):
+        with open(document.path, "rb") as f:
+            self.documents.append(f.read())
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_job_reuses_document_and_row_results(fake_redis, monkeypatch):
+    calls = []
+    real = tasks.validate_doc
+
+    def spy(path, on_progress=None, verdicts=None):
+        calls.append(dict(verdicts or {}))
+        return real(path, on_progress, verdicts)
+
+    monkeypatch.setattr(tasks, "validate_doc", spy)
+    data = make_pdf()
+    first = DummyBot(data)
+    await tasks.run_validation_job(first, "fid", "c.pdf", 5, 1)
+    assert calls == [{}] and "11111111111111111111" in first.messages[0]
+
+    # тот же файл — из кэша, без сверки, тот же файл с подсветкой
+    extractor._cache.clear()
+    again = DummyBot(data)
+    await tasks.run_validation_job(again, "fid", "c.pdf", 5, 1)
+    assert len(calls) == 1
+    assert again.messages == first.messages and again.documents == first.documents
+
+    # новая редакция: известны вердикты всех строк, кроме изменённой
+    edited = DummyBot(make_pdf(changed_row=(2, 4)))
+    await tasks.run_validation_job(edited, "fid", "c.v2.pdf", 5, 1)
+    assert len(calls) == 2 and len(calls[1]) == 14
+    assert sum(calls[1].values()) == 1
+    assert "22222222222222222222" in edited.messages[0]
+
+    # в хэше линии — только строки последней редакции, другой документ — в своём
+    rows = [k for k in fake_redis.hashes if k.startswith("validation_rows:")]
+    assert rows == [f"validation_rows:{reporter.RULES_VERSION}:5:{validation_cache.document_lineage('c.pdf')}"]
+    assert len(fake_redis.hashes[rows[0]]) == 15
+    await tasks.run_validation_job(DummyBot(make_pdf(changed_row=(0, 0))), "fid", "other.pdf", 5, 1)
+    assert len(calls) == 3 and calls[2] == {}
+
+
+def test_document_lineage():
+    lineage = validation_cache.document_lineage
+    assert lineage("Договор.pdf") == lineage("Договор.v2.pdf") == lineage("договор (1).docx")
+    assert lineage("Договор.pdf") == lineage("Договор_ред. 3_final.pdf")
+    assert lineage("Договор.pdf") != lineage("Договор поставки.pdf")
+
+
+@pytest.mark.asyncio
+async def test_broken_document_is_extracted_once(fake_redis, monkeypatch, tmp_path):
+    calls = []
+
+    def broken(path):
+        calls.append(path)
+        raise ValueError("битый файл")
+
+    monkeypatch.setattr(tasks, "extract_pairs", broken)
+    monkeypatch.setattr(tasks, "validate_doc", lambda *a: pytest.fail("повторная сверка"))
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4 broken")
+    with pytest.raises(ValueError, match="битый файл"):
+        await tasks.validate_cached(str(path), "a.pdf", 5, None)
+    assert len(calls) == 1